@@ -0,0 +1,306 @@
+import argparse
+from collections import OrderedDict
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+try:
+    import resource
+except ImportError:
+    resource = None
+import jenkins_job_wrecker.cli as cli
+from jenkins_job_wrecker.cli import FORMATS, root_to_data, root_to_yaml
+from jenkins_job_wrecker.corpus import DEFAULTS, JobGenerator, \
+    write_jenkins_home
+from jenkins_job_wrecker.mock_server import MockJenkinsProcess
+from jenkins_job_wrecker.sources import expand_filenames
+import jenkins_job_wrecker.xml_backend as xml_backend
+
+
+# Time parsing and converting a list of (name, xml) jobs "repeat" times with
+# each XML backend. Return an OrderedDict of backend name to a
+# (parse seconds, convert seconds) tuple.
+def time_backends(jobs, backends, repeat=1):
+    previous = xml_backend.get_backend()
+    results = OrderedDict()
+    try:
+        for backend in backends:
+            xml_backend.set_backend(backend)
+            parse = convert = 0.0
+            for _ in range(repeat):
+                for name, xml in jobs:
+                    start = timeit.default_timer()
+                    root = xml_backend.fromstring(xml)
+                    parsed = timeit.default_timer()
+                    root_to_yaml(root, name)
+                    parse += parsed - start
+                    convert += timeit.default_timer() - parsed
+            results[backend] = (parse, convert)
+    finally:
+        xml_backend.set_backend(previous)
+    return results
+
+
+# Time parsing, converting and emitting "count" jobs from a JobGenerator
+# in the given output format. The jobs are generated one at a time, outside
+# the timings, so the corpus is never held in memory. Return a
+# (parse seconds, convert seconds, emit seconds) tuple.
+def time_generated(generator, count, output_format='yaml'):
+    emit_format = FORMATS[output_format]
+    parse = convert = emit = 0.0
+    for name, xml in generator.jobs(count):
+        start = timeit.default_timer()
+        root = xml_backend.fromstring(xml)
+        parsed = timeit.default_timer()
+        data = root_to_data(root, name, xml)
+        converted = timeit.default_timer()
+        emit_format(data)
+        parse += parsed - start
+        convert += converted - parsed
+        emit += timeit.default_timer() - converted
+    return parse, convert, emit
+
+
+# Run time_generated() for "count" jobs from JobGenerator(seed, **sizes)
+# in a fresh worker process, and return a (parse seconds, convert seconds,
+# emit seconds, peak MiB) tuple. The peak RSS is a high-water mark for the
+# whole process, so each count gets its own process, and is not hidden by
+# the bigger runs before it.
+def time_generated_in_child(seed, sizes, count, output_format='yaml',
+                            backend='auto'):
+    pool = multiprocessing.Pool(1)
+    try:
+        return pool.apply(_time_generated_in_child,
+                          (seed, sizes, count, output_format, backend))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _time_generated_in_child(seed, sizes, count, output_format, backend):
+    xml_backend.set_backend(backend)
+    # Generated jobs use unhandled plugins on purpose.
+    logging.getLogger('jjwrecker.raw').setLevel(logging.WARNING)
+    parse, convert, emit = time_generated(JobGenerator(seed, **sizes), count,
+                                          output_format)
+    return parse, convert, emit, peak_rss()
+
+
+# Run "jjwrecker -s" with cli.main() against a MockJenkins (or a
+# MockJenkinsProcess), with "workers"
+# fetch workers and any other command line arguments, in a scratch
+# directory. Return a (seconds, requests) tuple, where requests counts the
+# requests the server answered by kind. Raises whatever cli.main() raises,
+# for example on an injected error.
+def time_server(jenkins, workers, extra_args=()):
+    before = dict(jenkins.requests)
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp()
+    os.chdir(workdir)
+    try:
+        start = timeit.default_timer()
+        cli.main(['-s', jenkins.url, '-j', str(workers), '--no-cache'] +
+                 list(extra_args))
+        seconds = timeit.default_timer() - start
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+    requests = dict((kind, count - before[kind])
+                    for kind, count in jenkins.requests.items())
+    return seconds, requests
+
+
+# Return the peak resident set size of this process in MiB, or None where
+# the resource module is missing.
+def peak_rss():
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes.
+    if sys.platform == 'darwin':
+        return maxrss / 1024.0 / 1024
+    return maxrss / 1024.0
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description='Benchmark jjwrecker. Compare the XML parser backends on '
+                    'a set of job XML files, like tests/fixtures/*.xml, '
+                    'time converting generated jobs with --generate, or '
+                    'time "jjwrecker -s" against a mock Jenkins server with '
+                    '--server.')
+    parser.add_argument(
+        'filename',
+        nargs='*',
+        help='XML files (or glob patterns) to parse'
+    )
+    parser.add_argument(
+        '-r', '--repeat',
+        type=int, default=100,
+        help='Number of times to parse each file (default 100)'
+    )
+    parser.add_argument(
+        '-g', '--generate',
+        type=int, nargs='+', metavar='COUNT',
+        help='Generate this many synthetic jobs and time parsing, '
+             'converting and emitting them, for example: -g 1000 10000 '
+             '100000'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int, default=0,
+        help='Random seed for the generated jobs (default 0)'
+    )
+    for size, default in sorted(DEFAULTS.items()):
+        parser.add_argument(
+            '--%s' % size.replace('_', '-'),
+            type=type(default), default=default, dest=size,
+            help='Job size for the generated jobs (default %s)' % default
+        )
+    parser.add_argument(
+        '--xml-backend',
+        choices=xml_backend.BACKENDS, default='auto',
+        help='XML parser to use for the generated jobs'
+    )
+    parser.add_argument(
+        '--format',
+        dest='output_format', choices=list(FORMATS), default='yaml',
+        help='Output format for the generated jobs (default yaml)'
+    )
+    parser.add_argument(
+        '--server',
+        action='store_true',
+        help='Serve the generated jobs (or --jenkins-home) from a mock '
+             'Jenkins server, and time converting them with "jjwrecker -s"'
+    )
+    parser.add_argument(
+        '--jenkins-home',
+        help='With --server, serve the jobs of this JENKINS_HOME directory '
+             '(or directory of XML files) instead of generated jobs'
+    )
+    parser.add_argument(
+        '-j', '--workers',
+        type=int, nargs='+', default=[4], metavar='N',
+        help='With --server, the numbers of fetch workers (jjwrecker -j) to '
+             'time (default 4)'
+    )
+    parser.add_argument(
+        '--folders',
+        type=int, default=0,
+        help='With --server, spread the generated jobs over this many '
+             'folders (default 0)'
+    )
+    parser.add_argument(
+        '--latency',
+        type=float, default=0.0,
+        help='With --server, seconds the server waits before each response '
+             '(default 0)'
+    )
+    parser.add_argument(
+        '--bandwidth',
+        type=int,
+        help='With --server, bytes per second the server sends each '
+             'response at (default: no limit)'
+    )
+    parser.add_argument(
+        '--error-rate',
+        type=float, default=0.0,
+        help='With --server, share of requests that fail with a 500 error '
+             '(default 0)'
+    )
+    args = parser.parse_args(args)
+    if args.server:
+        if not args.generate and not args.jenkins_home:
+            parser.error('give --generate or --jenkins-home with --server')
+    elif not args.filename and not args.generate:
+        parser.error('give XML files or --generate')
+    return args
+
+
+def bench_generated(args):
+    # Fail here for an unknown or missing backend, rather than in a child.
+    xml_backend.set_backend(args.xml_backend)
+    sizes = dict((size, getattr(args, size)) for size in DEFAULTS)
+    print('%10s %10s %10s %10s %12s %10s' % ('jobs', 'parse s', 'convert s',
+                                            'emit s', 'jobs/s', 'peak MiB'))
+    for count in args.generate:
+        parse, convert, emit, rss = time_generated_in_child(
+            args.seed, sizes, count, args.output_format, args.xml_backend)
+        total = parse + convert + emit
+        print('%10d %10.3f %10.3f %10.3f %12.1f %10s' % (
+            count, parse, convert, emit, count / total if total else 0.0,
+            '-' if rss is None else '%.1f' % rss))
+
+
+def bench_server(args):
+    # Keep the per-job log lines out of the table.
+    logging.getLogger('jjwrecker').setLevel(logging.ERROR)
+    cli_args = ['--xml-backend', args.xml_backend,
+                '--format', args.output_format]
+    sizes = dict((size, getattr(args, size)) for size in DEFAULTS)
+    scratch = tempfile.mkdtemp()
+    try:
+        if args.jenkins_home:
+            homes = [args.jenkins_home]
+        else:
+            homes = []
+            for count in args.generate:
+                home = os.path.join(scratch, str(count))
+                write_jenkins_home(home, count, args.seed, args.folders,
+                                   **sizes)
+                homes.append(home)
+        print('%10s %8s %10s %12s %10s %8s' % ('jobs', 'workers', 'seconds',
+                                              'jobs/s', 'requests',
+                                              'errors'))
+        for home in homes:
+            jenkins = MockJenkinsProcess(home, latency=args.latency,
+                                         bandwidth=args.bandwidth,
+                                         error_rate=args.error_rate,
+                                         seed=args.seed)
+            with jenkins:
+                for workers in args.workers:
+                    try:
+                        seconds, requests = time_server(jenkins, workers,
+                                                        cli_args)
+                    except (Exception, SystemExit) as e:
+                        print('%10d %8d failed: %s' % (jenkins.jobs, workers,
+                                                       e))
+                        continue
+                    jobs = requests['config']
+                    print('%10d %8d %10.3f %12.1f %10d %8d' % (
+                        jobs, workers, seconds,
+                        jobs / seconds if seconds else 0.0,
+                        sum(requests.values()), requests['error']))
+    finally:
+        shutil.rmtree(scratch)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.server:
+        bench_server(args)
+        return
+    if args.generate:
+        bench_generated(args)
+        return
+    jobs = []
+    for name, filename in expand_filenames(args.filename):
+        with open(filename, 'rb') as f:
+            jobs.append((name, f.read()))
+    backends = ['stdlib']
+    if xml_backend.lxml_etree is not None:
+        backends.append('lxml')
+    results = time_backends(jobs, backends, args.repeat)
+    count = len(jobs) * args.repeat
+    print('%-8s %10s %10s %12s' % ('backend', 'parse s', 'convert s',
+                                   'jobs/s'))
+    for backend, (parse, convert) in results.items():
+        print('%-8s %10.3f %10.3f %12.1f' % (backend, parse, convert,
+                                             count / (parse + convert)))
+
+
+if __name__ == '__main__':
+    main()
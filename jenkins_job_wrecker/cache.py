@@ -0,0 +1,166 @@
+import hashlib
+import inspect
+import os
+import pkgutil
+import sqlite3
+import threading
+import jenkins_job_wrecker
+import jenkins_job_wrecker.job_handlers as job_handlers
+import jenkins_job_wrecker.pretty_yaml as pretty_yaml
+import jenkins_job_wrecker.xml_backend as xml_backend
+import jenkins_job_wrecker.yaml_writer as yaml_writer
+
+CACHE_FILENAME = '.jjw-cache'
+
+# Commit new conversions in batches of this many.
+COMMIT_INTERVAL = 100
+
+# The source of the modules that determine the YAML, read once on import.
+# Their paths may be relative to the directory Python started in, so they
+# cannot be read reliably after a chdir(). cli.py, which turns the top of a
+# job into its structure, imports this module, so its source is read as
+# package data instead.
+MODULE_SOURCES = [inspect.getsource(module).encode('utf-8')
+                  for module in (job_handlers, xml_backend, pretty_yaml,
+                                 yaml_writer)]
+MODULE_SOURCES.append(pkgutil.get_data('jenkins_job_wrecker', 'cli.py'))
+
+
+# Return a digest of everything besides the XML that determines the YAML we
+# emit: the jenkins-job-wrecker version, the source of the handlers, the
+# top-level conversion in cli.py, the XML backend and the YAML writers, and
+# every registered handler (including
+# third-party ones). Any change to these invalidates every cached
+# conversion.
+def converter_digest():
+    digest = hashlib.sha1(jenkins_job_wrecker.__version__.encode('utf-8'))
+    for source in MODULE_SOURCES:
+        digest.update(source)
+    for handles, handler in job_handlers.registry.items():
+        digest.update(repr(handles).encode('utf-8'))
+        if handler.__module__ == job_handlers.__name__:
+            continue
+        try:
+            source = inspect.getsource(handler)
+        except (IOError, TypeError):
+            source = '%s.%s' % (handler.__module__, handler.__name__)
+        digest.update(source.encode('utf-8'))
+    return digest.hexdigest()
+
+
+# A persistent, on-disk cache of XML to YAML conversions, keyed by a hash
+# of the raw XML and the converter_digest().
+#
+# One process owns the cache and records new conversions with put().
+# Worker processes may open the same file with readonly=True to look up
+# conversions with get().
+#
+# The fingerprints of server jobs are stored with the converter_digest()
+# and the "output_format" of the run, since a job file is only up to date
+# if it was written by the same converter in the same format. A fingerprint
+# stored by another version or format is not returned, so the job is
+# fetched and converted again.
+class ConversionCache(object):
+
+    def __init__(self, path, readonly=False, output_format='yaml'):
+        self.path = path
+        self.output_format = output_format
+        self.hits = 0
+        self.misses = 0
+        self.unchanged = 0
+        self._pending = 0
+        self._converter = converter_digest()
+        self._fingerprint_prefix = '%s %s ' % (self._converter,
+                                               output_format)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if not readonly:
+            # Let workers read while the owner writes.
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS conversions '
+                               '(key TEXT PRIMARY KEY, yaml BLOB NOT NULL)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS fingerprints '
+                               '(name TEXT PRIMARY KEY, '
+                               'fingerprint TEXT NOT NULL)')
+            self._conn.commit()
+
+    # Return the cache key for a job's raw XML, converted to an output
+    # format ("yaml" or "json"). The job name is part of the key because it
+    # is part of the YAML.
+    def key(self, name, xml, output_format='yaml'):
+        if not isinstance(xml, bytes):
+            xml = xml.encode('utf-8')
+        digest = hashlib.sha1(self._converter.encode('utf-8'))
+        digest.update(output_format.encode('utf-8') + b'\0')
+        digest.update(name.encode('utf-8') + b'\0')
+        digest.update(xml)
+        return digest.hexdigest()
+
+    # Return the YAML previously stored for this key, or None.
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute('SELECT yaml FROM conversions '
+                                     'WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return bytes(row[0])
+
+    def put(self, key, yaml):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO conversions '
+                               '(key, yaml) VALUES (?, ?)',
+                               (key, sqlite3.Binary(yaml)))
+            self._pending += 1
+            if self._pending >= COMMIT_INTERVAL:
+                self._conn.commit()
+                self._pending = 0
+
+    # Return the fingerprint a job had on the Jenkins server when we last
+    # converted it with this converter and output format, or None.
+    def get_fingerprint(self, name):
+        with self._lock:
+            row = self._conn.execute('SELECT fingerprint FROM fingerprints '
+                                     'WHERE name = ?', (name,)).fetchone()
+        if row is None or not row[0].startswith(self._fingerprint_prefix):
+            return None
+        return row[0][len(self._fingerprint_prefix):]
+
+    def put_fingerprint(self, name, fingerprint):
+        with self._lock:
+            self._conn.execute('INSERT OR REPLACE INTO fingerprints '
+                               '(name, fingerprint) VALUES (?, ?)',
+                               (name, self._fingerprint_prefix + fingerprint))
+
+    # Forget every fingerprint, so the next --changed-only run fetches and
+    # writes every job again.
+    def clear_fingerprints(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM fingerprints')
+
+    # Count a lookup for the end-of-run summary.
+    def record(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def summary(self):
+        total = self.hits + self.misses
+        rate = 100.0 * self.hits / total if total else 0.0
+        summary = 'cache: %d hits, %d misses (%.1f%% hit rate)' % (
+            self.hits, self.misses, rate)
+        if self.unchanged:
+            summary += ', %d unchanged on the server' % self.unchanged
+        return summary
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+
+# Open the conversion cache in an output directory, for a run that writes
+# "output_format".
+def open_cache(output_dir, output_format='yaml'):
+    return ConversionCache(os.path.join(output_dir, CACHE_FILENAME),
+                           output_format=output_format)
@@ -1,15 +1,28 @@
 import argparse
 from argparse import ArgumentDefaultsHelpFormatter
-from collections import OrderedDict
+from collections import namedtuple, OrderedDict
 import errno
+import io
+import json
 import logging
-import jenkins
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 import os
 import sys
 import textwrap
+import threading
+from jenkins_job_wrecker.cache import ConversionCache, open_cache
+from jenkins_job_wrecker.fetch import JenkinsFetcher
+from jenkins_job_wrecker.output import OutputWriter
+import jenkins_job_wrecker.instrument as instrument
 import jenkins_job_wrecker.job_handlers as job_handlers
-from jenkins_job_wrecker.pretty_yaml import dump
-import xml.etree.ElementTree as ET
+import jenkins_job_wrecker.macros as macros
+import jenkins_job_wrecker.templates as templates
+import jenkins_job_wrecker.verify as verify
+from jenkins_job_wrecker.sources import expand_filenames, walk_jenkins_home, \
+    iter_archive, JobFilter
+from jenkins_job_wrecker.yaml_writer import dump
+import jenkins_job_wrecker.xml_backend as xml_backend
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger('jjwrecker')
@@ -22,20 +35,76 @@ for handler in logging.getLogger().handlers:
                                                    '%(message)s'))
 
 
-# Given a file with XML, or a string of XML, parse it with
-# xml.etree.ElementTree and return the XML tree root.
+# Given a file with XML, or a string of XML, parse it with the XML backend
+# (lxml or xml.etree.ElementTree) and return the XML tree root.
 def get_xml_root(filename=False, string=False):
     if not filename and not string:
         raise TypeError('specify a filename or string argument')
     if filename:
-        tree = ET.parse(filename)
-        return tree.getroot()
+        return xml_backend.parse(filename)
     if string:
-        return ET.fromstring(string.encode('utf-8'))
+        if not isinstance(string, bytes):
+            string = string.encode('utf-8')
+        return xml_backend.fromstring(string)
 
 
-# Walk an XML ElementTree ("root"), and return a YAML string
-def root_to_yaml(root, name):
+# Walk an XML ElementTree ("root"), and return the job structure: a list
+# holding one {'job': OrderedDict} mapping, the same data that JJB loads
+# from the YAML. Callers may change it, and serialize it (or not) with
+# dump() or dump_json(). If "xml" is the document's bytes, elements that go
+# raw are copied from it verbatim.
+def root_to_data(root, name, xml=None):
+    xml_backend.set_source(xml)
+    try:
+        return children_to_data(root.tag, root, name)
+    finally:
+        xml_backend.clear_source()
+
+
+# Walk an XML ElementTree ("root"), and return a YAML string.
+def root_to_yaml(root, name, xml=None):
+    return dump(root_to_data(root, name, xml))
+
+
+# Walk an XML ElementTree ("root"), and return a JSON string for the same
+# job as root_to_yaml(). JSON is YAML too, so JJB reads it the same way.
+def root_to_json(root, name, xml=None):
+    return dump_json(root_to_data(root, name, xml))
+
+
+# Parse a file (a file name or file object) of XML incrementally, and
+# return the job structure, like root_to_data(). Each top-level element is
+# converted and freed as soon as it has been parsed, so the whole tree is
+# never in memory at once.
+def stream_to_data(source, name, xml=None):
+    xml_backend.set_source(xml)
+    try:
+        children = xml_backend.iter_children(source)
+        root = next(children)
+        return children_to_data(root.tag, children, name)
+    finally:
+        xml_backend.clear_source()
+
+
+# Parse a file of XML incrementally, like stream_to_data(), and return a
+# YAML string.
+def stream_to_yaml(source, name, xml=None):
+    return dump(stream_to_data(source, name, xml))
+
+
+# Return a JSON string for a job, serialized with the json module. Key order
+# is kept, and the output ends with a line break like the YAML does.
+def dump_json(data):
+    return json.dumps(data) + '\n'
+
+
+# The output formats, and the function that serializes a job in each.
+FORMATS = OrderedDict([('yaml', dump), ('json', dump_json)])
+
+
+# Return the job structure for a job with a root element tag, and an
+# iterable of the root's child elements.
+def children_to_data(root_tag, children, name):
     # Top-level "job" data
     job = OrderedDict()
     build = [{'job': job}]
@@ -46,20 +115,21 @@ def root_to_yaml(root, name):
     project_types = {
         'project': 'freestyle',
         'matrix-project': 'matrix'}
-    if root.tag not in project_types:
-        raise NotImplementedError('Cannot handle "%s"-type projects' % root.tag)
-    if root.tag != 'project':
-        job['project-type'] = project_types[root.tag]
+    if root_tag not in project_types:
+        raise NotImplementedError('Cannot handle "%s"-type projects' % root_tag)
+    if root_tag != 'project':
+        job['project-type'] = project_types[root_tag]
 
-    # Handle each top-level XML element with custom "handle_*" functions in
-    # job_handlers.py.
+    # Handle each top-level XML element with the "job" handlers registered
+    # in job_handlers.py.
     raw_xmls = []
-    for child in root:
-        handler_name = 'handle_%s' % child.tag.lower()
-        try:
-            handler = getattr(job_handlers, handler_name)
-        except AttributeError:
-            raw_xmls.append(ET.tostring(child).strip())
+    for ordinal, child in enumerate(children):
+        xml_backend.set_section(ordinal, child)
+        handler = job_handlers.registry.get('job', child.tag.lower())
+        if handler is None:
+            instrument.going_raw('job', child,
+                                 'cannot handle XML %s' % child.tag)
+            raw_xmls.append(xml_backend.raw_xml(child).strip())
             continue
 
         try:
@@ -74,13 +144,360 @@ def root_to_yaml(root, name):
                     job[key] = value
 
         except Exception:
-            print 'last called %s' % handler_name
+            log.error('last called %s', handler.__name__)
             raise
 
     if len(raw_xmls):
         job['raw'] = {'xml': "\n".join(raw_xmls) + "\n"}
 
-    return dump(build)
+    return build
+
+
+# The result of converting one job, for save_result(). "yaml" is the job's
+# YAML (or JSON, with --format json). "key" is the cache key and "hit" is
+# True if the YAML came from the cache. "yaml" is None if
+# the job is unchanged on the Jenkins server, and "fingerprint" is the
+# job's fingerprint on the server (see convert_changed_server_job()).
+# "stats" carries the instrument stats of a worker process, if any.
+# "verified" is True if JJB rendered the job with --verify, False if it
+# failed with "verify_error", and None if the job was not verified. With
+# --round-trip, "differences" lists where JJB's XML differs from the
+# original XML. "data" is the job structure that "yaml" was emitted from,
+# or None if the job was not converted (or came back from a worker that
+# does not need it).
+Result = namedtuple('Result', 'name key yaml hit fingerprint stats verified '
+                              'verify_error differences data')
+
+# A job that a worker could not convert, because it uses something
+# jjwrecker cannot handle (a handler raised NotImplementedError), with the
+# error message.
+Skipped = namedtuple('Skipped', 'name error')
+
+
+# Jobs with more than this many bytes of XML are converted with
+# stream_to_data(), to bound the memory each worker needs. Smaller jobs are
+# parsed whole, which is faster.
+STREAM_THRESHOLD = 1024 * 1024
+
+
+# Convert one job's XML to YAML (or to another of the FORMATS), reusing the
+# cached conversion when the cache has one.
+def convert_xml(name, xml, cache=None, output_format='yaml'):
+    key = None
+    if cache is not None:
+        key = cache.key(name, xml, output_format)
+        yaml = cache.get(key)
+        if yaml is not None:
+            return verify_result(Result(name, key, yaml, True, None, None,
+                                        None, None, None, None), xml=xml)
+    if not isinstance(xml, bytes):
+        xml = xml.encode('utf-8')
+    log.info('converting job "%s" to %s' % (name, output_format.upper()))
+    if instrument.enabled():
+        data, yaml = convert_xml_instrumented(name, xml, output_format)
+    else:
+        data = xml_to_data(name, xml)
+        yaml = FORMATS[output_format](data)
+    return verify_result(Result(name, key, yaml, False, None, None, None,
+                                None, None, data), data, xml)
+
+
+# With --verify, render a converted job with JJB, from its job structure
+# or else from its YAML, and record the outcome in its Result. With
+# --round-trip, also compare JJB's XML with the job's original "xml".
+def verify_result(result, data=None, xml=None):
+    if not verify.enabled():
+        return result
+    start = instrument.timer()
+    original = xml if verify.round_trip() else None
+    if original is not None and not isinstance(original, bytes):
+        original = original.encode('utf-8')
+    error, differences = verify.get_verifier().check(data, result.yaml,
+                                                     original)
+    instrument.add_phase('verify', instrument.timer() - start)
+    return result._replace(verified=error is None, verify_error=error,
+                           differences=differences)
+
+
+def xml_to_data(name, xml):
+    if len(xml) > STREAM_THRESHOLD:
+        return stream_to_data(io.BytesIO(xml), name, xml)
+    return root_to_data(get_xml_root(string=xml), name, xml)
+
+
+# convert_xml(), timing each phase for the instrument stats, and profiling
+# the job with cProfile if that is on. Big jobs are parsed as they are
+# converted, so their parse time counts as "convert". The time that timed
+# handlers spend sizing their results does not count.
+def convert_xml_instrumented(name, xml, output_format):
+    profile = instrument.start_job_profile()
+    try:
+        sized = instrument.overhead()
+        start = instrument.timer()
+        if len(xml) > STREAM_THRESHOLD:
+            parsed = start
+            data = stream_to_data(io.BytesIO(xml), name, xml)
+        else:
+            root = get_xml_root(string=xml)
+            parsed = instrument.timer()
+            data = root_to_data(root, name, xml)
+        converted = instrument.timer()
+        yaml = FORMATS[output_format](data)
+        emitted = instrument.timer()
+    finally:
+        instrument.finish_job_profile(profile, name)
+    instrument.add_phase('parse', parsed - start)
+    instrument.add_phase('convert', converted - parsed -
+                         (instrument.overhead() - sized))
+    instrument.add_phase('emit', emitted - converted)
+    instrument.add_job(yaml)
+    return data, yaml
+
+
+# Write the result of convert_xml() with an OutputWriter, and record it in
+# the cache. The file is only written if its content differs, which also
+# repairs files that an earlier --macros or --templates run rewrote. With
+# --macros or --templates, the job is held for that pass instead, which
+# writes every job at the end.
+def save_result(result, writer, cache=None):
+    instrument.merge(result.stats)
+    if result.verified is not None:
+        verify.record(result.name, result.verify_error, result.differences)
+        if not result.verified:
+            log.error('job "%s" fails JJB verification: %s'
+                      % (result.name, result.verify_error))
+        elif result.differences:
+            log.error('job "%s" differs from JJB\'s XML at: %s'
+                      % (result.name, ', '.join(
+                          difference.path
+                          for difference in result.differences)))
+    if result.yaml is None:
+        log.debug('job "%s" is unchanged on the server' % result.name)
+        cache.unchanged += 1
+        writer.keep(result.name)
+        return
+    if cache is not None:
+        cache.record(result.hit)
+        if not result.hit:
+            cache.put(result.key, result.yaml)
+    if macros.enabled():
+        macros.add(result.name, result_data(result))
+    elif templates.enabled():
+        templates.add(result.name, result_data(result))
+    elif not writer.write(result.name, result.yaml):
+        log.debug('job "%s" is unchanged' % result.name)
+    if result.fingerprint is not None:
+        cache.put_fingerprint(result.name, result.fingerprint)
+
+
+# Save a Result with save_result(), or log and count a Skipped job, so one
+# odd job does not stop a bulk run.
+def save_outcome(result, writer, cache=None):
+    if isinstance(result, Skipped):
+        log.warning('skipped job "%s": %s' % (result.name, result.error))
+        writer.skip(result.name)
+    else:
+        save_result(result, writer, cache)
+
+
+# Return the job structure of a Result, from its YAML if the job came from
+# the cache.
+def result_data(result):
+    if result.data is not None:
+        return result.data
+    return macros.load(result.yaml)
+
+
+# Fetch one job's XML from a Jenkins server and convert it.
+def convert_server_job(server, name, cache=None, output_format='yaml'):
+    log.info('looking up job "%s"' % name)
+    # Get a job's XML
+    xml = server.get_job_config(name)
+    log.debug(xml)
+    # Convert XML to YAML
+    return convert_xml(name, xml, cache, output_format)
+
+
+# Return a job's fingerprint from the tree API "field" of an iter_jobs() job.
+# The field's name is part of it, so switching fields fetches every job
+# again.
+def tree_fingerprint(job, field):
+    return 'tree:%s:%s' % (field, json.dumps(job.get(field), sort_keys=True))
+
+
+# Fetch and convert one job from iter_jobs(), unless its fingerprint shows
+# that it has not changed on the server since the last run. With a tree API
+# "field", the fingerprint comes from the job listing, so unchanged jobs
+# cost no request at all. Otherwise, config.xml is fetched with a
+# conditional request.
+def convert_changed_server_job(server, job, cache, writer, field=None,
+                               output_format='yaml'):
+    name = job['name']
+    # Without the output file, the job must be converted again anyway.
+    stored = None
+    if os.path.exists(writer.filename(name)):
+        stored = cache.get_fingerprint(name)
+    if field:
+        fingerprint = tree_fingerprint(job, field)
+        if fingerprint == stored:
+            return Result(name, None, None, False, fingerprint, None, None,
+                          None, None, None)
+        result = convert_server_job(server, name, cache, output_format)
+        return result._replace(fingerprint=fingerprint)
+    log.info('looking up job "%s"' % name)
+    xml, fingerprint = server.get_job_config_if_changed(name, stored)
+    if xml is None:
+        return Result(name, None, None, False, fingerprint, None, None,
+                      None, None, None)
+    result = convert_xml(name, xml, cache, output_format)
+    return result._replace(fingerprint=fingerprint)
+
+
+# Yield the jobs from a server job listing that pass a JobFilter.
+def filter_jobs(jobs, job_filter):
+    for job in jobs:
+        if not job_filter(job['name']):
+            log.info('Ignoring [%s] as requested...' % job['name'])
+            continue
+        yield job
+
+
+# Yield the items of an iterable, but keep an exception it raises in the
+# "errors" list instead, for the caller to raise. Python 2's ThreadPool
+# drops an exception from its task iterable if it comes before the first
+# task, and ends the results as if there were no tasks.
+def catch_errors(iterable, errors):
+    try:
+        for item in iterable:
+            yield item
+    except Exception as e:
+        errors.append(e)
+
+
+# Convert one (name, filename) job's XML file.
+def convert_file(job, cache=None, output_format='yaml'):
+    name, filename = job
+    with open(filename, 'rb') as f:
+        xml = f.read()
+    return convert_xml(name, xml, cache, output_format)
+
+
+# Each multiprocessing worker process opens its own handle on the cache,
+# and uses the same XML backend, output format, instrumentation and
+# verification as the main process.
+_worker_cache = None
+_worker_format = 'yaml'
+# Whether to send each job's structure back with its result, for --macros
+# and --templates.
+_worker_keep_data = False
+
+
+def _init_worker(cache_path, backend, output_format='yaml',
+                 instrumentation=None, verification=None, keep_data=False):
+    global _worker_cache, _worker_format, _worker_keep_data
+    xml_backend.set_backend(backend)
+    _worker_format = output_format
+    _worker_keep_data = keep_data
+    instrument.configure(instrumentation)
+    verify.configure(verification)
+    if cache_path is not None:
+        _worker_cache = ConversionCache(cache_path, readonly=True)
+
+
+# Send each job's instrument stats back to the main process with its
+# result. The job structure is dropped unless the main process needs it,
+# since it costs more to pickle than the YAML.
+def _worker_result(result):
+    stats = instrument.take()
+    if stats is not None:
+        result = result._replace(stats=stats)
+    if not _worker_keep_data and result.data is not None:
+        result = result._replace(data=None)
+    return result
+
+
+# Return a Skipped job for a NotImplementedError, and drop the stats of
+# its partial conversion.
+def _worker_skipped(name, error):
+    instrument.take()
+    return Skipped(name, str(error))
+
+
+def _convert_file_in_worker(job):
+    try:
+        return _worker_result(convert_file(job, _worker_cache,
+                                           _worker_format))
+    except NotImplementedError as err:
+        return _worker_skipped(job[0], err)
+
+
+def _convert_xml_in_worker(job):
+    name, xml = job
+    try:
+        return _worker_result(convert_xml(name, xml, _worker_cache,
+                                          _worker_format))
+    except NotImplementedError as err:
+        return _worker_skipped(name, err)
+
+
+# Convert jobs on a pool of worker processes with "function", and write each
+# job's YAML as soon as its worker finishes. A job that jjwrecker cannot
+# handle is logged and skipped (see save_outcome()). At most "backlog" jobs
+# are handed to the pool at a time, so a fast producer of jobs cannot fill
+# memory while the workers catch up.
+def convert_on_pool(function, jobs, writer, processes=None, cache=None,
+                    chunksize=8, backlog=None, output_format='yaml'):
+    cache_path = cache.path if cache is not None else None
+    pool = multiprocessing.Pool(processes, _init_worker,
+                                (cache_path, xml_backend.get_backend(),
+                                 output_format, instrument.settings(),
+                                 verify.settings(),
+                                 macros.enabled() or templates.enabled()))
+    if backlog is not None:
+        slots = threading.Semaphore(backlog)
+        stopped = threading.Event()
+        jobs = throttle(jobs, slots, stopped)
+    try:
+        for result in pool.imap_unordered(function, jobs, chunksize):
+            save_outcome(result, writer, cache)
+            if backlog is not None:
+                slots.release()
+    except Exception:
+        if backlog is not None:
+            # Let the pool's task thread out of throttle().
+            stopped.set()
+            slots.release()
+        pool.terminate()
+        raise
+    pool.close()
+    pool.join()
+
+
+# Yield items from an iterable, waiting for a free slot before each one,
+# until "stopped" is set.
+def throttle(iterable, slots, stopped):
+    for item in iterable:
+        slots.acquire()
+        if stopped.is_set():
+            return
+        yield item
+
+
+# Convert many (name, filename) jobs on a pool of worker processes.
+def convert_files(jobs, writer, processes=None, cache=None,
+                  output_format='yaml'):
+    convert_on_pool(_convert_file_in_worker, jobs, writer, processes, cache,
+                    output_format=output_format)
+
+
+# Convert many (name, xml) jobs on a pool of worker processes. The XML goes
+# to the workers in memory, and never touches the disk.
+def convert_xmls(jobs, writer, processes=None, cache=None,
+                 output_format='yaml'):
+    processes = processes or multiprocessing.cpu_count()
+    convert_on_pool(_convert_xml_in_worker, jobs, writer, processes, cache,
+                    chunksize=1, backlog=processes * 4,
+                    output_format=output_format)
 
 
 # argparse foo
@@ -90,16 +507,30 @@ def parse_args(args):
         epilog=textwrap.dedent('''
         Examples:
         jjwrecker -f ice-tools.xml
+        jjwrecker -f 'exports/*.xml'
+        jjwrecker --jenkins-home /var/lib/jenkins
+        jjwrecker --archive jenkins-backup.tar.gz
+        jjwrecker serve
         '''),
         formatter_class=ArgumentDefaultsHelpFormatter)
     parser.add_argument(
         '-f', '--filename',
-        help='XML file to translate'
+        nargs='+',
+        help='XML files (or glob patterns) to translate'
     )
     parser.add_argument(
         '-s', '--jenkins-server',
         help='Jenkins server to query'
     )
+    parser.add_argument(
+        '--jenkins-home',
+        help='JENKINS_HOME directory to read all job configs from'
+    )
+    parser.add_argument(
+        '--archive',
+        help='tar archive (optionally compressed) of a JENKINS_HOME '
+             'directory to read all job configs from'
+    )
     parser.add_argument(
         '-n', '--name',
         help='Name of a job'
@@ -107,7 +538,117 @@ def parse_args(args):
     parser.add_argument(
         '-i', '--ignore',
         nargs='*',
-        help='Ignore some jobs in conversion.'
+        help='Ignore some jobs in conversion. Each pattern is a job name, a '
+             'glob, or a regular expression prefixed with "re:".'
+    )
+    parser.add_argument(
+        '--include',
+        nargs='*',
+        help='Only convert jobs that match one of these patterns (see '
+             '--ignore).'
+    )
+    parser.add_argument(
+        '--folder-depth',
+        type=int,
+        help='With -s, how many levels of folders to descend into. 0 means '
+             'top-level jobs only (default: no limit).'
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        help='Number of parallel workers. With -s, this is the number of '
+             'job configs fetched from the server at once (default 4). '
+             'Otherwise, this is the number of conversion processes '
+             '(default: one per CPU).'
+    )
+    parser.add_argument(
+        '--no-cache',
+        dest='cache', action='store_false',
+        help='Convert every job, even if output/.jjw-cache has a '
+             'conversion of the same XML'
+    )
+    parser.add_argument(
+        '--changed-only',
+        action='store_true',
+        help='With -s, only fetch jobs that changed on the server since the '
+             'last run. Jobs are fingerprinted by the ETag or Last-Modified '
+             'headers of config.xml, or by --fingerprint-field'
+    )
+    parser.add_argument(
+        '--fingerprint-field',
+        help='Tree API field of each job (for example, one added by a '
+             'plugin) that changes whenever the job config changes. It is '
+             'fetched for every job in the job listing, so unchanged jobs '
+             'cost no request'
+    )
+    parser.add_argument(
+        '--prune',
+        action='store_true',
+        help='Delete .yml files in output/ for jobs that no longer exist. '
+             'Only for a run that converts every job, without -f, -n, '
+             '--include, --ignore or --folder-depth'
+    )
+    parser.add_argument(
+        '--xml-backend',
+        choices=xml_backend.BACKENDS, default='auto',
+        help='XML parser to use. "auto" uses lxml if it is installed, and '
+             'the standard library otherwise'
+    )
+    parser.add_argument(
+        '--format',
+        dest='output_format', choices=list(FORMATS), default='yaml',
+        help='Format of the job files. JSON is YAML too, so JJB reads it '
+             'the same way, and it is faster to write. Either way, the '
+             'files are named .yml so JJB finds them in a directory'
+    )
+    parser.add_argument(
+        '--macros',
+        type=int, nargs='?', const=2, metavar='JOBS',
+        help='Write each builder, publisher and wrapper that at least JOBS '
+             'jobs share (default 2) only once, as a JJB macro in '
+             'output/%s.yml, and refer to it by name in the jobs'
+             % macros.MACROS_NAME
+    )
+    parser.add_argument(
+        '--templates',
+        type=int, nargs='?', const=2, metavar='JOBS',
+        help='Find groups of at least JOBS (default 2) jobs that differ in '
+             'only a few values, and write each group as a JJB job-template '
+             'and project in output/%s.yml instead of one file per job'
+             % templates.TEMPLATES_NAME
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='FILE',
+        help='Write stats of the conversion to a JSON file: calls, time and '
+             'output size of each handler, time of the parse, convert and '
+             'emit phases, and the plugins written as raw XML'
+    )
+    parser.add_argument(
+        '--cprofile',
+        metavar='DIR',
+        help='Profile each converted job with cProfile, and write its stats '
+             'to DIR/<job>.prof'
+    )
+    parser.add_argument(
+        '--verify',
+        action='store_true',
+        help='Check that Jenkins Job Builder can generate XML from each '
+             'converted job, and exit with an error if any job fails. Needs '
+             'jenkins-job-builder to be installed'
+    )
+    parser.add_argument(
+        '--round-trip',
+        action='store_true',
+        help='Like --verify, and also compare the XML that JJB generates '
+             'with each job\'s original XML. Exit with an error if any job '
+             'differs'
+    )
+    parser.add_argument(
+        '--verify-report',
+        metavar='FILE',
+        help='With --verify or --round-trip, write whether each job passed, '
+             'and why it failed, to a JSON file'
     )
     parser.add_argument(
         '-v', '--verbose',
@@ -117,31 +658,122 @@ def parse_args(args):
     return parser.parse_args(args)
 
 
-def main():
-    args = parse_args(sys.argv[1:])
+# Return True if a run converts every job of its source: a Jenkins server,
+# JENKINS_HOME directory or archive, without -n, --include, --ignore or
+# --folder-depth. -f only converts the files it is given, which may be a
+# few of the jobs.
+def full_export(args):
+    return not (args.filename or args.name or args.include or
+                args.ignore or args.folder_depth is not None)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    # "jjwrecker serve" runs the conversion daemon.
+    if argv[:1] == ['serve']:
+        from jenkins_job_wrecker.server import main as serve
+        return serve(argv[1:])
+    args = parse_args(argv)
 
     if args.verbose:
         log.setLevel(logging.DEBUG)
 
     # Options:
+    # -f (job names come from the file names)
     # -f and -n
     # -s and -n
-    # TODO: -s (without -n means "all jobs on the server")
-    # Choose either -f or -s ...
-    if not args.jenkins_server and not args.filename:
-        log.critical('Choose an XML file (-f) or Jenkins URL (-s).')
+    # -s (without -n means "all jobs on the server")
+    # --jenkins-home
+    # --archive
+    # Choose one of -f, -s, --jenkins-home or --archive.
+    sources = [source for source in (args.filename, args.jenkins_server,
+                                     args.jenkins_home, args.archive)
+               if source]
+    if not sources:
+        log.critical('Choose an XML file (-f), Jenkins URL (-s), '
+                     'JENKINS_HOME directory (--jenkins-home) or '
+                     'JENKINS_HOME archive (--archive).')
         exit(1)
 
-    # ... but not both -f and -s.
-    if args.jenkins_server and args.filename:
-        log.critical('Choose either an XML file (-f) or Jenkins URL (-s).')
+    if len(sources) > 1:
+        log.critical('Choose only one of an XML file (-f), Jenkins URL (-s), '
+                     'JENKINS_HOME directory (--jenkins-home) or '
+                     'JENKINS_HOME archive (--archive).')
         exit(1)
 
-    # -f requires -n
-    if args.filename and not args.name:
-        log.critical('Choose a job name (-n) for the job in this file.')
+    # --changed-only keeps fingerprints in the cache.
+    if args.changed_only and not args.cache:
+        log.critical('Choose either --changed-only or --no-cache.')
         exit(1)
 
+    # --macros rewrites every job, so it needs each job's YAML.
+    if args.macros is not None and args.changed_only:
+        log.critical('Choose either --changed-only or --macros.')
+        exit(1)
+
+    # So does --templates.
+    if args.templates is not None and args.changed_only:
+        log.critical('Choose either --changed-only or --templates.')
+        exit(1)
+
+    if args.templates is not None and args.macros is not None:
+        log.critical('Choose either --macros or --templates.')
+        exit(1)
+
+    # --prune deletes the file of every job that the run does not convert,
+    # so it needs the full list of jobs.
+    if args.prune and not full_export(args):
+        log.critical('Choose --prune only to convert every job of a Jenkins '
+                     'URL (-s), JENKINS_HOME directory (--jenkins-home) or '
+                     'archive (--archive), without -n, --include, --ignore '
+                     'or --folder-depth.')
+        exit(1)
+
+    try:
+        xml_backend.set_backend(args.xml_backend)
+    except ValueError as err:
+        log.critical(str(err))
+        exit(1)
+
+    if args.profile or args.cprofile:
+        instrument.enable(cprofile_dir=args.cprofile)
+
+    if args.macros is not None:
+        macros.enable(threshold=args.macros)
+
+    if args.templates is not None:
+        templates.enable(min_jobs=args.templates)
+
+    # --round-trip verifies jobs too.
+    args.verify = args.verify or args.round_trip
+
+    if args.verify_report and not args.verify:
+        log.critical('Choose --verify-report only with --verify or '
+                     '--round-trip.')
+        exit(1)
+
+    if args.verify:
+        # Fail early if JJB is missing, or its config is invalid.
+        try:
+            verify.get_verifier()
+        except Exception as err:
+            log.critical(verify.error_message(err))
+            exit(1)
+        verify.enable(round_trip=args.round_trip)
+
+    # -n names a single job.
+    if args.filename:
+        jobs = list(expand_filenames(args.filename))
+        if not jobs:
+            log.critical('No XML files match %s.' % ' '.join(args.filename))
+            exit(1)
+        if args.name:
+            if len(jobs) > 1:
+                log.critical('Choose a job name (-n) only for a single XML '
+                             'file (-f).')
+                exit(1)
+            jobs = [(args.name, jobs[0][1])]
+
     # Args are ok. Proceed with writing output
     try:
         os.mkdir('output')
@@ -150,17 +782,36 @@ def main():
         if exception.errno != errno.EEXIST:
             raise
 
+    cache = open_cache('output', args.output_format) if args.cache else None
+    writer = OutputWriter('output')
+
     if args.filename:
-        # Convert to YAML
-        root = get_xml_root(filename=args.filename)
-        yaml = root_to_yaml(root, args.name)
-        # write yaml string to file (job-name.yml)
-        yaml_filename = os.path.join('output', args.name + '.yml')
-        output_file = open(yaml_filename, 'w')
-        output_file.write(yaml)
-        output_file.close()
-
-    # -s requires -n
+        if len(jobs) == 1:
+            # Convert to YAML, and write it to a file (job-name.yml)
+            save_result(convert_file(jobs[0], cache, args.output_format),
+                        writer, cache)
+        else:
+            convert_files(jobs, writer, processes=args.jobs, cache=cache,
+                          output_format=args.output_format)
+
+    job_filter = JobFilter(include=args.include, ignore=args.ignore)
+
+    if args.jenkins_home:
+        jobs = walk_jenkins_home(args.jenkins_home)
+        if args.name:
+            jobs = (job for job in jobs if job[0] == args.name)
+        jobs = (job for job in jobs if job_filter(job[0]))
+        convert_files(jobs, writer, processes=args.jobs, cache=cache,
+                      output_format=args.output_format)
+
+    if args.archive:
+        jobs = iter_archive(args.archive)
+        if args.name:
+            jobs = (job for job in jobs if job[0] == args.name)
+        jobs = (job for job in jobs if job_filter(job[0]))
+        convert_xmls(jobs, writer, processes=args.jobs, cache=cache,
+                     output_format=args.output_format)
+
     if args.jenkins_server:
         # 'http://jenkins-calamari.front.sepia.ceph.com:8080'
         # TODO: make these configurable. Allow environment variables for now
@@ -173,34 +824,107 @@ def main():
             log.warning('%s was not set as an environment variable to '
                         'connect to Jenkins' % err)
 
-        server = jenkins.Jenkins(args.jenkins_server,
-                                 username=username,
-                                 password=password)
+        workers = max(args.jobs or 4, 1)
+
+        # Size the connection pool to match the number of workers, so
+        # every worker keeps its own keep-alive connection.
+        server = JenkinsFetcher(args.jenkins_server,
+                                username=username,
+                                password=password,
+                                pool_size=workers)
 
         if args.name:
-            job_names = [args.name]
+            jobs = [{'name': args.name}]
         else:
-            job_names = []
-            for job in server.get_jobs():
-
-                if args.ignore and (job['name'] in args.ignore):
-                    log.info('Ignoring [%s] as requested...' % job)
-                    continue
-
-                job_names.append(job['name'])
-
-        # write YAML
-        for name in job_names:
-            log.info('looking up job "%s"' % name)
-            # Get a job's XML
-            xml = server.get_job_config(name)
-            log.debug(xml)
-            # Convert XML to YAML
-            root = get_xml_root(string=xml)
-            log.info('converting job "%s" to YAML' % name)
-            yaml = root_to_yaml(root, name)
-            # write yaml string to file (job-name.yml)
-            yaml_filename = os.path.join('output', name + '.yml')
-            output_file = open(yaml_filename, 'w')
-            output_file.write(yaml)
-            output_file.close()
+            fields = [args.fingerprint_field] if args.fingerprint_field \
+                else []
+            jobs = filter_jobs(server.iter_jobs(fields, args.folder_depth),
+                               job_filter)
+
+        # A job named with -n was not listed, so it has no tree field.
+        field = None if args.name else args.fingerprint_field
+
+        def convert(job):
+            try:
+                if args.changed_only:
+                    return convert_changed_server_job(
+                        server, job, cache, writer, field, args.output_format)
+                return convert_server_job(server, job['name'], cache,
+                                          args.output_format)
+            except NotImplementedError as err:
+                return Skipped(job['name'], str(err))
+
+        # write YAML. The pool size caps the number of requests in flight
+        # against the Jenkins server. The pool consumes the job listing in
+        # the background, so workers start on the first jobs while folders
+        # are still being listed.
+        listing_errors = []
+        pool = ThreadPool(workers)
+        try:
+            for result in pool.imap_unordered(
+                    convert, catch_errors(jobs, listing_errors)):
+                save_outcome(result, writer, cache)
+        except Exception:
+            pool.terminate()
+            raise
+        pool.close()
+        pool.join()
+        # The jobs listed before an error have been converted.
+        if listing_errors:
+            raise listing_errors[0]
+
+    if args.macros is not None:
+        count = macros.write(writer, FORMATS[args.output_format])
+        log.info('wrote %d macros shared by at least %d jobs'
+                 % (count, args.macros))
+        macros.disable()
+        # The job files now use the macros, so --changed-only must not keep
+        # them as they are in a run without --macros.
+        if cache is not None:
+            cache.clear_fingerprints()
+    elif full_export(args):
+        # Every job was written in full, so the macros of an earlier run
+        # would only clash with them. After a partial run, the other job
+        # files may still use them.
+        writer.remove(macros.MACROS_NAME)
+
+    if args.templates is not None:
+        count, jobs = templates.write(writer, FORMATS[args.output_format])
+        log.info('wrote %d job templates for %d jobs' % (count, jobs))
+        templates.disable()
+        # The templated jobs have no file of their own, so --changed-only
+        # must not keep them as they are in a run without --templates.
+        if cache is not None:
+            cache.clear_fingerprints()
+    elif full_export(args):
+        # Every job was written in full, so the templates of an earlier run
+        # would only define them again. After a partial run, the templated
+        # jobs that it did not convert still need them.
+        writer.remove(templates.TEMPLATES_NAME)
+
+    if args.prune:
+        writer.prune()
+    writer.close()
+    log.info(writer.summary())
+
+    if cache is not None:
+        cache.close()
+        log.info(cache.summary())
+
+    if args.profile:
+        instrument.write_json(instrument.get_stats(), args.profile)
+        log.info('wrote conversion stats to %s' % args.profile)
+
+    if args.verify:
+        report = verify.get_report()
+        if args.verify_report:
+            report.write_json(args.verify_report)
+        log.info(report.summary())
+        if report.failed:
+            log.critical('%d jobs fail JJB verification: %s'
+                         % (len(report.failed), ', '.join(report.failed)))
+        if report.differ:
+            log.critical('%d jobs differ from JJB\'s XML: %s'
+                         % (len(report.differ), ', '.join(report.differ)))
+        if report.failed or report.differ:
+            exit(1)
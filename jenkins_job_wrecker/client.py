@@ -0,0 +1,165 @@
+import argparse
+import errno
+import logging
+import os
+import socket
+import sys
+import tempfile
+try:
+    from httplib import HTTPConnection
+    from urllib import urlencode
+except ImportError:
+    from http.client import HTTPConnection
+    from urllib.parse import urlencode
+from jenkins_job_wrecker.output import OutputWriter
+from jenkins_job_wrecker.sources import job_name_from_filename
+
+# A small client for the "jjwrecker serve" daemon (see server.py), for
+# tools that convert one job at a time, like pre-commit hooks.
+#
+# Starting Python and importing jjwrecker's handlers, yaml and the rest
+# takes longer than converting a job. This module only imports the standard
+# library and two small jjwrecker modules. It sends each job's XML to the
+# daemon, and only imports the converter itself if no daemon is running,
+# to convert the job in this process instead.
+#
+# The daemon listens on a Unix socket, default_socket() unless told
+# otherwise, or on a local HTTP port.
+
+log = logging.getLogger('jjwrecker')
+
+# Seconds to wait for the daemon to convert a job.
+TIMEOUT = 60
+
+
+class ConversionError(Exception):
+    pass
+
+
+# Return the path of the daemon's Unix socket: $JJW_SOCKET, or a file for
+# this user in the temporary directory.
+def default_socket():
+    return os.environ.get('JJW_SOCKET') or os.path.join(
+        tempfile.gettempdir(), 'jjwrecker-%d.sock' % os.getuid())
+
+
+# An HTTPConnection over a Unix socket.
+class UnixHTTPConnection(HTTPConnection):
+
+    def __init__(self, socket_path, timeout=TIMEOUT):
+        HTTPConnection.__init__(self, 'localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+# Convert a job's XML with the daemon, and return its YAML (or JSON) as
+# bytes. The daemon listens on "port" on "host" if a port is given, and on
+# the "socket_path" Unix socket otherwise. Raises socket.error if there is
+# no daemon, and ConversionError if the daemon cannot convert the job.
+def convert_on_daemon(name, xml, output_format='yaml', socket_path=None,
+                      host='127.0.0.1', port=None):
+    if port:
+        connection = HTTPConnection(host, port, timeout=TIMEOUT)
+    else:
+        connection = UnixHTTPConnection(socket_path or default_socket())
+    if not isinstance(xml, bytes):
+        xml = xml.encode('utf-8')
+    query = urlencode([('name', name), ('format', output_format)])
+    try:
+        connection.request('POST', '/convert?' + query, xml,
+                           {'Content-Type': 'application/xml'})
+        response = connection.getresponse()
+        body = response.read()
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise ConversionError(body.decode('utf-8', 'replace').strip())
+    return body
+
+
+# Convert a job's XML with the daemon if it is running, or else in this
+# process, and return its YAML (or JSON) as bytes. Either way, raises
+# ConversionError if the job cannot be converted.
+def convert(name, xml, output_format='yaml', socket_path=None,
+            host='127.0.0.1', port=None):
+    try:
+        return convert_on_daemon(name, xml, output_format, socket_path,
+                                 host, port)
+    except socket.error as err:
+        if err.errno not in (errno.ENOENT, errno.ECONNREFUSED):
+            raise
+    log.debug('no jjwrecker daemon is running, converting "%s" here' % name)
+    from jenkins_job_wrecker.cli import convert_xml
+    try:
+        return convert_xml(name, xml, output_format=output_format).yaml
+    except Exception as err:
+        # Report it like the daemon does.
+        raise ConversionError('%s: %s' % (type(err).__name__, err))
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description='Convert Jenkins XML jobs to YAML with a running '
+                    '"jjwrecker serve" daemon, or in this process if there '
+                    'is none. The YAML is written to output/<job>.yml.')
+    parser.add_argument(
+        'filenames',
+        nargs='+', metavar='FILE',
+        help='XML files to translate'
+    )
+    parser.add_argument(
+        '-n', '--name',
+        help='Name of the job, for a single XML file (default: from the '
+             'file name)'
+    )
+    parser.add_argument(
+        '--format',
+        dest='output_format', choices=['yaml', 'json'], default='yaml',
+        help='Format of the job files (default yaml)'
+    )
+    parser.add_argument(
+        '--socket',
+        help='Unix socket of the daemon (default: $JJW_SOCKET, or %s)'
+             % default_socket()
+    )
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help='Address of the daemon, with --port (default 127.0.0.1)'
+    )
+    parser.add_argument(
+        '-p', '--port',
+        type=int,
+        help='HTTP port of the daemon, instead of a Unix socket'
+    )
+    return parser.parse_args(args)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO,
+                        format='%(name)s %(levelname)s: %(message)s')
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.name and len(args.filenames) > 1:
+        log.critical('Choose a job name (-n) only for a single XML file.')
+        exit(1)
+    writer = OutputWriter('output')
+    for filename in args.filenames:
+        name = args.name or job_name_from_filename(filename)
+        with open(filename, 'rb') as f:
+            xml = f.read()
+        try:
+            text = convert(name, xml, args.output_format, args.socket,
+                           args.host, args.port)
+        except ConversionError as err:
+            log.critical('cannot convert job "%s": %s' % (name, err))
+            exit(1)
+        writer.write(name, text)
+    writer.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,481 @@
+import os
+import random
+from xml.sax.saxutils import escape
+
+# Generate synthetic Jenkins config.xml files for benchmarks. Each job is a
+# random mix of the plugins that job_handlers.py understands, in the XML
+# that Jenkins writes for them, so converting the corpus exercises the same
+# code paths as a real export. A small share of elements come from plugins
+# with no handler, so the raw XML fallback is exercised too.
+#
+# The generator is seeded, so the same arguments always make the same jobs.
+
+WORDS = ('ceph', 'build', 'deploy', 'test', 'release', 'docs', 'api', 'web',
+         'agent', 'core', 'client', 'server', 'tools', 'infra', 'package',
+         'lint', 'nightly', 'integration', 'smoke', 'perf')
+
+SHELL_LINES = (
+    'set -ex',
+    'echo "building $BRANCH on $NODE_NAME"',
+    'rm -rf "$WORKSPACE/dist" && mkdir -p "$WORKSPACE/dist"',
+    './configure --prefix=/usr --with-%(word)s',
+    'make -j$(nproc) %(word)s',
+    'if [ "$BRANCH" != "master" ]; then',
+    '    export RELEASE=0',
+    'fi',
+    'for f in *.rpm; do rpm -qip "$f"; done',
+    'python setup.py sdist --dist-dir "$WORKSPACE/dist"',
+    'tox -e py27,pep8 -- --junitxml=results/%(word)s.xml',
+    'curl -sSf -o /dev/null "https://example.com/%(word)s?build=$BUILD_ID"',
+    'grep -c ERROR build.log < /dev/null || true',
+    'ssh -o StrictHostKeyChecking=no deploy@%(word)s.example.com uptime',
+)
+
+EMAIL_TRIGGERS = ('AlwaysTrigger', 'UnstableTrigger', 'FirstFailureTrigger',
+                  'FailureTrigger', 'FixedTrigger', 'StillFailingTrigger',
+                  'SuccessTrigger', 'AbortedTrigger')
+
+# Elements from plugins that job_handlers.py does not handle, by the
+# section they appear in.
+UNHANDLED = {
+    'builders': '<hudson.plugins.gradle.Gradle plugin="gradle@1.24">'
+                '<tasks>%(word)s</tasks><useWrapper>true</useWrapper>'
+                '</hudson.plugins.gradle.Gradle>',
+    'publishers': '<hudson.plugins.warnings.WarningsPublisher '
+                  'plugin="warnings@4.0"><healthy>%(number)d</healthy>'
+                  '<canComputeNew>false</canComputeNew>'
+                  '</hudson.plugins.warnings.WarningsPublisher>',
+    'buildWrappers': '<hudson.plugins.timestamper.TimestamperBuildWrapper '
+                     'plugin="timestamper@1.5.15"/>',
+}
+
+# The default sizes of a job.
+DEFAULTS = {
+    # Mean number of builders, publishers and wrappers.
+    'builders': 3,
+    'publishers': 2,
+    'wrappers': 1,
+    # Mean number of lines in each shell script.
+    'script_lines': 20,
+    # Chance that each builder, publisher or wrapper has no handler.
+    'unhandled': 0.02,
+    # Share of matrix (multi-configuration) jobs.
+    'matrix': 0.1,
+}
+
+
+class JobGenerator(object):
+
+    def __init__(self, seed=0, **sizes):
+        unknown = set(sizes) - set(DEFAULTS)
+        if unknown:
+            raise TypeError('unknown job sizes: %s'
+                            % ', '.join(sorted(unknown)))
+        self.random = random.Random(seed)
+        self.sizes = dict(DEFAULTS, **sizes)
+
+    # Return a (name, xml) tuple for job number "index".
+    def job(self, index):
+        name = '%s-%s-%d' % (self.word(), self.word(), index)
+        return name, self.config_xml(name)
+
+    # Yield "count" (name, xml) jobs.
+    def jobs(self, count):
+        for index in range(count):
+            yield self.job(index)
+
+    def word(self):
+        return self.random.choice(WORDS)
+
+    def chance(self, probability):
+        return self.random.random() < probability
+
+    # Return a random count with the given mean.
+    def count(self, mean):
+        return int(self.random.expovariate(1.0 / mean)) if mean > 0 else 0
+
+    def fill(self, template):
+        return template % {'word': self.word(),
+                           'number': self.random.randint(1, 100)}
+
+    def config_xml(self, name):
+        matrix = self.chance(self.sizes['matrix'])
+        root = 'matrix-project' if matrix else 'project'
+        parts = [
+            "<?xml version='1.0' encoding='UTF-8'?>",
+            '<%s>' % root,
+            '  <actions/>',
+            '  <description>%s</description>' % escape(
+                'Builds %s for the %s team & friends' % (name, self.word())),
+            '  <keepDependencies>false</keepDependencies>',
+        ]
+        if self.chance(0.7):
+            parts.append(self.log_rotator())
+        parts.append(self.properties())
+        parts.append(self.scm())
+        parts.extend([
+            '  <canRoam>true</canRoam>',
+            '  <disabled>%s</disabled>' % ('true' if self.chance(0.05)
+                                          else 'false'),
+            '  <blockBuildWhenDownstreamBuilding>false'
+            '</blockBuildWhenDownstreamBuilding>',
+            '  <blockBuildWhenUpstreamBuilding>false'
+            '</blockBuildWhenUpstreamBuilding>',
+        ])
+        parts.append(self.triggers())
+        parts.append('  <concurrentBuild>%s</concurrentBuild>' % (
+            'true' if self.chance(0.3) else 'false'))
+        if matrix:
+            parts.append(self.axes())
+        parts.append(self.section('builders', self.sizes['builders'],
+                                  self.builder))
+        parts.append(self.section('publishers', self.sizes['publishers'],
+                                  self.publisher))
+        parts.append(self.section('buildWrappers', self.sizes['wrappers'],
+                                  self.wrapper))
+        if matrix:
+            parts.append('  <executionStrategy class="hudson.matrix.'
+                         'DefaultMatrixExecutionStrategyImpl">'
+                         '<runSequentially>false</runSequentially>'
+                         '</executionStrategy>')
+        parts.append('</%s>' % root)
+        return '\n'.join(parts).encode('utf-8') + b'\n'
+
+    # Return a section like <builders> of "mean" random elements from
+    # "make", or from a plugin without a handler.
+    def section(self, tag, mean, make):
+        elements = []
+        for _ in range(self.count(mean)):
+            if self.chance(self.sizes['unhandled']):
+                elements.append(self.fill(UNHANDLED[tag]))
+            else:
+                elements.append(make())
+        if not elements:
+            return '  <%s/>' % tag
+        return '  <%s>\n%s\n  </%s>' % (tag, '\n'.join(elements), tag)
+
+    def log_rotator(self):
+        return ('  <logRotator class="hudson.tasks.LogRotator">'
+                '<daysToKeep>%d</daysToKeep><numToKeep>%d</numToKeep>'
+                '<artifactDaysToKeep>-1</artifactDaysToKeep>'
+                '<artifactNumToKeep>-1</artifactNumToKeep></logRotator>'
+                % (self.random.choice((-1, 7, 30)),
+                   self.random.choice((-1, 10, 50))))
+
+    def properties(self):
+        properties = []
+        if self.chance(0.3):
+            properties.append(
+                '<com.coravy.hudson.plugins.github.GithubProjectProperty>'
+                '<projectUrl>https://github.com/example/%s/</projectUrl>'
+                '</com.coravy.hudson.plugins.github.GithubProjectProperty>'
+                % self.word())
+        if self.chance(0.6):
+            parameters = []
+            for _ in range(1 + self.count(2)):
+                if self.chance(0.7):
+                    parameters.append(
+                        '<hudson.model.StringParameterDefinition>'
+                        '<name>%s</name><description>The %s to build'
+                        '</description><defaultValue>%s</defaultValue>'
+                        '</hudson.model.StringParameterDefinition>'
+                        % (self.word().upper(), self.word(), self.word()))
+                else:
+                    parameters.append(
+                        '<hudson.model.BooleanParameterDefinition>'
+                        '<name>%s</name><description/>'
+                        '<defaultValue>%s</defaultValue>'
+                        '</hudson.model.BooleanParameterDefinition>'
+                        % (self.word().upper(),
+                           self.random.choice(('true', 'false'))))
+            properties.append(
+                '<hudson.model.ParametersDefinitionProperty>'
+                '<parameterDefinitions>%s</parameterDefinitions>'
+                '</hudson.model.ParametersDefinitionProperty>'
+                % ''.join(parameters))
+        if self.chance(0.2):
+            properties.append(
+                '<jenkins.plugins.slack.SlackNotifier_-SlackJobProperty '
+                'plugin="slack@1.8"><teamDomain/><token/>'
+                '<room>#%s</room><startNotification>false</startNotification>'
+                '<notifySuccess>true</notifySuccess>'
+                '<notifyAborted>false</notifyAborted>'
+                '<notifyNotBuilt>false</notifyNotBuilt>'
+                '<notifyUnstable>true</notifyUnstable>'
+                '<notifyFailure>true</notifyFailure>'
+                '<notifyBackToNormal>true</notifyBackToNormal>'
+                '<notifyRepeatedFailure>false</notifyRepeatedFailure>'
+                '<includeTestSummary>false</includeTestSummary>'
+                '<showCommitList>true</showCommitList>'
+                '<includeCustomMessage>false</includeCustomMessage>'
+                '<customMessage/>'
+                '</jenkins.plugins.slack.SlackNotifier_-SlackJobProperty>'
+                % self.word())
+        if not properties:
+            return '  <properties/>'
+        return '  <properties>\n    %s\n  </properties>' % \
+            '\n    '.join(properties)
+
+    def scm(self):
+        if self.chance(0.15):
+            return '  <scm class="hudson.scm.NullSCM"/>'
+        extensions = []
+        if self.chance(0.4):
+            extensions.append(
+                '<hudson.plugins.git.extensions.impl.RelativeTargetDirectory>'
+                '<relativeTargetDir>%s</relativeTargetDir>'
+                '</hudson.plugins.git.extensions.impl.RelativeTargetDirectory>'
+                % self.word())
+        if self.chance(0.3):
+            extensions.append(
+                '<hudson.plugins.git.extensions.impl.CloneOption>'
+                '<shallow>true</shallow><reference>/srv/git/%s</reference>'
+                '</hudson.plugins.git.extensions.impl.CloneOption>'
+                % self.word())
+        if self.chance(0.3):
+            extensions.append(
+                '<hudson.plugins.git.extensions.impl.WipeWorkspace/>')
+        if self.chance(0.2):
+            extensions.append(
+                '<hudson.plugins.git.extensions.impl.CleanCheckout/>')
+        if self.chance(0.2):
+            extensions.append(
+                '<hudson.plugins.git.extensions.impl.LocalBranch>'
+                '<localBranch>%s</localBranch>'
+                '</hudson.plugins.git.extensions.impl.LocalBranch>'
+                % self.word())
+        return ('  <scm class="hudson.plugins.git.GitSCM" plugin="git@2.3.5">'
+                '<configVersion>2</configVersion><userRemoteConfigs>'
+                '<hudson.plugins.git.UserRemoteConfig>'
+                '<url>https://github.com/example/%s.git</url>'
+                '</hudson.plugins.git.UserRemoteConfig></userRemoteConfigs>'
+                '<branches><hudson.plugins.git.BranchSpec><name>%s</name>'
+                '</hudson.plugins.git.BranchSpec></branches>'
+                '<doGenerateSubmoduleConfigurations>false'
+                '</doGenerateSubmoduleConfigurations>'
+                '<submoduleCfg class="list"/><extensions>%s</extensions>'
+                '</scm>'
+                % (self.word(), self.random.choice(('master', '$BRANCH',
+                                                    'origin/stable')),
+                   ''.join(extensions)))
+
+    def triggers(self):
+        triggers = []
+        if self.chance(0.3):
+            triggers.append(
+                '<hudson.triggers.TimerTrigger><spec>H %d * * *</spec>'
+                '</hudson.triggers.TimerTrigger>'
+                % self.random.randint(0, 23))
+        if self.chance(0.2):
+            triggers.append(
+                '<hudson.triggers.SCMTrigger><spec>H/15 * * * *</spec>'
+                '<ignorePostCommitHooks>false</ignorePostCommitHooks>'
+                '</hudson.triggers.SCMTrigger>')
+        if self.chance(0.25):
+            triggers.append(self.gerrit_trigger())
+        if not triggers:
+            return '  <triggers/>'
+        return '  <triggers>\n    %s\n  </triggers>' % '\n    '.join(triggers)
+
+    def gerrit_trigger(self):
+        prefix = 'com.sonyericsson.hudson.plugins.gerrit.trigger.hudsontrigger'
+        return (
+            '<%(p)s.GerritTrigger><spec/><gerritProjects>'
+            '<%(p)s.data.GerritProject><compareType>PLAIN</compareType>'
+            '<pattern>%(project)s</pattern><branches>'
+            '<%(p)s.data.Branch><compareType>ANT</compareType>'
+            '<pattern>**</pattern></%(p)s.data.Branch></branches>'
+            '</%(p)s.data.GerritProject></gerritProjects>'
+            '<skipVote><onSuccessful>false</onSuccessful>'
+            '<onFailed>false</onFailed><onUnstable>false</onUnstable>'
+            '<onNotBuilt>false</onNotBuilt></skipVote>'
+            '<silentMode>false</silentMode>'
+            '<escapeQuotes>true</escapeQuotes>'
+            '<triggerOnEvents>'
+            '<%(p)s.events.PluginPatchsetCreatedEvent>'
+            '<excludeDrafts>true</excludeDrafts>'
+            '<excludeTrivialRebase>false</excludeTrivialRebase>'
+            '<excludeNoCodeChange>false</excludeNoCodeChange>'
+            '</%(p)s.events.PluginPatchsetCreatedEvent>'
+            '</triggerOnEvents><serverName>__ANY__</serverName>'
+            '</%(p)s.GerritTrigger>'
+            % {'p': prefix, 'project': self.word()})
+
+    def axes(self):
+        return ('  <axes><hudson.matrix.LabelExpAxis><name>dist</name>'
+                '<values>%s</values></hudson.matrix.LabelExpAxis>'
+                '<hudson.matrix.LabelAxis><name>label</name><values>'
+                '<string>%s</string></values></hudson.matrix.LabelAxis>'
+                '</axes>'
+                % (''.join('<string>%s</string>' % dist for dist in
+                           self.random.sample(('centos7', 'xenial', 'bionic',
+                                               'rhel8', 'focal'), 2)),
+                   self.word()))
+
+    def shell_script(self):
+        lines = ['#!/bin/bash']
+        for _ in range(1 + self.count(self.sizes['script_lines'])):
+            lines.append(self.fill(self.random.choice(SHELL_LINES)))
+        return escape('\n'.join(lines) + '\n')
+
+    def builder(self):
+        kind = self.random.random()
+        if kind < 0.6:
+            return ('    <hudson.tasks.Shell><command>%s</command>'
+                    '</hudson.tasks.Shell>' % self.shell_script())
+        if kind < 0.75:
+            return ('    <hudson.plugins.copyartifact.CopyArtifact '
+                    'plugin="copyartifact@1.35.1"><project>%s</project>'
+                    '<filter>dist/*.tar.gz</filter><target>$WORKSPACE'
+                    '</target><excludes/><selector class="hudson.plugins.'
+                    'copyartifact.StatusBuildSelector"/><flatten>true'
+                    '</flatten><doNotFingerprintArtifacts>false'
+                    '</doNotFingerprintArtifacts>'
+                    '</hudson.plugins.copyartifact.CopyArtifact>'
+                    % self.word())
+        if kind < 0.9:
+            return ('    <org.jenkinsci.plugins.conditionalbuildstep.'
+                    'singlestep.SingleConditionalBuilder>'
+                    '<condition class="org.jenkins_ci.plugins.run_condition.'
+                    'core.ExpressionCondition"><expression>%s.*</expression>'
+                    '<label>$BRANCH</label></condition>'
+                    '<runner class="org.jenkins_ci.plugins.run_condition.'
+                    'BuildStepRunner$Fail"/>'
+                    '<buildStep class="hudson.tasks.Shell"><command>%s'
+                    '</command></buildStep>'
+                    '</org.jenkinsci.plugins.conditionalbuildstep.'
+                    'singlestep.SingleConditionalBuilder>'
+                    % (self.word(), self.shell_script()))
+        return ('    <hudson.plugins.parameterizedtrigger.TriggerBuilder>'
+                '<configs><hudson.plugins.parameterizedtrigger.'
+                'BlockableBuildTriggerConfig><configs><hudson.plugins.'
+                'parameterizedtrigger.PredefinedBuildParameters>'
+                '<properties>BRANCH=$BRANCH</properties></hudson.plugins.'
+                'parameterizedtrigger.PredefinedBuildParameters></configs>'
+                '<projects>%s-%s</projects><condition>ALWAYS</condition>'
+                '<triggerWithNoParameters>false</triggerWithNoParameters>'
+                '<buildAllNodesWithLabel>false</buildAllNodesWithLabel>'
+                '</hudson.plugins.parameterizedtrigger.'
+                'BlockableBuildTriggerConfig></configs>'
+                '</hudson.plugins.parameterizedtrigger.TriggerBuilder>'
+                % (self.word(), self.word()))
+
+    def publisher(self):
+        kind = self.random.random()
+        if kind < 0.25:
+            return ('    <hudson.tasks.ArtifactArchiver><artifacts>dist/*'
+                    '</artifacts><allowEmptyArchive>false</allowEmptyArchive>'
+                    '<onlyIfSuccessful>false</onlyIfSuccessful>'
+                    '<fingerprint>true</fingerprint>'
+                    '<defaultExcludes>true</defaultExcludes>'
+                    '</hudson.tasks.ArtifactArchiver>')
+        if kind < 0.45:
+            return ('    <hudson.tasks.junit.JUnitResultArchiver>'
+                    '<testResults>results/*.xml</testResults>'
+                    '<keepLongStdio>false</keepLongStdio>'
+                    '<healthScaleFactor>1.0</healthScaleFactor>'
+                    '</hudson.tasks.junit.JUnitResultArchiver>')
+        if kind < 0.7:
+            triggers = ''.join(
+                '<hudson.plugins.emailext.plugins.trigger.%s><email>'
+                '<recipientList/><subject>$PROJECT_DEFAULT_SUBJECT</subject>'
+                '<body>$PROJECT_DEFAULT_CONTENT</body><recipientProviders>'
+                '<hudson.plugins.emailext.plugins.recipients.'
+                'DevelopersRecipientProvider/></recipientProviders>'
+                '<attachmentsPattern/><attachBuildLog>false</attachBuildLog>'
+                '<compressBuildLog>false</compressBuildLog>'
+                '<replyTo>$PROJECT_DEFAULT_REPLYTO</replyTo>'
+                '<contentType>project</contentType></email>'
+                '</hudson.plugins.emailext.plugins.trigger.%s>'
+                % (trigger, trigger) for trigger in
+                self.random.sample(EMAIL_TRIGGERS, 2))
+            return ('    <hudson.plugins.emailext.ExtendedEmailPublisher '
+                    'plugin="email-ext@2.40.5"><recipientList>'
+                    '%s@example.com</recipientList><configuredTriggers>%s'
+                    '</configuredTriggers><contentType>default</contentType>'
+                    '<defaultSubject>$DEFAULT_SUBJECT</defaultSubject>'
+                    '<defaultContent>$DEFAULT_CONTENT</defaultContent>'
+                    '<attachmentsPattern/><presendScript>'
+                    '$DEFAULT_PRESEND_SCRIPT</presendScript>'
+                    '<attachBuildLog>false</attachBuildLog>'
+                    '<compressBuildLog>false</compressBuildLog>'
+                    '<replyTo>$DEFAULT_REPLYTO</replyTo>'
+                    '<saveOutput>false</saveOutput><disabled>false</disabled>'
+                    '</hudson.plugins.emailext.ExtendedEmailPublisher>'
+                    % (self.word(), triggers))
+        if kind < 0.8:
+            return ('    <hudson.tasks.Mailer plugin="mailer@1.15">'
+                    '<recipients>%s@example.com</recipients>'
+                    '<dontNotifyEveryUnstableBuild>false'
+                    '</dontNotifyEveryUnstableBuild>'
+                    '<sendToIndividuals>true</sendToIndividuals>'
+                    '</hudson.tasks.Mailer>' % self.word())
+        if kind < 0.9:
+            return ('    <jenkins.plugins.slack.SlackNotifier plugin='
+                    '"slack@1.8"><teamDomain>example</teamDomain>'
+                    '<buildServerUrl>http://jenkins.example.com/'
+                    '</buildServerUrl><authToken>token</authToken><room/>'
+                    '</jenkins.plugins.slack.SlackNotifier>')
+        return ('    <hudson.tasks.Fingerprinter><targets>dist/*</targets>'
+                '<recordBuildArtifacts>false</recordBuildArtifacts>'
+                '</hudson.tasks.Fingerprinter>')
+
+    def wrapper(self):
+        kind = self.random.random()
+        if kind < 0.5:
+            return ('    <hudson.plugins.build__timeout.BuildTimeoutWrapper '
+                    'plugin="build-timeout@1.14.1"><strategy class="hudson.'
+                    'plugins.build_timeout.impl.AbsoluteTimeOutStrategy">'
+                    '<timeoutMinutes>%d</timeoutMinutes></strategy>'
+                    '<operationList><hudson.plugins.build__timeout.'
+                    'operations.FailOperation/></operationList>'
+                    '</hudson.plugins.build__timeout.BuildTimeoutWrapper>'
+                    % self.random.choice((30, 60, 120, 240)))
+        if kind < 0.75:
+            return ('    <hudson.plugins.ansicolor.AnsiColorBuildWrapper '
+                    'plugin="ansicolor@0.4.1"><colorMapName>xterm'
+                    '</colorMapName>'
+                    '</hudson.plugins.ansicolor.AnsiColorBuildWrapper>')
+        if kind < 0.9:
+            return ('    <com.cloudbees.jenkins.plugins.sshagent.'
+                    'SSHAgentBuildWrapper plugin="ssh-agent@1.5">'
+                    '<credentialIds><string>%s-deploy-key</string>'
+                    '</credentialIds><ignoreMissing>false</ignoreMissing>'
+                    '</com.cloudbees.jenkins.plugins.sshagent.'
+                    'SSHAgentBuildWrapper>' % self.word())
+        return ('    <org.jenkinsci.plugins.buildnamesetter.BuildNameSetter '
+                'plugin="build-name-setter@1.3"><template>#${BUILD_NUMBER}-'
+                '${GIT_BRANCH}</template>'
+                '</org.jenkinsci.plugins.buildnamesetter.BuildNameSetter>')
+
+
+FOLDER_XML = b"""<?xml version='1.0' encoding='UTF-8'?>
+<com.cloudbees.hudson.plugins.folder.Folder plugin="cloudbees-folder@6.4">
+  <actions/>
+  <properties/>
+</com.cloudbees.hudson.plugins.folder.Folder>
+"""
+
+
+# Write "count" generated jobs into a JENKINS_HOME-like directory, as
+# jobs/<name>/config.xml, and return the number written. With "folders",
+# the jobs are spread over that many folders, as
+# jobs/folder-<n>/jobs/<name>/config.xml.
+def write_jenkins_home(directory, count, seed=0, folders=0, **sizes):
+    generator = JobGenerator(seed, **sizes)
+    jobs_dir = os.path.join(directory, 'jobs')
+    for folder in range(folders):
+        folder_dir = os.path.join(jobs_dir, 'folder-%d' % folder)
+        os.makedirs(os.path.join(folder_dir, 'jobs'))
+        with open(os.path.join(folder_dir, 'config.xml'), 'wb') as f:
+            f.write(FOLDER_XML)
+    for index, (name, xml) in enumerate(generator.jobs(count)):
+        if folders:
+            job_dir = os.path.join(jobs_dir, 'folder-%d' % (index % folders),
+                                   'jobs', name)
+        else:
+            job_dir = os.path.join(jobs_dir, name)
+        os.makedirs(job_dir)
+        with open(os.path.join(job_dir, 'config.xml'), 'wb') as f:
+            f.write(xml)
+    return count
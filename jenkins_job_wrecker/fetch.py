@@ -0,0 +1,164 @@
+import json
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+try:
+    from urllib import quote
+except ImportError:
+    from urllib.parse import quote
+
+CRUMB_URL = 'crumbIssuer/api/json'
+
+# How many times to retry a request that fails with one of RETRY_STATUSES,
+# or cannot connect, and the backoff factor between the retries.
+RETRIES = 3
+RETRY_BACKOFF = 0.1
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Map response headers that fingerprint a config.xml to the request headers
+# that make a conditional request.
+CONDITIONAL_HEADERS = {
+    'ETag': 'If-None-Match',
+    'Last-Modified': 'If-Modified-Since',
+}
+
+
+# Return True if a job from the tree API is a folder (or an organization
+# folder) that holds other jobs.
+def is_folder(job):
+    return job.get('_class', '').endswith('Folder')
+
+
+# Return a job name from the JSON API as a native str where it is ASCII.
+# Python 2's json module returns unicode, which the YAML writers would tag
+# as !!python/unicode (and dump slowly), unlike names read from disk or the
+# command line.
+def native_name(name):
+    if not isinstance(name, str):
+        try:
+            return name.encode('ascii')
+        except UnicodeEncodeError:
+            pass
+    return name
+
+
+# Fetch job data from a Jenkins server over a pool of keep-alive
+# connections.
+#
+# This offers the small part of the python-jenkins "Jenkins" API that
+# jjwrecker needs: listing jobs and fetching their config.xml. Every
+# request shares one requests.Session, so TCP and TLS connections are reused
+# between jobs, and the crumb is only looked up once. The connection pool is
+# bounded: a worker waits for a free connection instead of opening a new
+# one. Every request is a GET, so a request that a busy master fails with a
+# 5xx error is retried "retries" times before the error is raised.
+class JenkinsFetcher(object):
+
+    def __init__(self, url, username=None, password=None, pool_size=10,
+                 timeout=None, retries=RETRIES):
+        if not url.endswith('/'):
+            url += '/'
+        self.server = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=RETRY_BACKOFF,
+                      status_forcelist=RETRY_STATUSES, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              pool_block=True, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept-Encoding'] = 'gzip'
+        if username is not None and password is not None:
+            self.session.auth = (username, password)
+        self.crumb = None
+        self._crumb_lock = threading.Lock()
+
+    # Return the URL for a (possibly foldered) job name, like "a/b".
+    def job_url(self, name):
+        parts = [quote(part.encode('utf-8')) for part in name.split('/')]
+        return self.server + ''.join('job/%s/' % part for part in parts)
+
+    # Look up the CSRF crumb once and reuse it for every later request.
+    def get_crumb(self):
+        with self._crumb_lock:
+            if self.crumb is None:
+                response = self.session.get(self.server + CRUMB_URL,
+                                            timeout=self.timeout)
+                if response.status_code == 404:
+                    self.crumb = False
+                else:
+                    response.raise_for_status()
+                    self.crumb = response.json()
+        return self.crumb
+
+    def request(self, url, **kwargs):
+        headers = kwargs.pop('headers', {})
+        crumb = self.get_crumb()
+        if crumb:
+            headers[crumb['crumbRequestField']] = crumb['crumb']
+        response = self.session.get(url, headers=headers,
+                                    timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    # Yield every job on the server, descending into folders up to
+    # "folder_depth" levels deep (None means no limit). Jobs are yielded as
+    # soon as their folder is listed, so callers can start on the first jobs
+    # while the rest of the tree is still being listed. Each job is a dict
+    # with the job's full "folder/job" name, its "_class", and a key for
+    # each of the extra tree API "fields".
+    def iter_jobs(self, fields=(), folder_depth=None):
+        return self._iter_folder(self.server, '', tuple(fields), folder_depth)
+
+    def _iter_folder(self, url, prefix, fields, folder_depth):
+        tree = 'jobs[%s]' % ','.join(('name', '_class') + fields)
+        response = self.request(url + 'api/json', params={'tree': tree})
+        folders = []
+        for job in json.loads(response.text)['jobs']:
+            job['name'] = native_name(prefix + job['name'])
+            if is_folder(job):
+                folders.append(job['name'])
+            else:
+                yield job
+        if folder_depth is not None:
+            if folder_depth <= 0:
+                return
+            folder_depth -= 1
+        for folder in folders:
+            for job in self._iter_folder(self.job_url(folder), folder + '/',
+                                         fields, folder_depth):
+                yield job
+
+    # Return a job's config.xml as bytes. The XML parser decodes it with the
+    # document's own encoding declaration, which the Content-Type header
+    # does not always match.
+    def get_job_config(self, name):
+        response = self.request(self.job_url(name) + 'config.xml')
+        return response.content
+
+    # Fetch a job's config.xml unless it still matches a fingerprint from
+    # get_job_config_if_changed(). The fingerprint is built from the ETag or
+    # Last-Modified response headers, and sent back as a conditional
+    # request. Returns an (xml, fingerprint) tuple, where xml is bytes, or
+    # None if the config is unchanged. The fingerprint is None if the server
+    # sent neither header. A fingerprint of another kind, like one from a
+    # tree API field, cannot be checked by the server, so the config is
+    # fetched.
+    def get_job_config_if_changed(self, name, fingerprint=None):
+        headers = {}
+        if fingerprint:
+            header, value = fingerprint.split(':', 1)
+            if header in CONDITIONAL_HEADERS:
+                headers[CONDITIONAL_HEADERS[header]] = value
+            else:
+                fingerprint = None
+        response = self.request(self.job_url(name) + 'config.xml',
+                                headers=headers)
+        if response.status_code == 304:
+            return None, fingerprint
+        for header in ('ETag', 'Last-Modified'):
+            if header in response.headers:
+                return response.content, '%s:%s' % (
+                    header, response.headers[header])
+        return response.content, None
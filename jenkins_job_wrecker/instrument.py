@@ -0,0 +1,266 @@
+from collections import OrderedDict
+import cProfile
+import errno
+import functools
+import json
+import logging
+import os
+import threading
+import timeit
+from jenkins_job_wrecker.registry import registry
+
+# Instrumentation for bulk conversions: how often each handler runs, how
+# long it takes, how much output it makes, and which plugins fall back to
+# raw XML.
+#
+# It is off by default. enable() switches it on for this process: the
+# registry then hands out timed wrappers of its handlers (see timed()), and
+# every job's parse, convert and emit phases are timed too. Worker
+# processes collect their own Stats, and send them back with each Result
+# (see take() and merge()).
+#
+# Raw fallbacks are always logged, as "going raw because: ..." events on
+# the "jjwrecker.raw" logger, with the element's kind and tag as extra
+# fields. Raise that logger's level to drop them.
+
+raw_log = logging.getLogger('jjwrecker.raw')
+
+timer = timeit.default_timer
+
+# The Stats of this process, or None when instrumentation is off.
+_stats = None
+# A directory for one cProfile file per job, or None.
+_cprofile_dir = None
+# Timed wrappers of handlers, by handler.
+_timed = {}
+# The seconds each thread has spent measuring the size of handler results.
+_overhead = threading.local()
+
+
+class Stats(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # handler name -> {'kind', 'calls', 'seconds', 'bytes', 'errors'}
+        self.handlers = {}
+        # kind -> tag -> number of elements written as raw XML
+        self.raw = {}
+        # phase ("parse", "convert", "emit") -> seconds
+        self.phases = {}
+        self.jobs = 0
+        self.output_bytes = 0
+
+    def add_call(self, kind, name, seconds, size, errors, calls=1):
+        with self._lock:
+            handler = self.handlers.get(name)
+            if handler is None:
+                handler = self.handlers[name] = OrderedDict([
+                    ('kind', kind), ('calls', 0), ('seconds', 0.0),
+                    ('bytes', 0), ('errors', 0)])
+            handler['calls'] += calls
+            handler['seconds'] += seconds
+            handler['bytes'] += size
+            handler['errors'] += errors
+
+    def add_raw(self, kind, tag, count=1):
+        with self._lock:
+            tags = self.raw.setdefault(kind, {})
+            tags[tag] = tags.get(tag, 0) + count
+
+    def add_phase(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    def add_job(self, output_bytes):
+        with self._lock:
+            self.jobs += 1
+            self.output_bytes += output_bytes
+
+    # Add the counts of another Stats, or of its as_dict().
+    def merge(self, other):
+        if isinstance(other, Stats):
+            other = other.as_dict()
+        for name, handler in other['handlers'].items():
+            self.add_call(handler['kind'], name, handler['seconds'],
+                          handler['bytes'], handler['errors'],
+                          handler['calls'])
+        for kind, tags in other['raw'].items():
+            for tag, count in tags.items():
+                self.add_raw(kind, tag, count)
+        for phase, seconds in other['phases'].items():
+            self.add_phase(phase, seconds)
+        with self._lock:
+            self.jobs += other['jobs']
+            self.output_bytes += other['output_bytes']
+
+    # Return the stats as plain data for JSON, with the slowest handlers
+    # first.
+    def as_dict(self):
+        with self._lock:
+            handlers = sorted(self.handlers.items(),
+                              key=lambda item: (-item[1]['seconds'], item[0]))
+            return OrderedDict([
+                ('jobs', self.jobs),
+                ('output_bytes', self.output_bytes),
+                ('phases', dict(self.phases)),
+                ('handlers', OrderedDict((name, OrderedDict(handler))
+                                         for name, handler in handlers)),
+                ('raw', dict((kind, dict(tags))
+                             for kind, tags in self.raw.items())),
+            ])
+
+
+# Switch instrumentation on for this process. With "cprofile_dir", each
+# converted job is also profiled with cProfile, and its stats written to
+# <cprofile_dir>/<job name>.prof.
+def enable(cprofile_dir=None):
+    global _stats, _cprofile_dir
+    _stats = Stats()
+    _cprofile_dir = cprofile_dir
+    registry.wrapper = timed
+
+
+def disable():
+    global _stats, _cprofile_dir
+    _stats = None
+    _cprofile_dir = None
+    registry.wrapper = None
+
+
+def enabled():
+    return _stats is not None
+
+
+# Return the arguments to enable() in this process, for worker processes
+# to pass to configure(), or None if instrumentation is off.
+def settings():
+    if _stats is None:
+        return None
+    return {'cprofile_dir': _cprofile_dir}
+
+
+def configure(settings):
+    if settings is None:
+        disable()
+    else:
+        enable(**settings)
+
+
+def get_stats():
+    return _stats
+
+
+# Return the stats collected so far as a dict, and start counting again
+# from zero. Returns None if instrumentation is off.
+def take():
+    global _stats
+    if _stats is None:
+        return None
+    stats, _stats = _stats, Stats()
+    return stats.as_dict()
+
+
+# Add a worker's take() to this process's stats.
+def merge(stats):
+    if _stats is not None and stats is not None:
+        _stats.merge(stats)
+
+
+# Return a wrapper for a registered handler that records each call in the
+# stats: its time (including any handlers it calls in turn), the size of
+# its result as compact JSON, and whether it raised. The time spent sizing
+# the results of the handlers it calls is left out of its own time.
+def timed(kind, handler):
+    wrapper = _timed.get(handler)
+    if wrapper is not None:
+        return wrapper
+
+    @functools.wraps(handler)
+    def wrapper(element):
+        error = 1
+        sized = overhead()
+        start = timer()
+        try:
+            result = handler(element)
+            error = 0
+            return result
+        finally:
+            end = timer()
+            seconds = end - start - (overhead() - sized)
+            stats = _stats
+            if stats is not None:
+                size = 0 if error else json_size(result)
+                _overhead.seconds = overhead() + timer() - end
+                stats.add_call(kind, handler.__name__, seconds, size, error)
+
+    _timed[handler] = wrapper
+    return wrapper
+
+
+# Return the seconds this thread has spent sizing handler results, for
+# timers that wrap handlers and should leave that time out.
+def overhead():
+    return getattr(_overhead, 'seconds', 0.0)
+
+
+def json_size(value):
+    if value is None:
+        return 0
+    try:
+        return len(json.dumps(value, separators=(',', ':')))
+    except (TypeError, ValueError):
+        return 0
+
+
+# Record the time of one phase of converting a job.
+def add_phase(phase, seconds):
+    if _stats is not None:
+        _stats.add_phase(phase, seconds)
+
+
+# Record one converted job, with the size of its output.
+def add_job(output):
+    if _stats is not None:
+        _stats.add_job(len(output))
+
+
+# Log and count an element that is written as raw XML, because no handler
+# could translate it.
+def going_raw(kind, element, reason):
+    if _stats is not None:
+        _stats.add_raw(kind, element.tag)
+    if raw_log.isEnabledFor(logging.INFO):
+        raw_log.info('going raw because: %s', reason,
+                     extra={'event': 'raw', 'kind': kind, 'tag': element.tag})
+
+
+# Return a cProfile.Profile for a job if per-job profiling is on, or None.
+def start_job_profile():
+    if _cprofile_dir is None:
+        return None
+    profile = cProfile.Profile()
+    profile.enable()
+    return profile
+
+
+# Stop a start_job_profile() profile, and write its stats for the job.
+def finish_job_profile(profile, name):
+    if profile is None:
+        return
+    profile.disable()
+    filename = os.path.join(_cprofile_dir, name + '.prof')
+    try:
+        os.makedirs(os.path.dirname(filename))
+    except OSError as exception:
+        if exception.errno != errno.EEXIST:
+            raise
+    profile.dump_stats(filename)
+
+
+# Write stats (a Stats, or its as_dict()) to a JSON file.
+def write_json(stats, filename):
+    if isinstance(stats, Stats):
+        stats = stats.as_dict()
+    with open(filename, 'w') as f:
+        json.dump(stats, f, indent=2)
+        f.write('\n')
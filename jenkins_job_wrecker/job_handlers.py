@@ -2,6 +2,9 @@ import logging
 import re
 import pprint
 from collections import OrderedDict
+from jenkins_job_wrecker.instrument import going_raw
+from jenkins_job_wrecker.registry import registry, register
+import jenkins_job_wrecker.xml_backend as xml_backend
 
 logging.basicConfig(level=logging.INFO)
 log = logging.getLogger(__name__)
@@ -19,6 +22,7 @@ def dict_merge(a, b):
     return result
 
 # Handle "<actions/>"
+@register('job', 'actions')
 def handle_actions(top):
     # Nothing to do if it's empty.
     # Otherwise...
@@ -28,11 +32,13 @@ def handle_actions(top):
 
 
 # Handle "<description>my cool job</description>"
+@register('job', 'description')
 def handle_description(top):
     return [['description', top.text]]
 
 
 # Handle "<keepDependencies>false</keepDependencies>"
+@register('job', 'keepdependencies')
 def handle_keepdependencies(top):
     # JJB cannot handle any other value than false, here.
     # There is no corresponding YAML option.
@@ -40,85 +46,37 @@ def handle_keepdependencies(top):
 
 
 # Handle "<properties>..."
+#
+# Property handlers return a list of [key, value] pairs. "properties" and
+# "parameters" values are added to those lists, and any other key is a
+# job-level setting.
+@register('job', 'properties')
 def handle_properties(top):
     properties = []
     parameters = []
     result = [['properties', properties], ['parameters', parameters]]
     for child in top:
         try:
-            # GitHub
-            if child.tag == 'com.coravy.hudson.plugins.github.GithubProjectProperty':   # NOQA
-                github = handle_github_project_property(child)
-                properties.append(github)
-
-            # Parameters
-            elif child.tag == 'hudson.model.ParametersDefinitionProperty':
-                parametersdefs = handle_parameters_property(child)
-                for pd in parametersdefs:
-                    parameters.append(pd)
-            elif child.tag == 'com.sonyericsson.rebuild.RebuildSettings':
-                rebuild = handle_rebuild_settings_property(child)
-                properties.append(rebuild)
-            elif child.tag == 'hudson.plugins.copyartifact.CopyArtifactPermissionProperty':
-                copy_artifact = handle_copy_artifact_property(child)
-                properties.append(copy_artifact)
-                    
-            elif child.tag == 'jenkins.plugins.slack.SlackNotifier_-SlackJobProperty':
-                slack = OrderedDict()
-
-                known_slack_properties = {
-                    'startNotification': 'notify-start',
-                    'notifySuccess': 'notify-success',
-                    'notifyAborted': 'notify-aborted',
-                    'notifyNotBuilt': 'notify-not-built',
-                    'notifyUnstable': 'notify-unstable',
-                    'notifyFailure': 'notify-failure',
-                    'notifyRepeatedFailure': 'notify-repeated-failure',
-                    'notifyBackToNormal': 'notify-back-to-normal',
-                    'includeTestSummary': 'include-test-summary',
-                    'showCommitList': 'show-commit-list',
-                }
-
-                customMessageEnabled = False
-                customMessage = ''
-
-                enableSlack = False
-
-                for slackProp in child:
-                    if slackProp.tag in known_slack_properties:
-                        if slackProp.text == 'true':
-                            slack[known_slack_properties[slackProp.tag]] = True
-                            enableSlack = True
-                    elif slackProp.tag == 'includeCustomMessage':
-                        customMessageEnabled = slackProp.text == 'true'
-                    elif slackProp.tag == 'customMessage':
-                        customMessage = slackProp.text
-                    elif slackProp.tag == 'room':
-                        if slackProp.text:
-                            slack['room'] = slackProp.text
-                    elif slackProp.tag in ['teamDomain', 'token'] and not(slackProp.text) == 0:
-                        pass
-                    else:
-                        raise NotImplementedError("cannot handle Slack property %s" % slackProp.tag)
-
-                if customMessageEnabled:
-                    slack['custom-message'] = customMessage
-
-                if enableSlack:
-                    slack = OrderedDict([('enabled', True)] + slack.items())
-                    result.append(['slack', slack])
-
-            else:
+            handler = registry.lookup('property', child)
+            if handler is None:
                 raise NotImplementedError("cannot handle property %s" % child.tag)
+            for key, value in handler(child):
+                if key == 'properties':
+                    properties.append(value)
+                elif key == 'parameters':
+                    parameters.append(value)
+                else:
+                    result.append([key, value])
 
         except NotImplementedError, e:
-            print "going raw because: %s" % e
+            going_raw('property', child, e)
             insert_rawxml(child, properties)
 
     return result
 
 
 # Handle "<com.coravy.hudson.plugins.github.GithubProjectProperty>..."
+@register('property', 'com.coravy.hudson.plugins.github.GithubProjectProperty')
 def handle_github_project_property(top):
     github = OrderedDict()
     for child in top:
@@ -126,9 +84,10 @@ def handle_github_project_property(top):
             github['url'] = child.text
         else:
             raise NotImplementedError("cannot handle XML %s" % child.tag)
-    return {'github': github}
+    return [['properties', {'github': github}]]
 
 # Handle "<hudson.plugins.copyartifact.CopyArtifactPermissionProperty>..."
+@register('property', 'hudson.plugins.copyartifact.CopyArtifactPermissionProperty')  # NOQA
 def handle_copy_artifact_property(top):
     copy_artifact = OrderedDict()
     projects = []
@@ -143,10 +102,11 @@ def handle_copy_artifact_property(top):
             copy_artifact['projects'] = ','.join(projects)
         else:
             raise NotImplementedError("cannot handle XML %s" % child.tag)
-    return {'copyartifact': copy_artifact}
+    return [['properties', {'copyartifact': copy_artifact}]]
 
 
 # Handle "<com.sonyericsson.rebuild.RebuildSettings>..."
+@register('property', 'com.sonyericsson.rebuild.RebuildSettings')
 def handle_rebuild_settings_property(top):
     rebuild = OrderedDict()
     for child in top:
@@ -156,10 +116,11 @@ def handle_rebuild_settings_property(top):
             rebuild['rebuild-disabled'] = child.text == 'true'
         else:
             raise NotImplementedError("cannot handle XML %s" % child.tag)
-    return {'rebuild': rebuild}
+    return [['properties', {'rebuild': rebuild}]]
 
 
 # Handle "<hudson.model.ParametersDefinitionProperty>..."
+@register('property', 'hudson.model.ParametersDefinitionProperty')
 def handle_parameters_property(top):
     parameters = []
     for parameterdefs in top:
@@ -172,6 +133,8 @@ def handle_parameters_property(top):
             elif parameterdef.tag == 'hudson.model.BooleanParameterDefinition':
                 parameter_type = 'bool'
             else:
+                going_raw('parameter', parameterdef,
+                          'cannot handle parameter %s' % parameterdef.tag)
                 insert_rawxml(parameterdef, parameters)
                 continue
 
@@ -197,10 +160,59 @@ def handle_parameters_property(top):
                     value = defsetting.text
                 parameter_settings[key] = value
             parameters.append({parameter_type: parameter_settings})
-    return parameters
+    return [['parameters', parameter] for parameter in parameters]
+
+# Handle "<jenkins.plugins.slack.SlackNotifier_-SlackJobProperty>..."
+@register('property', 'jenkins.plugins.slack.SlackNotifier_-SlackJobProperty')
+def handle_slack_property(child):
+    slack = OrderedDict()
+
+    known_slack_properties = {
+        'startNotification': 'notify-start',
+        'notifySuccess': 'notify-success',
+        'notifyAborted': 'notify-aborted',
+        'notifyNotBuilt': 'notify-not-built',
+        'notifyUnstable': 'notify-unstable',
+        'notifyFailure': 'notify-failure',
+        'notifyRepeatedFailure': 'notify-repeated-failure',
+        'notifyBackToNormal': 'notify-back-to-normal',
+        'includeTestSummary': 'include-test-summary',
+        'showCommitList': 'show-commit-list',
+    }
+
+    customMessageEnabled = False
+    customMessage = ''
+
+    enableSlack = False
+
+    for slackProp in child:
+        if slackProp.tag in known_slack_properties:
+            if slackProp.text == 'true':
+                slack[known_slack_properties[slackProp.tag]] = True
+                enableSlack = True
+        elif slackProp.tag == 'includeCustomMessage':
+            customMessageEnabled = slackProp.text == 'true'
+        elif slackProp.tag == 'customMessage':
+            customMessage = slackProp.text
+        elif slackProp.tag == 'room':
+            if slackProp.text:
+                slack['room'] = slackProp.text
+        elif slackProp.tag in ['teamDomain', 'token'] and not(slackProp.text) == 0:
+            pass
+        else:
+            raise NotImplementedError("cannot handle Slack property %s" % slackProp.tag)
+
+    if customMessageEnabled:
+        slack['custom-message'] = customMessage
+
+    if not enableSlack:
+        return []
+    slack = OrderedDict([('enabled', True)] + slack.items())
+    return [['slack', slack]]
 
 
 # Handle "<scm>..."
+@register('job', 'scm')
 def handle_scm(top):
     if 'class' in top.attrib:
         if top.attrib['class'] == 'hudson.scm.NullSCM':
@@ -420,12 +432,13 @@ def handle_scm(top):
 
         scm.append({'git': git})
     except NotImplementedError, e:
-        print "going raw because: %s" % e
+        going_raw('scm', top, e)
         insert_rawxml(top, scm)
     return [['scm', scm]]
 
 
 # Handle "<canRoam>true</canRoam>"
+@register('job', 'canroam')
 def handle_canroam(top):
     # JJB doesn't have an explicit YAML setting for this; instead, it
     # infers it from the "node" parameter. So there's no need to handle the
@@ -434,20 +447,24 @@ def handle_canroam(top):
 
 
 # Handle "<disabled>false</disabled>"
+@register('job', 'disabled')
 def handle_disabled(top):
     return [['disabled', top.text == 'true']]
 
 
 # Handle "<blockBuildWhenDownstreamBuilding>false</blockBuildWhenDownstreamBuilding>" NOQA
+@register('job', 'blockbuildwhendownstreambuilding')
 def handle_blockbuildwhendownstreambuilding(top):
     return [['block-downstream', top.text == 'true']]
 
 
 # Handle "<blockBuildWhenUpstreamBuilding>false</blockBuildWhenUpstreamBuilding>" NOQA
+@register('job', 'blockbuildwhenupstreambuilding')
 def handle_blockbuildwhenupstreambuilding(top):
     return [['block-upstream', top.text == 'true']]
 
 
+@register('job', 'triggers')
 def handle_triggers(top):
     triggers = []
 
@@ -459,106 +476,122 @@ def handle_triggers(top):
 
 def handle_trigger(trigger):
     try:
-        if trigger.tag == 'hudson.triggers.SCMTrigger':
-            pollscm = OrderedDict()
-            for setting in trigger:
-                if setting.tag == 'spec':
-                    pollscm['cron'] = setting.text
-                elif setting.tag == 'ignorePostCommitHooks':
-                    pollscm['ignore-post-commit-hooks'] = \
-                        (setting.text == 'true')
-                else:
-                    raise NotImplementedError("cannot handle scm trigger "
-                                              "setting %s" % setting.tag)
-            return {'pollscm': pollscm}
-
-        elif trigger.tag == 'hudson.triggers.TimerTrigger':
-            return {'timed': trigger.findtext('spec')}
-
-        elif trigger.tag == 'jenkins.triggers.ReverseBuildTrigger':
-            reverse = OrderedDict()
-            for setting in trigger:
-                if setting.tag == 'upstreamProjects':
-                    reverse['jobs'] = setting.text
-                elif setting.tag == 'threshold':
-                    pass    # TODO
-                elif setting.tag == 'spec':
-                    pass    # TODO
-                else:
-                    raise NotImplementedError("cannot handle reverse trigger "
-                                              "setting %s" % setting.tag)
-            return {'reverse': reverse}
-
-        elif trigger.tag == 'com.sonyericsson.hudson.plugins.gerrit.trigger.hudsontrigger.GerritTrigger':
-            gerrit = OrderedDict()
-            for setting in trigger:
-                if setting.tag == 'gerritProjects':
-                    projects = []
-                    for projectChild in setting:
-                        project = OrderedDict()
-                        project['project-compare-type'] = projectChild.findtext('compareType')
-                        project['project-pattern'] = projectChild.findtext('pattern')
-
-                        branches = []
-                        for branchChild in projectChild.find('branches'):
-                            branch = OrderedDict()
-                            branch['branch-compare-type'] = branchChild.findtext('compareType')
-                            branch['branch-pattern'] = branchChild.findtext('pattern')
-                            branches.append(branch)
-
-                        project['branches'] = branches
-
-                        projects.append(project)
-
-                    gerrit['projects'] = projects
-
-                elif setting.tag == 'triggerOnEvents':
-                    events = []
-                    for eventChild in setting:
-                        event = None
-                        if eventChild.tag == 'com.sonyericsson.hudson.plugins.gerrit.trigger.hudsontrigger.events.PluginRefUpdatedEvent':
-                            event = 'ref-updated-event'
-                        elif eventChild.tag == 'com.sonyericsson.hudson.plugins.gerrit.trigger.hudsontrigger.events.PluginDraftPublishedEvent':
-                            event = 'draft-published-event'
-                        elif eventChild.tag == 'com.sonyericsson.hudson.plugins.gerrit.trigger.hudsontrigger.events.PluginPatchsetCreatedEvent':
-                            event = 'patchset-created-event'
-                            excludes = OrderedDict()
-                            for excludeChild in eventChild:
-                                if excludeChild.tag == 'excludeDrafts':
-                                    if excludeChild.text == 'true':
-                                        excludes['exclude-drafts'] = True
-                                elif excludeChild.tag == 'excludeTrivialRebase':
-                                    if excludeChild.text == 'true':
-                                        excludes['exclude-trivial-rebase'] = True
-                                elif excludeChild.tag == 'excludeNoCodeChange':
-                                    if excludeChild.text == 'true':
-                                        excludes['exclude-no-code-change'] = True
-                            if len(excludes) != 0:
-                                event = OrderedDict([(event, excludes)])
-                        else:
-                            raise NotImplementedError("cannot handle Gerrit event %s" % eventChild.tag)
+        handler = registry.lookup('trigger', trigger)
+        if handler is None:
+            raise NotImplementedError("cannot handle trigger %s" % trigger.tag)
+        return handler(trigger)
+
+    except NotImplementedError, e:
+        going_raw('trigger', trigger, e)
+        return create_rawxml(trigger)
 
-                        events.append(event)
 
-                    gerrit['trigger-on'] = events
+# Handle "<hudson.triggers.SCMTrigger>..."
+@register('trigger', 'hudson.triggers.SCMTrigger')
+def handle_pollscm_trigger(trigger):
+    pollscm = OrderedDict()
+    for setting in trigger:
+        if setting.tag == 'spec':
+            pollscm['cron'] = setting.text
+        elif setting.tag == 'ignorePostCommitHooks':
+            pollscm['ignore-post-commit-hooks'] = \
+                (setting.text == 'true')
+        else:
+            raise NotImplementedError("cannot handle scm trigger "
+                                      "setting %s" % setting.tag)
+    return {'pollscm': pollscm}
+
+
+# Handle "<hudson.triggers.TimerTrigger>..."
+@register('trigger', 'hudson.triggers.TimerTrigger')
+def handle_timed_trigger(trigger):
+    return {'timed': trigger.findtext('spec')}
+
+
+# Handle "<jenkins.triggers.ReverseBuildTrigger>..."
+@register('trigger', 'jenkins.triggers.ReverseBuildTrigger')
+def handle_reverse_trigger(trigger):
+    reverse = OrderedDict()
+    for setting in trigger:
+        if setting.tag == 'upstreamProjects':
+            reverse['jobs'] = setting.text
+        elif setting.tag == 'threshold':
+            pass    # TODO
+        elif setting.tag == 'spec':
+            pass    # TODO
+        else:
+            raise NotImplementedError("cannot handle reverse trigger "
+                                      "setting %s" % setting.tag)
+    return {'reverse': reverse}
+
+
+# Handle "<com.sonyericsson.hudson.plugins.gerrit.trigger.hudsontrigger.GerritTrigger>..." NOQA
+@register('trigger', 'com.sonyericsson.hudson.plugins.gerrit.trigger.hudsontrigger.GerritTrigger')  # NOQA
+def handle_gerrit_trigger(trigger):
+    gerrit = OrderedDict()
+    for setting in trigger:
+        if setting.tag == 'gerritProjects':
+            projects = []
+            for projectChild in setting:
+                project = OrderedDict()
+                project['project-compare-type'] = projectChild.findtext('compareType')
+                project['project-pattern'] = projectChild.findtext('pattern')
 
+                branches = []
+                for branchChild in projectChild.find('branches'):
+                    branch = OrderedDict()
+                    branch['branch-compare-type'] = branchChild.findtext('compareType')
+                    branch['branch-pattern'] = branchChild.findtext('pattern')
+                    branches.append(branch)
+
+                project['branches'] = branches
+
+                projects.append(project)
+
+            gerrit['projects'] = projects
+
+        elif setting.tag == 'triggerOnEvents':
+            events = []
+            for eventChild in setting:
+                event = None
+                if eventChild.tag == 'com.sonyericsson.hudson.plugins.gerrit.trigger.hudsontrigger.events.PluginRefUpdatedEvent':
+                    event = 'ref-updated-event'
+                elif eventChild.tag == 'com.sonyericsson.hudson.plugins.gerrit.trigger.hudsontrigger.events.PluginDraftPublishedEvent':
+                    event = 'draft-published-event'
+                elif eventChild.tag == 'com.sonyericsson.hudson.plugins.gerrit.trigger.hudsontrigger.events.PluginPatchsetCreatedEvent':
+                    event = 'patchset-created-event'
+                    excludes = OrderedDict()
+                    for excludeChild in eventChild:
+                        if excludeChild.tag == 'excludeDrafts':
+                            if excludeChild.text == 'true':
+                                excludes['exclude-drafts'] = True
+                        elif excludeChild.tag == 'excludeTrivialRebase':
+                            if excludeChild.text == 'true':
+                                excludes['exclude-trivial-rebase'] = True
+                        elif excludeChild.tag == 'excludeNoCodeChange':
+                            if excludeChild.text == 'true':
+                                excludes['exclude-no-code-change'] = True
+                    if len(excludes) != 0:
+                        event = OrderedDict([(event, excludes)])
                 else:
-                    pass
+                    raise NotImplementedError("cannot handle Gerrit event %s" % eventChild.tag)
+
+                events.append(event)
 
-            return {'gerrit': gerrit}
+            gerrit['trigger-on'] = events
 
         else:
-            raise NotImplementedError("cannot handle trigger %s" % trigger.tag)
+            pass
 
-    except NotImplementedError, e:
-        print "going raw because: %s" % e
-        return create_rawxml(trigger)
+    return {'gerrit': gerrit}
 
 
+@register('job', 'concurrentbuild')
 def handle_concurrentbuild(top):
     return [['concurrent', top.text == 'true']]
 
 
+@register('job', 'axes')
 def handle_axes(top):
     axes = []
     for child in top:
@@ -593,6 +626,7 @@ def handle_axes(top):
     return [['axes', axes]]
 
 
+@register('job', 'builders')
 def handle_builders(top):
     builders = []
     for child in top:
@@ -602,485 +636,535 @@ def handle_builders(top):
 
 def handle_builder(builder):
     try:
-        if builder.tag == 'hudson.plugins.copyartifact.CopyArtifact':
-            copyartifact = OrderedDict()
-            selectdict = {
-                'StatusBuildSelector': 'last-successful',
-                'LastCompletedBuildSelector': 'last-completed',
-                'SpecificBuildSelector': 'specific-build',
-                'SavedBuildSelector': 'last-saved',
-                'TriggeredBuildSelector': 'upstream-build',
-                'PermalinkBuildSelector': 'permalink',
-                'WorkspaceSelector': 'workspace-latest',
-                'ParameterizedBuildSelector': 'build-param',
-                'DownstreamBuildSelector': 'downstream-build'}
-            for copy_element in builder:
-                if copy_element.tag == 'project':
-                    copyartifact[copy_element.tag] = copy_element.text
-                elif copy_element.tag == 'filter':
-                    copyartifact[copy_element.tag] = copy_element.text
-                elif copy_element.tag == 'target':
-                    copyartifact[copy_element.tag] = copy_element.text
-                elif copy_element.tag == 'excludes':
-                    copyartifact['exclude-pattern'] = copy_element.text
-                elif copy_element.tag == 'selector':
-                    select = copy_element.attrib['class']
-                    select = select.replace('hudson.plugins.copyartifact.', '')
-                    which_build = selectdict[select]
-                    copyartifact['which-build'] = which_build
-                    if which_build == 'build-param':
-                        copyartifact['param'] = copy_element.findtext('parameterName')
-                elif copy_element.tag == 'flatten':
-                    copyartifact[copy_element.tag] = \
-                        (copy_element.text == 'true')
-                elif copy_element.tag == 'doNotFingerprintArtifacts':
-                    # Not yet implemented in JJB
-                    if copy_element.text != "false":
-                        raise NotImplementedError("cannot handle doNotFingerprintArtifacts != false")
-                    continue
-                elif copy_element.tag == 'optional':
-                    copyartifact[copy_element.tag] = \
-                        (copy_element.text == 'true')
-                else:
-                    raise NotImplementedError("cannot handle "
-                                              "XML %s" % copy_element.tag)
-            return {'copyartifact': copyartifact}
-
-        elif builder.tag == 'hudson.tasks.Shell':
-            for shell_element in builder:
-                # Assumption: there's only one <command> in this
-                # <hudson.tasks.Shell>
-                if shell_element.tag == 'command':
-                    shell = shell_element.text
-                else:
-                    raise NotImplementedError("cannot handle "
-                                              "XML %s" % shell_element.tag)
-            return {'shell': shell}
-
-        elif builder.tag == 'org.jenkinsci.plugins.conditionalbuildstep.singlestep.SingleConditionalBuilder':
-            conditional = OrderedDict()
-            for item in builder:
-                if item.tag == 'condition':
-                    conditionClass = item.attrib['class']
-                    if conditionClass == 'org.jenkins_ci.plugins.run_condition.core.ExpressionCondition':
-                        conditional['condition-kind'] = 'regex-match'
-                        conditional['regex'] = item.findtext('expression')
-                        conditional['label'] = item.findtext('label')
-
-                    elif conditionClass == 'org.jenkins_ci.plugins.run_condition.core.AlwaysRun':
-                        conditional['condition-kind'] = 'always'
-
-                    elif conditionClass == 'org.jenkins_ci.plugins.run_condition.core.NeverRun':
-                        conditional['condition-kind'] = 'never'
-
-                    elif conditionClass == 'org.jenkins_ci.plugins.run_condition.core.StatusCondition':
-                        conditional['condition-kind'] = 'current-status'
-                        conditional['condition-worst'] = item.findtext('worstResult/name')
-                        conditional['condition-best'] = item.findtext('bestResult/name')
+        handler = registry.lookup('builder', builder)
+        if handler is None:
+            raise NotImplementedError("cannot handle builder %s" % builder.tag)
+        return handler(builder)
 
-                    else:
-                        raise NotImplementedError("cannot handle condition %s" % conditionClass)
+    except NotImplementedError, e:
+        going_raw('builder', builder, e)
+        return create_rawxml(builder)
 
-                elif item.tag == 'runner':
-                    runnerClass = item.attrib['class']
-                    if runnerClass == 'org.jenkins_ci.plugins.run_condition.BuildStepRunner$Fail':
-                        pass
-                    else:
-                        raise NotImplementedError("cannot handle conditional runner %s" % runnerClass)
 
-                elif item.tag == 'buildStep':
-                    # Turn the 'buildStep' into a regular builder node, in case it ends up
-                    # emitted as raw XML, because JJB will put back the element name in
-                    # 'class' in that case
-                    builder = item.copy()
-                    builder.tag = builder.attrib.pop('class')
-                    conditional['steps'] = [handle_builder(builder)]
+# Handle "<hudson.plugins.copyartifact.CopyArtifact>..."
+@register('builder', 'hudson.plugins.copyartifact.CopyArtifact')
+def handle_copyartifact_builder(builder):
+    copyartifact = OrderedDict()
+    selectdict = {
+        'StatusBuildSelector': 'last-successful',
+        'LastCompletedBuildSelector': 'last-completed',
+        'SpecificBuildSelector': 'specific-build',
+        'SavedBuildSelector': 'last-saved',
+        'TriggeredBuildSelector': 'upstream-build',
+        'PermalinkBuildSelector': 'permalink',
+        'WorkspaceSelector': 'workspace-latest',
+        'ParameterizedBuildSelector': 'build-param',
+        'DownstreamBuildSelector': 'downstream-build'}
+    for copy_element in builder:
+        if copy_element.tag == 'project':
+            copyartifact[copy_element.tag] = copy_element.text
+        elif copy_element.tag == 'filter':
+            copyartifact[copy_element.tag] = copy_element.text
+        elif copy_element.tag == 'target':
+            copyartifact[copy_element.tag] = copy_element.text
+        elif copy_element.tag == 'excludes':
+            copyartifact['exclude-pattern'] = copy_element.text
+        elif copy_element.tag == 'selector':
+            select = copy_element.attrib['class']
+            select = select.replace('hudson.plugins.copyartifact.', '')
+            which_build = selectdict[select]
+            copyartifact['which-build'] = which_build
+            if which_build == 'build-param':
+                copyartifact['param'] = copy_element.findtext('parameterName')
+        elif copy_element.tag == 'flatten':
+            copyartifact[copy_element.tag] = \
+                (copy_element.text == 'true')
+        elif copy_element.tag == 'doNotFingerprintArtifacts':
+            # Not yet implemented in JJB
+            if copy_element.text != "false":
+                raise NotImplementedError("cannot handle doNotFingerprintArtifacts != false")
+            continue
+        elif copy_element.tag == 'optional':
+            copyartifact[copy_element.tag] = \
+                (copy_element.text == 'true')
+        else:
+            raise NotImplementedError("cannot handle "
+                                      "XML %s" % copy_element.tag)
+    return {'copyartifact': copyartifact}
+
+
+# Handle "<hudson.tasks.Shell>..."
+@register('builder', 'hudson.tasks.Shell')
+def handle_shell_builder(builder):
+    for shell_element in builder:
+        # Assumption: there's only one <command> in this
+        # <hudson.tasks.Shell>
+        if shell_element.tag == 'command':
+            shell = shell_element.text
+        else:
+            raise NotImplementedError("cannot handle "
+                                      "XML %s" % shell_element.tag)
+    return {'shell': shell}
 
-                else:
-                    raise NotImplementedError("cannot handle conditional property %s" % item.tag)
-
-            return {'conditional-step': conditional}
-
-        elif builder.tag == 'hudson.plugins.parameterizedtrigger.TriggerBuilder':
-            triggerConfigs = []
-            for configNode in builder.find('configs'):
-                if configNode.tag != 'hudson.plugins.parameterizedtrigger.BlockableBuildTriggerConfig':
-                    raise NotImplementedError("cannot handle trigger config %s" % item.tag)
-
-                triggerConfig = OrderedDict()
-                for propertyNode in configNode:
-                    if propertyNode.tag == 'projects':
-                        triggerConfig['project'] = \
-                            propertyNode.text.split(',') \
-                            if ',' in propertyNode.text \
-                            else propertyNode.text
-
-                    elif propertyNode.tag == 'configs':
-                        for confconf in propertyNode:
-                            if confconf.tag == 'hudson.plugins.parameterizedtrigger.PredefinedBuildParameters':
-                                triggerConfig['predefined-parameters'] = confconf.findtext('properties')
-                            else:
-                                raise NotImplementedError("cannot handle trigger config config %s" % confconf.tag)
 
-                    elif propertyNode.tag == 'configFactories':
-                        parameterFactories = []
-                        for factoryNode in propertyNode:
-                            factory = OrderedDict()
-                            if factoryNode.tag == 'hudson.plugins.parameterizedtrigger.FileBuildParameterFactory':
-                                factory['factory'] = 'filebuild'
-                                for factoryProperty in factoryNode:
-                                    if factoryProperty.tag == 'filePattern':
-                                        factory['file-pattern'] = factoryProperty.text
+# Handle "<org.jenkinsci.plugins.conditionalbuildstep.singlestep.SingleConditionalBuilder>..." NOQA
+@register('builder', 'org.jenkinsci.plugins.conditionalbuildstep.singlestep.SingleConditionalBuilder')  # NOQA
+def handle_conditional_step_builder(builder):
+    conditional = OrderedDict()
+    for item in builder:
+        if item.tag == 'condition':
+            conditionClass = item.attrib['class']
+            if conditionClass == 'org.jenkins_ci.plugins.run_condition.core.ExpressionCondition':
+                conditional['condition-kind'] = 'regex-match'
+                conditional['regex'] = item.findtext('expression')
+                conditional['label'] = item.findtext('label')
 
-                                    elif factoryProperty.tag == 'noFilesFoundAction':
-                                        factory['no-files-found-action'] = factoryProperty.text
+            elif conditionClass == 'org.jenkins_ci.plugins.run_condition.core.AlwaysRun':
+                conditional['condition-kind'] = 'always'
 
-                                    else:
-                                        raise NotImplementedError("cannot handle trigger factory property %s" % factoryProperty.tag)
+            elif conditionClass == 'org.jenkins_ci.plugins.run_condition.core.NeverRun':
+                conditional['condition-kind'] = 'never'
 
-                            else:
-                                raise NotImplementedError("cannot handle trigger factory %s" % factoryNode.tag)
-
-                            parameterFactories.append(factory)
-
-                        triggerConfig['parameter-factories'] = parameterFactories
-
-                    elif propertyNode.tag == 'block':
-                        triggerConfig['block'] = True
-                        blockThresholds = OrderedDict([
-                            ('build-step-failure-threshold', 'never'),
-                            ('unstable-threshold', 'never'),
-                            ('failure-threshold', 'never'),
-                        ])
-                        for threshold in propertyNode:
-                            value = threshold.findtext('name').lower()
-                            if value not in ['never', 'success', 'unstable', 'failure']:
-                                raise NotImplementedError("cannot handle threshold value %s" % value)
-                            if threshold.tag == 'buildStepFailureThreshold':
-                                blockThresholds['build-step-failure-threshold'] = value
-                            elif threshold.tag == 'unstableThreshold':
-                                blockThresholds['unstable-threshold'] = value
-                            elif threshold.tag == 'failureThreshold':
-                                blockThresholds['failure-threshold'] = value
-                            else:
-                                raise NotImplementedError("cannot handle threshold %s" % threshold.tag)
-                        triggerConfig['block-thresholds'] = blockThresholds
+            elif conditionClass == 'org.jenkins_ci.plugins.run_condition.core.StatusCondition':
+                conditional['condition-kind'] = 'current-status'
+                conditional['condition-worst'] = item.findtext('worstResult/name')
+                conditional['condition-best'] = item.findtext('bestResult/name')
 
-                    elif propertyNode.tag == 'condition' and propertyNode.text == 'ALWAYS' \
-                        or (propertyNode.tag in ['triggerWithNoParameters', 'buildAllNodesWithLabel']
-                            and propertyNode.text == 'false'):
-                        pass
+            else:
+                raise NotImplementedError("cannot handle condition %s" % conditionClass)
+
+        elif item.tag == 'runner':
+            runnerClass = item.attrib['class']
+            if runnerClass == 'org.jenkins_ci.plugins.run_condition.BuildStepRunner$Fail':
+                pass
+            else:
+                raise NotImplementedError("cannot handle conditional runner %s" % runnerClass)
 
+        elif item.tag == 'buildStep':
+            # Turn the 'buildStep' into a regular builder node, in case it ends up
+            # emitted as raw XML, because JJB will put back the element name in
+            # 'class' in that case
+            builder = deepcopy(item)
+            builder.tag = builder.attrib.pop('class')
+            conditional['steps'] = [handle_builder(builder)]
+
+        else:
+            raise NotImplementedError("cannot handle conditional property %s" % item.tag)
+
+    return {'conditional-step': conditional}
+
+
+# Handle "<hudson.plugins.parameterizedtrigger.TriggerBuilder>..."
+@register('builder', 'hudson.plugins.parameterizedtrigger.TriggerBuilder')
+def handle_trigger_builds_builder(builder):
+    triggerConfigs = []
+    for configNode in builder.find('configs'):
+        if configNode.tag != 'hudson.plugins.parameterizedtrigger.BlockableBuildTriggerConfig':
+            raise NotImplementedError("cannot handle trigger config %s" % configNode.tag)
+
+        triggerConfig = OrderedDict()
+        for propertyNode in configNode:
+            if propertyNode.tag == 'projects':
+                triggerConfig['project'] = \
+                    propertyNode.text.split(',') \
+                    if ',' in propertyNode.text \
+                    else propertyNode.text
+
+            elif propertyNode.tag == 'configs':
+                for confconf in propertyNode:
+                    if confconf.tag == 'hudson.plugins.parameterizedtrigger.PredefinedBuildParameters':
+                        triggerConfig['predefined-parameters'] = confconf.findtext('properties')
                     else:
-                        raise NotImplementedError("cannot handle trigger config property %s" % propertyNode.tag)
+                        raise NotImplementedError("cannot handle trigger config config %s" % confconf.tag)
 
-                triggerConfigs.append(triggerConfig)
+            elif propertyNode.tag == 'configFactories':
+                parameterFactories = []
+                for factoryNode in propertyNode:
+                    factory = OrderedDict()
+                    if factoryNode.tag == 'hudson.plugins.parameterizedtrigger.FileBuildParameterFactory':
+                        factory['factory'] = 'filebuild'
+                        for factoryProperty in factoryNode:
+                            if factoryProperty.tag == 'filePattern':
+                                factory['file-pattern'] = factoryProperty.text
 
-            return {'trigger-builds': triggerConfigs}
+                            elif factoryProperty.tag == 'noFilesFoundAction':
+                                factory['no-files-found-action'] = factoryProperty.text
 
-        else:
-            raise NotImplementedError("cannot handle builder %s" % builder.tag)
+                            else:
+                                raise NotImplementedError("cannot handle trigger factory property %s" % factoryProperty.tag)
 
-    except NotImplementedError, e:
-        print "going raw because: %s" % e
-        return create_rawxml(builder)
+                    else:
+                        raise NotImplementedError("cannot handle trigger factory %s" % factoryNode.tag)
+
+                    parameterFactories.append(factory)
+
+                triggerConfig['parameter-factories'] = parameterFactories
+
+            elif propertyNode.tag == 'block':
+                triggerConfig['block'] = True
+                blockThresholds = OrderedDict([
+                    ('build-step-failure-threshold', 'never'),
+                    ('unstable-threshold', 'never'),
+                    ('failure-threshold', 'never'),
+                ])
+                for threshold in propertyNode:
+                    value = threshold.findtext('name').lower()
+                    if value not in ['never', 'success', 'unstable', 'failure']:
+                        raise NotImplementedError("cannot handle threshold value %s" % value)
+                    if threshold.tag == 'buildStepFailureThreshold':
+                        blockThresholds['build-step-failure-threshold'] = value
+                    elif threshold.tag == 'unstableThreshold':
+                        blockThresholds['unstable-threshold'] = value
+                    elif threshold.tag == 'failureThreshold':
+                        blockThresholds['failure-threshold'] = value
+                    else:
+                        raise NotImplementedError("cannot handle threshold %s" % threshold.tag)
+                triggerConfig['block-thresholds'] = blockThresholds
+
+            elif propertyNode.tag == 'condition' and propertyNode.text == 'ALWAYS' \
+                or (propertyNode.tag in ['triggerWithNoParameters', 'buildAllNodesWithLabel']
+                    and propertyNode.text == 'false'):
+                pass
+
+            else:
+                raise NotImplementedError("cannot handle trigger config property %s" % propertyNode.tag)
+
+        triggerConfigs.append(triggerConfig)
 
+    return {'trigger-builds': triggerConfigs}
 
+
+@register('job', 'publishers')
 def handle_publishers(top):
     publishers = []
     for child in top:
         try:
+            handler = registry.lookup('publisher', child)
+            if handler is None:
+                raise NotImplementedError("cannot handle XML %s" % child.tag)
+            publisher = handler(child)
+            if publisher is not None:
+                publishers.append(publisher)
 
-            if child.tag == 'hudson.tasks.ArtifactArchiver':
-                archive = OrderedDict()
-                for element in child:
-                    if element.tag == 'artifacts':
-                        archive['artifacts'] = element.text
-                    elif element.tag == 'allowEmptyArchive':
-                        archive['allow-empty'] = (element.text == 'true')
-                    elif element.tag == 'excludes':
-                        archive['excludes'] = element.text
-                    elif element.tag == 'fingerprint':
-                        archive['fingerprint'] = (element.text == 'true')
-                    elif element.tag == 'onlyIfSuccessful':
-                        # only-if-success first available in JJB 1.3.0
-                        archive['only-if-success'] = (element.text == 'true')
-                    elif element.tag == 'defaultExcludes':
-                        # default-excludes is not yet available in JJB master
-                        archive['default-excludes'] = (element.text == 'true')
-                    else:
-                        raise NotImplementedError("cannot handle "
-                                                  "XML %s" % element.tag)
-
-                publishers.append({'archive': archive})
-
-            elif child.tag == 'hudson.plugins.descriptionsetter.DescriptionSetterPublisher':  # NOQA
-                setter = OrderedDict()
-                for element in child:
-                    if element.tag == 'regexp':
-                        setter['regexp'] = element.text
-                    elif element.tag == 'regexpForFailed':
-                        setter['regexp-for-failed'] = element.text
-                    elif element.tag == 'setForMatrix':
-                        setter['set-for-matrix'] = (element.text == 'true')
-                    elif element.tag == 'description':
-                        setter['description'] = element.text
-                    else:
-                        raise NotImplementedError("cannot handle "
-                                                  "XML %s" % element.tag)
+        except NotImplementedError, e:
+            going_raw('publisher', child, e)
+            insert_rawxml(child, publishers)
 
-                publishers.append({'description-setter': setter})
+    return [['publishers', publishers]]
 
-            elif child.tag == 'hudson.tasks.Fingerprinter':
-                fingerprint = OrderedDict()
-                for element in child:
-                    if element.tag == 'targets':
-                        fingerprint['files'] = element.text
-                    elif element.tag == 'recordBuildArtifacts':
-                        fingerprint['record-artifacts'] = (element.text == 'true')
-                    else:
-                        raise NotImplementedError("cannot handle "
-                                                  "XML %s" % element.tag)
-                publishers.append({'fingerprint': fingerprint})
-
-            elif child.tag == 'hudson.plugins.emailext.ExtendedEmailPublisher':
-                ext_email = OrderedDict()
-                for element in child:
-                    if element.tag == 'recipientList':
-                        if element.text != '$DEFAULT_RECIPIENTS':
-                            ext_email['recipients'] = element.text
-
-                    elif element.tag == 'replyTo':
-                        if element.text != '$DEFAULT_REPLYTO':
-                            ext_email['reply-to'] = element.text
-
-                    elif element.tag == 'contentType':
-                        if element.text != 'default':
-                            mime_content_type = {
-                                'text/plain': 'text',
-                                'text/html': 'html',
-                                'both': 'both-html-text',
-                            }
-                            ctype = element.text
-                            if ctype not in mime_content_type:
-                                raise NotImplementedError('cannot handle email-ext contentType "%s"' % ctype)
-                            ext_email['content-type'] = mime_content_type[ctype]
-
-                    elif element.tag == 'defaultSubject':
-                        if element.text != '$DEFAULT_SUBJECT':
-                            ext_email['subject'] = element.text
-
-                    elif element.tag == 'defaultContent':
-                        if element.text != '$DEFAULT_CONTENT':
-                            ext_email['body'] = element.text
-
-                    elif element.tag == 'attachBuildLog':
-                        if element.text == 'true':
-                            ext_email['attach-build-log'] = True
-
-                    # TODO not actually supported in JJB yet
-                    elif element.tag == 'compressBuildLog':
-                        if element.text == 'true':
-                            ext_email['compress-build-log'] = True
-
-                    elif element.tag == 'attachmentsPattern':
-                        if element.text:
-                            ext_email['attachments'] = element.text
-
-                    elif element.tag == 'saveOutput':
-                        if element.text == 'true':
-                            ext_email['save-output'] = True
-
-                    elif element.tag == 'disabled':
-                        if element.text == 'true':
-                            ext_email['disable-publisher'] = True
-
-                    elif element.tag == 'presendScript':
-                        if element.text != '$DEFAULT_PRESEND_SCRIPT':
-                            ext_email['presend-script'] = element.text
-
-                    elif element.tag == 'configuredTriggers':
-                        # JJB defaults "failure" to true
-                        ext_email['failure'] = False
-                        for trigger in element:
-                            # TODO check that triggers have their default
-                            # config, as JJB does not handle anything else.
-                            triggerClass = re.sub(r'^hudson\.plugins\.emailext\.plugins\.trigger\.', '', trigger.tag)
-                            if triggerClass == 'AlwaysTrigger':
-                                ext_email['always'] = True
-                            elif triggerClass == 'UnstableTrigger':
-                                ext_email['unstable'] = True
-                            elif triggerClass == 'FirstFailureTrigger':
-                                ext_email['first-failure'] = True
-                            elif triggerClass == 'NotBuiltTrigger':
-                                ext_email['not-built'] = True
-                            elif triggerClass == 'AbortedTrigger':
-                                ext_email['aborted'] = True
-                            elif triggerClass == 'RegressionTrigger':
-                                ext_email['regression'] = True
-                            elif triggerClass == 'FailureTrigger':
-                                ext_email['failure'] = True
-                            elif triggerClass == 'SecondFailureTrigger':
-                                ext_email['second-failure'] = True
-                            elif triggerClass == 'ImprovementTrigger':
-                                ext_email['improvement'] = True
-                            elif triggerClass == 'StillFailingTrigger':
-                                ext_email['still-failing'] = True
-                            elif triggerClass == 'SuccessTrigger':
-                                ext_email['success'] = True
-                            elif triggerClass == 'FixedTrigger':
-                                ext_email['fixed'] = True
-                            elif triggerClass == 'StillUnstableTrigger':
-                                ext_email['still-unstable'] = True
-                            elif triggerClass == 'PreBuildTrigger':
-                                ext_email['pre-build'] = True
-                            else:
-                                raise NotImplementedError("cannot handle email-ext trigger %s" % trigger.tag)
-                    else:
-                        raise NotImplementedError("cannot handle "
-                                                  "XML %s" % element.tag)
-
-                publishers.append({'email-ext': ext_email})
-
-            elif child.tag == 'hudson.tasks.junit.JUnitResultArchiver':
-                junit_publisher = OrderedDict()
-                for element in child:
-                    if element.tag == 'testResults':
-                        junit_publisher['results'] = element.text
-                    elif element.tag == 'keepLongStdio':
-                        junit_publisher['keep-long-stdio'] = \
-                            (element.text == 'true')
-                    elif element.tag == 'healthScaleFactor':
-                        junit_publisher['health-scale-factor'] = element.text
-                    else:
-                        raise NotImplementedError("cannot handle "
-                                                  "XML %s" % element.tag)
-                publishers.append({'junit': junit_publisher})
-
-            elif child.tag == 'hudson.plugins.parameterizedtrigger.BuildTrigger':
-                build_trigger = OrderedDict()
-
-                for element in child:
-                    for sub in element:
-                        if sub.tag == 'hudson.plugins.parameterizedtrigger.BuildTriggerConfig':     # NOQA
-                            for config in sub:
-                                if config.tag == 'projects':
-                                    build_trigger['project'] = config.text
-                                elif config.tag == 'condition':
-                                    build_trigger['condition'] = config.text
-                                elif config.tag == 'triggerWithNoParameters':
-                                    build_trigger['trigger-with-no-params'] = \
-                                        (config.text == 'true')
-                                elif config.tag == 'configs':
-                                    pass
-                                else:
-                                    raise NotImplementedError("cannot handle "
-                                                              "XML %s" % config.tag)
-
-                publishers.append({'trigger-parameterized-builds': build_trigger})
-
-            elif child.tag == 'hudson.tasks.Mailer':
-                email_settings = OrderedDict()
-                for element in child:
-
-                    if element.tag == 'recipients':
-                        email_settings['recipients'] = element.text
-                    elif element.tag == 'dontNotifyEveryUnstableBuild':
-                        email_settings['notify-every-unstable-build'] = \
-                            (element.text == 'true')
-                    elif element.tag == 'sendToIndividuals':
-                        email_settings['send-to-individuals'] = \
-                            (element.text == 'true')
-                    else:
-                        raise NotImplementedError("cannot handle "
-                                                  "email %s" % element.tag)
-                publishers.append({'email': email_settings})
-
-            elif child.tag == 'htmlpublisher.HtmlPublisher':
-                if len(child) != 1 or len(child[0]) != 1 \
-                        or child[0].tag != 'reportTargets' \
-                        or child[0][0].tag != 'htmlpublisher.HtmlPublisherTarget':
-                    raise NotImplementedError("can only handle a single HtmlPublisherTarget")
-
-                html_settings = OrderedDict()
-
-                for element in child[0][0]:
-
-                    if element.tag == 'reportName':
-                        html_settings['name'] = element.text
-                    elif element.tag == 'reportDir':
-                        html_settings['dir'] = element.text
-                    elif element.tag == 'reportFiles':
-                        html_settings['files'] = element.text
-                    elif element.tag == 'alwaysLinkToLastBuild':
-                        html_settings['link-to-last-build'] = element.text == 'true'
-                    elif element.tag == 'keepAll':
-                        html_settings['keep-all'] = element.text == 'true'
-                    elif element.tag == 'allowMissing':
-                        html_settings['allow-missing'] = element.text == 'true'
-                    elif element.tag == 'wrapperName' and \
-                            element.text == 'htmlpublisher-wrapper.html':
+
+# Handle "<hudson.tasks.ArtifactArchiver>..."
+@register('publisher', 'hudson.tasks.ArtifactArchiver')
+def handle_archive_publisher(child):
+    archive = OrderedDict()
+    for element in child:
+        if element.tag == 'artifacts':
+            archive['artifacts'] = element.text
+        elif element.tag == 'allowEmptyArchive':
+            archive['allow-empty'] = (element.text == 'true')
+        elif element.tag == 'excludes':
+            archive['excludes'] = element.text
+        elif element.tag == 'fingerprint':
+            archive['fingerprint'] = (element.text == 'true')
+        elif element.tag == 'onlyIfSuccessful':
+            # only-if-success first available in JJB 1.3.0
+            archive['only-if-success'] = (element.text == 'true')
+        elif element.tag == 'defaultExcludes':
+            # default-excludes is not yet available in JJB master
+            archive['default-excludes'] = (element.text == 'true')
+        else:
+            raise NotImplementedError("cannot handle "
+                                      "XML %s" % element.tag)
+
+    return {'archive': archive}
+
+
+# Handle "<hudson.plugins.descriptionsetter.DescriptionSetterPublisher>..." NOQA
+@register('publisher', 'hudson.plugins.descriptionsetter.DescriptionSetterPublisher')  # NOQA
+def handle_description_setter_publisher(child):
+    setter = OrderedDict()
+    for element in child:
+        if element.tag == 'regexp':
+            setter['regexp'] = element.text
+        elif element.tag == 'regexpForFailed':
+            setter['regexp-for-failed'] = element.text
+        elif element.tag == 'setForMatrix':
+            setter['set-for-matrix'] = (element.text == 'true')
+        elif element.tag == 'description':
+            setter['description'] = element.text
+        else:
+            raise NotImplementedError("cannot handle "
+                                      "XML %s" % element.tag)
+
+    return {'description-setter': setter}
+
+
+# Handle "<hudson.tasks.Fingerprinter>..."
+@register('publisher', 'hudson.tasks.Fingerprinter')
+def handle_fingerprint_publisher(child):
+    fingerprint = OrderedDict()
+    for element in child:
+        if element.tag == 'targets':
+            fingerprint['files'] = element.text
+        elif element.tag == 'recordBuildArtifacts':
+            fingerprint['record-artifacts'] = (element.text == 'true')
+        else:
+            raise NotImplementedError("cannot handle "
+                                      "XML %s" % element.tag)
+    return {'fingerprint': fingerprint}
+
+
+# Handle "<hudson.plugins.emailext.ExtendedEmailPublisher>..."
+@register('publisher', 'hudson.plugins.emailext.ExtendedEmailPublisher')
+def handle_email_ext_publisher(child):
+    ext_email = OrderedDict()
+    for element in child:
+        if element.tag == 'recipientList':
+            if element.text != '$DEFAULT_RECIPIENTS':
+                ext_email['recipients'] = element.text
+
+        elif element.tag == 'replyTo':
+            if element.text != '$DEFAULT_REPLYTO':
+                ext_email['reply-to'] = element.text
+
+        elif element.tag == 'contentType':
+            if element.text != 'default':
+                mime_content_type = {
+                    'text/plain': 'text',
+                    'text/html': 'html',
+                    'both': 'both-html-text',
+                }
+                ctype = element.text
+                if ctype not in mime_content_type:
+                    raise NotImplementedError('cannot handle email-ext contentType "%s"' % ctype)
+                ext_email['content-type'] = mime_content_type[ctype]
+
+        elif element.tag == 'defaultSubject':
+            if element.text != '$DEFAULT_SUBJECT':
+                ext_email['subject'] = element.text
+
+        elif element.tag == 'defaultContent':
+            if element.text != '$DEFAULT_CONTENT':
+                ext_email['body'] = element.text
+
+        elif element.tag == 'attachBuildLog':
+            if element.text == 'true':
+                ext_email['attach-build-log'] = True
+
+        # TODO not actually supported in JJB yet
+        elif element.tag == 'compressBuildLog':
+            if element.text == 'true':
+                ext_email['compress-build-log'] = True
+
+        elif element.tag == 'attachmentsPattern':
+            if element.text:
+                ext_email['attachments'] = element.text
+
+        elif element.tag == 'saveOutput':
+            if element.text == 'true':
+                ext_email['save-output'] = True
+
+        elif element.tag == 'disabled':
+            if element.text == 'true':
+                ext_email['disable-publisher'] = True
+
+        elif element.tag == 'presendScript':
+            if element.text != '$DEFAULT_PRESEND_SCRIPT':
+                ext_email['presend-script'] = element.text
+
+        elif element.tag == 'configuredTriggers':
+            # JJB defaults "failure" to true
+            ext_email['failure'] = False
+            for trigger in element:
+                # TODO check that triggers have their default
+                # config, as JJB does not handle anything else.
+                triggerClass = re.sub(r'^hudson\.plugins\.emailext\.plugins\.trigger\.', '', trigger.tag)
+                if triggerClass == 'AlwaysTrigger':
+                    ext_email['always'] = True
+                elif triggerClass == 'UnstableTrigger':
+                    ext_email['unstable'] = True
+                elif triggerClass == 'FirstFailureTrigger':
+                    ext_email['first-failure'] = True
+                elif triggerClass == 'NotBuiltTrigger':
+                    ext_email['not-built'] = True
+                elif triggerClass == 'AbortedTrigger':
+                    ext_email['aborted'] = True
+                elif triggerClass == 'RegressionTrigger':
+                    ext_email['regression'] = True
+                elif triggerClass == 'FailureTrigger':
+                    ext_email['failure'] = True
+                elif triggerClass == 'SecondFailureTrigger':
+                    ext_email['second-failure'] = True
+                elif triggerClass == 'ImprovementTrigger':
+                    ext_email['improvement'] = True
+                elif triggerClass == 'StillFailingTrigger':
+                    ext_email['still-failing'] = True
+                elif triggerClass == 'SuccessTrigger':
+                    ext_email['success'] = True
+                elif triggerClass == 'FixedTrigger':
+                    ext_email['fixed'] = True
+                elif triggerClass == 'StillUnstableTrigger':
+                    ext_email['still-unstable'] = True
+                elif triggerClass == 'PreBuildTrigger':
+                    ext_email['pre-build'] = True
+                else:
+                    raise NotImplementedError("cannot handle email-ext trigger %s" % trigger.tag)
+        else:
+            raise NotImplementedError("cannot handle "
+                                      "XML %s" % element.tag)
+
+    return {'email-ext': ext_email}
+
+
+# Handle "<hudson.tasks.junit.JUnitResultArchiver>..."
+@register('publisher', 'hudson.tasks.junit.JUnitResultArchiver')
+def handle_junit_publisher(child):
+    junit_publisher = OrderedDict()
+    for element in child:
+        if element.tag == 'testResults':
+            junit_publisher['results'] = element.text
+        elif element.tag == 'keepLongStdio':
+            junit_publisher['keep-long-stdio'] = \
+                (element.text == 'true')
+        elif element.tag == 'healthScaleFactor':
+            junit_publisher['health-scale-factor'] = element.text
+        else:
+            raise NotImplementedError("cannot handle "
+                                      "XML %s" % element.tag)
+    return {'junit': junit_publisher}
+
+
+# Handle "<hudson.plugins.parameterizedtrigger.BuildTrigger>..."
+@register('publisher', 'hudson.plugins.parameterizedtrigger.BuildTrigger')
+def handle_trigger_parameterized_builds_publisher(child):
+    build_trigger = OrderedDict()
+
+    for element in child:
+        for sub in element:
+            if sub.tag == 'hudson.plugins.parameterizedtrigger.BuildTriggerConfig':     # NOQA
+                for config in sub:
+                    if config.tag == 'projects':
+                        build_trigger['project'] = config.text
+                    elif config.tag == 'condition':
+                        build_trigger['condition'] = config.text
+                    elif config.tag == 'triggerWithNoParameters':
+                        build_trigger['trigger-with-no-params'] = \
+                            (config.text == 'true')
+                    elif config.tag == 'configs':
                         pass
                     else:
                         raise NotImplementedError("cannot handle "
-                                                  "html setting %s" % element.tag)
-                publishers.append({'html-publisher': html_settings})
-            elif child.tag == 'hudson.plugins.cobertura.CoberturaPublisher':
-                cobertura = OrderedDict()
-                targets = {'healthyTarget': 'healthy',
-                           'unhealthyTarget': 'unhealthy',
-                           'failingTarget': 'failing'}
-                targetList = {}
-                for param in child:
-                    if param.tag == 'coberturaReportFile':
-                        cobertura['report-file'] = param.text
-                    elif param.tag == 'onlyStable':
-                        cobertura['only-stable'] = param.text == 'true'
-                    elif param.tag == 'failUnhealthy':
-                        cobertura['fail-unhealthy'] = param.text == 'true'
-                    elif param.tag == 'failUnstable':
-                        cobertura['fail-unstable'] = param.text == 'true'
-                    elif param.tag == 'autoUpdateHealth':
-                        cobertura['health-auto-update'] = param.text == 'true'
-                    elif param.tag == 'autoUpdateStability':
-                        cobertura['stability-auto-update'] = param.text == 'true'
-                    elif param.tag == 'zoomCoverageChart':
-                        cobertura['zoom-coverage-chart'] = param.text == 'true'
-                    elif param.tag == 'failNoReports':
-                        cobertura['fail-no-report'] = param.text == 'true'
-                    elif param.tag == 'sourceEncoding':
-                        cobertura['source-encoding'] = param.text
-                    elif param.tag in targets.keys():
-                        if 'targets' not in cobertura:
-                            cobertura['targets'] = []
-                        try:
-                            for te in param.findall('targets/entry'):
-                                metric = te.find('hudson.plugins.cobertura.targets.CoverageMetric')
-                                number = te.find('int')
-                                if metric.text.lower() not in targetList.keys():
-                                    targetList[metric.text.lower()] = {}
-                                targetList[metric.text.lower()] = dict_merge(targetList[metric.text.lower()],  {targets[param.tag]: int(number.text)})
-                        except KeyError, e:
-                            print("cannot handle XML %s" % param.tag)
-                            raise e
-                for tl, tldef in targetList.items():
-                    cobertura['targets'].append({tl: tldef})
-                publishers.append({'cobertura': cobertura})
-
-            elif child.tag == 'jenkins.plugins.slack.SlackNotifier':
-                # Do nothing, it's all handled in the SlackJobProperty
-                pass
+                                                  "XML %s" % config.tag)
 
-            else:
-                raise NotImplementedError("cannot handle XML %s" % child.tag)
+    return {'trigger-parameterized-builds': build_trigger}
 
-        except NotImplementedError, e:
-            print "going raw because: %s" % e
-            insert_rawxml(child, publishers)
 
-    return [['publishers', publishers]]
+# Handle "<hudson.tasks.Mailer>..."
+@register('publisher', 'hudson.tasks.Mailer')
+def handle_email_publisher(child):
+    email_settings = OrderedDict()
+    for element in child:
+
+        if element.tag == 'recipients':
+            email_settings['recipients'] = element.text
+        elif element.tag == 'dontNotifyEveryUnstableBuild':
+            email_settings['notify-every-unstable-build'] = \
+                (element.text == 'true')
+        elif element.tag == 'sendToIndividuals':
+            email_settings['send-to-individuals'] = \
+                (element.text == 'true')
+        else:
+            raise NotImplementedError("cannot handle "
+                                      "email %s" % element.tag)
+    return {'email': email_settings}
+
+
+# Handle "<htmlpublisher.HtmlPublisher>..."
+@register('publisher', 'htmlpublisher.HtmlPublisher')
+def handle_html_publisher(child):
+    if len(child) != 1 or len(child[0]) != 1 \
+            or child[0].tag != 'reportTargets' \
+            or child[0][0].tag != 'htmlpublisher.HtmlPublisherTarget':
+        raise NotImplementedError("can only handle a single HtmlPublisherTarget")
+
+    html_settings = OrderedDict()
+
+    for element in child[0][0]:
+
+        if element.tag == 'reportName':
+            html_settings['name'] = element.text
+        elif element.tag == 'reportDir':
+            html_settings['dir'] = element.text
+        elif element.tag == 'reportFiles':
+            html_settings['files'] = element.text
+        elif element.tag == 'alwaysLinkToLastBuild':
+            html_settings['link-to-last-build'] = element.text == 'true'
+        elif element.tag == 'keepAll':
+            html_settings['keep-all'] = element.text == 'true'
+        elif element.tag == 'allowMissing':
+            html_settings['allow-missing'] = element.text == 'true'
+        elif element.tag == 'wrapperName' and \
+                element.text == 'htmlpublisher-wrapper.html':
+            pass
+        else:
+            raise NotImplementedError("cannot handle "
+                                      "html setting %s" % element.tag)
+    return {'html-publisher': html_settings}
+
+
+# Handle "<hudson.plugins.cobertura.CoberturaPublisher>..."
+@register('publisher', 'hudson.plugins.cobertura.CoberturaPublisher')
+def handle_cobertura_publisher(child):
+    cobertura = OrderedDict()
+    targets = {'healthyTarget': 'healthy',
+               'unhealthyTarget': 'unhealthy',
+               'failingTarget': 'failing'}
+    targetList = {}
+    for param in child:
+        if param.tag == 'coberturaReportFile':
+            cobertura['report-file'] = param.text
+        elif param.tag == 'onlyStable':
+            cobertura['only-stable'] = param.text == 'true'
+        elif param.tag == 'failUnhealthy':
+            cobertura['fail-unhealthy'] = param.text == 'true'
+        elif param.tag == 'failUnstable':
+            cobertura['fail-unstable'] = param.text == 'true'
+        elif param.tag == 'autoUpdateHealth':
+            cobertura['health-auto-update'] = param.text == 'true'
+        elif param.tag == 'autoUpdateStability':
+            cobertura['stability-auto-update'] = param.text == 'true'
+        elif param.tag == 'zoomCoverageChart':
+            cobertura['zoom-coverage-chart'] = param.text == 'true'
+        elif param.tag == 'failNoReports':
+            cobertura['fail-no-report'] = param.text == 'true'
+        elif param.tag == 'sourceEncoding':
+            cobertura['source-encoding'] = param.text
+        elif param.tag in targets.keys():
+            if 'targets' not in cobertura:
+                cobertura['targets'] = []
+            try:
+                for te in param.findall('targets/entry'):
+                    metric = te.find('hudson.plugins.cobertura.targets.CoverageMetric')
+                    number = te.find('int')
+                    if metric.text.lower() not in targetList.keys():
+                        targetList[metric.text.lower()] = {}
+                    targetList[metric.text.lower()] = dict_merge(targetList[metric.text.lower()],  {targets[param.tag]: int(number.text)})
+            except KeyError, e:
+                log.error("cannot handle XML %s", param.tag)
+                raise e
+    for tl, tldef in targetList.items():
+        cobertura['targets'].append({tl: tldef})
+    return {'cobertura': cobertura}
+
+
+# Handle "<jenkins.plugins.slack.SlackNotifier>..."
+@register('publisher', 'jenkins.plugins.slack.SlackNotifier')
+def handle_slack_publisher(child):
+    # Do nothing, it's all handled in the SlackJobProperty
+    return None
 
 
+@register('job', 'buildwrappers')
 def handle_buildwrappers(top):
     wrappers = []
 
@@ -1092,76 +1176,94 @@ def handle_buildwrappers(top):
 
 def handle_buildwrapper(wrapper):
     try:
-        if wrapper.tag == 'EnvInjectPasswordWrapper':
-            inject = OrderedDict()
-            for element in wrapper:
-                if element.tag == 'injectGlobalPasswords':
-                    inject['global'] = (element.text == 'true')
-                elif element.tag == 'maskPasswordParameters':
-                    inject['mask-password-params'] = (element.text == 'true')
-                elif element.tag == 'passwordEntries':
-                    if len(list(element)) > 0:
-                        raise NotImplementedError('TODO: implement handling '
-                                                  'here')
-                else:
-                    raise NotImplementedError("cannot handle "
-                                              "XML %s" % element.tag)
-            return {'inject': inject}
-
-        elif wrapper.tag == 'hudson.plugins.build__timeout.BuildTimeoutWrapper':
-            timeout = OrderedDict()
-            for element in wrapper:
-                if element.tag == 'strategy':
-                    if element.attrib['class'] == 'hudson.plugins.build_timeout.impl.AbsoluteTimeOutStrategy':
-                        timeout['type'] = 'absolute'
-                        timeout['timeout'] = int(element.findtext('timeoutMinutes'))
+        handler = registry.lookup('wrapper', wrapper)
+        if handler is None:
+            raise NotImplementedError("cannot handle XML %s" % wrapper.tag)
+        return handler(wrapper)
 
-                    else:
-                        raise NotImplementedError("cannot handle BuildTimeoutWrapper strategy %s" % element.attrib['class'])
+    except NotImplementedError, e:
+        going_raw('wrapper', wrapper, e)
+        return create_rawxml(wrapper)
 
-                elif element.tag == 'operationList':
-                    for operation in element:
-                        if operation.tag == 'hudson.plugins.build__timeout.operations.FailOperation':
-                            timeout['fail'] = True
 
-                        else:
-                            raise NotImplementedError("cannot handle BuildTimeoutWrapper operation %s" % operation.tag)
+# Handle "<EnvInjectPasswordWrapper>..."
+@register('wrapper', 'EnvInjectPasswordWrapper')
+def handle_inject_wrapper(wrapper):
+    inject = OrderedDict()
+    for element in wrapper:
+        if element.tag == 'injectGlobalPasswords':
+            inject['global'] = (element.text == 'true')
+        elif element.tag == 'maskPasswordParameters':
+            inject['mask-password-params'] = (element.text == 'true')
+        elif element.tag == 'passwordEntries':
+            if len(list(element)) > 0:
+                raise NotImplementedError('TODO: implement handling '
+                                          'here')
+        else:
+            raise NotImplementedError("cannot handle "
+                                      "XML %s" % element.tag)
+    return {'inject': inject}
+
+
+# Handle "<hudson.plugins.build__timeout.BuildTimeoutWrapper>..."
+@register('wrapper', 'hudson.plugins.build__timeout.BuildTimeoutWrapper')
+def handle_timeout_wrapper(wrapper):
+    timeout = OrderedDict()
+    for element in wrapper:
+        if element.tag == 'strategy':
+            if element.attrib['class'] == 'hudson.plugins.build_timeout.impl.AbsoluteTimeOutStrategy':
+                timeout['type'] = 'absolute'
+                timeout['timeout'] = int(element.findtext('timeoutMinutes'))
+
+            else:
+                raise NotImplementedError("cannot handle BuildTimeoutWrapper strategy %s" % element.attrib['class'])
+
+        elif element.tag == 'operationList':
+            for operation in element:
+                if operation.tag == 'hudson.plugins.build__timeout.operations.FailOperation':
+                    timeout['fail'] = True
 
                 else:
-                    raise NotImplementedError("cannot handle BuildTimeoutWrapper wrapper %s" % element.tag)
-
-            return {'timeout': timeout}
-
-        elif wrapper.tag == 'hudson.plugins.ansicolor.AnsiColorBuildWrapper':
-            return {'ansicolor': {'colormap': 'xterm'}}
-
-        elif wrapper.tag == 'com.cloudbees.jenkins.plugins.sshagent.SSHAgentBuildWrapper':    # NOQA
-            ssh_agents = OrderedDict()
-            for element in wrapper:
-                if element.tag == 'credentialIds':
-                    keys = []
-                    for key in element:
-                        keys.append(key.text)
-                    ssh_agents['users'] = keys
-                elif element.tag == 'ignoreMissing':
-                    pass
-                else:
-                    raise NotImplementedError("cannot handle "
-                                              "XML %s" % element.tag)
+                    raise NotImplementedError("cannot handle BuildTimeoutWrapper operation %s" % operation.tag)
+
+        else:
+            raise NotImplementedError("cannot handle BuildTimeoutWrapper wrapper %s" % element.tag)
 
-            return {'ssh-agent-credentials': ssh_agents}
+    return {'timeout': timeout}
 
-        elif wrapper.tag == 'org.jenkinsci.plugins.buildnamesetter.BuildNameSetter':  # NOQA
-            return {'build-name': {'name': wrapper[0].text}}
 
+# Handle "<hudson.plugins.ansicolor.AnsiColorBuildWrapper>..."
+@register('wrapper', 'hudson.plugins.ansicolor.AnsiColorBuildWrapper')
+def handle_ansicolor_wrapper(wrapper):
+    return {'ansicolor': {'colormap': 'xterm'}}
+
+
+# Handle "<com.cloudbees.jenkins.plugins.sshagent.SSHAgentBuildWrapper>..." NOQA
+@register('wrapper', 'com.cloudbees.jenkins.plugins.sshagent.SSHAgentBuildWrapper')  # NOQA
+def handle_ssh_agent_wrapper(wrapper):
+    ssh_agents = OrderedDict()
+    for element in wrapper:
+        if element.tag == 'credentialIds':
+            keys = []
+            for key in element:
+                keys.append(key.text)
+            ssh_agents['users'] = keys
+        elif element.tag == 'ignoreMissing':
+            pass
         else:
-            raise NotImplementedError("cannot handle XML %s" % wrapper.tag)
+            raise NotImplementedError("cannot handle "
+                                      "XML %s" % element.tag)
 
-    except NotImplementedError, e:
-        print "going raw because: %s" % e
-        return create_rawxml(wrapper)
+    return {'ssh-agent-credentials': ssh_agents}
+
+
+# Handle "<org.jenkinsci.plugins.buildnamesetter.BuildNameSetter>..." NOQA
+@register('wrapper', 'org.jenkinsci.plugins.buildnamesetter.BuildNameSetter')  # NOQA
+def handle_build_name_wrapper(wrapper):
+    return {'build-name': {'name': wrapper[0].text}}
 
 
+@register('job', 'executionstrategy')
 def handle_executionstrategy(top):
     strategy = OrderedDict()
     for child in top:
@@ -1175,6 +1277,7 @@ def handle_executionstrategy(top):
 
 
 # Handle "<logrotator>...</logrotator>"'
+@register('job', 'logrotator')
 def handle_logrotator(top):
     logrotate = OrderedDict()
     for child in top:
@@ -1194,30 +1297,36 @@ def handle_logrotator(top):
 
 
 # Handle "<combinationFilter>a != &quot;b&quot;</combinationFilter>"
+@register('job', 'combinationfilter')
 def handle_combinationfilter(top):
     return [['combination-filter', top.text]]
 
 
 # Handle "<assignedNode>server.example.com</assignedNode>"
+@register('job', 'assignednode')
 def handle_assignednode(top):
     return [['node', top.text]]
 
 
 # Handle "<displayName>my cool job</displayName>"
+@register('job', 'displayname')
 def handle_displayname(top):
     return [['display-name', top.text]]
 
 
 # Handle "<quietPeriod>5</quietPeriod>"
+@register('job', 'quietperiod')
 def handle_quietperiod(top):
     return [['quiet-period', top.text]]
 
 
 # Handle "<scmCheckoutRetryCount>8</scmCheckoutRetryCount>"
+@register('job', 'scmcheckoutretrycount')
 def handle_scmcheckoutretrycount(top):
     return [['retry-count', top.text]]
 
 
+@register('job', 'customworkspace')
 def handle_customworkspace(top):
     return [['workspace', top.text]]
 
@@ -1227,6 +1336,5 @@ def insert_rawxml(node, output):
 
 
 def create_rawxml(node):
-    import xml.etree.ElementTree as ET
-    xml = ET.tostring(node).strip() + '\n'
+    xml = xml_backend.raw_xml(node).strip() + '\n'
     return {'raw': {'xml': xml}}
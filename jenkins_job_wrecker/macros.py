@@ -0,0 +1,185 @@
+from collections import OrderedDict
+import hashlib
+import json
+import yaml
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# Pull the builders, publishers and wrappers that many jobs share out into
+# JJB macros, so each is written (and parsed by JJB) once instead of once
+# per job.
+#
+# This is a pass over the whole fleet, after every job is converted: each
+# component of a job's "builders", "publishers" and "wrappers" lists is
+# hashed by its canonical JSON, and a component that appears in at least
+# "threshold" jobs becomes a macro. The macro is named after the component
+# and its hash, like "shell-1a2b3c4d", so the same block keeps the same name
+# from one run to the next. Each job then lists the macro's name in place
+# of the block, which JJB expands back into the same XML.
+#
+# The macros are written to one more file in the output directory,
+# MACROS_NAME plus the usual extension. Jenkins job names cannot contain
+# "@", so it never clashes with a job's file.
+
+MACROS_NAME = '@macros'
+
+# Each section of a job that can use macros, and the kind of macro.
+SECTIONS = OrderedDict([
+    ('builders', 'builder'),
+    ('publishers', 'publisher'),
+    ('wrappers', 'wrapper'),
+])
+
+# Blocks smaller than this many bytes of JSON are left in the jobs, since a
+# macro would not make the output any smaller.
+MIN_SIZE = 40
+
+# The jobs collected for the macro pass of this process, or None when it
+# is off.
+_extractor = None
+
+
+class OrderedLoader(SafeLoader):
+    pass
+
+
+def construct_ordered_dict(loader, node):
+    loader.flatten_mapping(node)
+    return OrderedDict(loader.construct_pairs(node))
+
+
+OrderedLoader.add_constructor(
+    yaml.resolver.BaseResolver.DEFAULT_MAPPING_TAG, construct_ordered_dict)
+
+
+# Return the job structure of a job's YAML (or JSON) text, with the keys
+# in their original order.
+def load(text):
+    if text.startswith(b'['):
+        return json.loads(text.decode('utf-8'), object_pairs_hook=OrderedDict)
+    return yaml.load(text, Loader=OrderedLoader)
+
+
+# Return the canonical JSON of a block, which is the same for equal blocks
+# whatever the order of their keys.
+def block_key(block):
+    return json.dumps(block, sort_keys=True, separators=(',', ':'))
+
+
+# Return the macro name for a block, from its component name and (the
+# first "length" digits of) the hash of its canonical JSON.
+def macro_name(block, key, length=8):
+    component = next(iter(block))
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return '%s-%s' % (component, digest[:length])
+
+
+class MacroExtractor(object):
+
+    def __init__(self, threshold=2, min_size=MIN_SIZE):
+        self.threshold = threshold
+        self.min_size = min_size
+        # (job name, job structure) for each job, in the order they came.
+        self.jobs = []
+        # (section, block key) -> the number of jobs with that block
+        self.counts = {}
+
+    # Add a job's structure, and count the blocks in it.
+    def add(self, name, data):
+        self.jobs.append((name, data))
+        seen = set()
+        for section, block, key in self.blocks(data):
+            if (section, key) not in seen:
+                seen.add((section, key))
+                self.counts[(section, key)] = \
+                    self.counts.get((section, key), 0) + 1
+
+    # Yield (section, block, key) for every block of a job that could be a
+    # macro.
+    def blocks(self, data):
+        for item in data:
+            job = item.get('job')
+            if job is None:
+                continue
+            for section in SECTIONS:
+                for block in job.get(section) or []:
+                    # A bare string names a component without settings.
+                    if isinstance(block, dict) and len(block) == 1:
+                        key = block_key(block)
+                        if len(key) >= self.min_size:
+                            yield section, block, key
+
+    # Return the macros, and each job with its shared blocks replaced by
+    # macro names. The macros are a job structure of JJB "builder",
+    # "publisher" and "wrapper" definitions, sorted by name. The jobs are
+    # (name, job structure) tuples, in the order they were added.
+    def extract(self):
+        names = {}
+        definitions = {}
+        for _, data in self.jobs:
+            for item in data:
+                job = item.get('job')
+                if job is None:
+                    continue
+                for section, kind in SECTIONS.items():
+                    blocks = job.get(section)
+                    if not blocks:
+                        continue
+                    job[section] = [self.replace(section, kind, block,
+                                                 names, definitions)
+                                    for block in blocks]
+        macros = [definitions[name] for name in sorted(definitions)]
+        return macros, self.jobs
+
+    # Return a block, or the name of its macro if enough jobs share it.
+    def replace(self, section, kind, block, names, definitions):
+        if not isinstance(block, dict) or len(block) != 1:
+            return block
+        key = block_key(block)
+        if self.counts.get((section, key), 0) < self.threshold:
+            return block
+        name = names.get((section, key))
+        if name is None:
+            name = macro_name(block, key)
+            if name in definitions:
+                # Two blocks share the short hash.
+                name = macro_name(block, key, 40)
+            names[(section, key)] = name
+            definitions[name] = {kind: OrderedDict([
+                ('name', name), (section, [block])])}
+        return name
+
+
+# Switch the macro pass on for this process: jobs are collected with
+# add(), and written with write() once they are all converted.
+def enable(threshold=2, min_size=MIN_SIZE):
+    global _extractor
+    _extractor = MacroExtractor(threshold, min_size)
+
+
+def disable():
+    global _extractor
+    _extractor = None
+
+
+def enabled():
+    return _extractor is not None
+
+
+# Collect a job's converted structure for the macro pass.
+def add(name, data):
+    _extractor.add(name, data)
+
+
+# Extract the macros from the collected jobs, and write every job, and the
+# macros file if there are any macros, with an OutputWriter. "dump"
+# serializes a job structure. Returns the number of macros.
+def write(writer, dump):
+    macros, jobs = _extractor.extract()
+    if macros:
+        writer.write(MACROS_NAME, dump(macros))
+    for name, data in jobs:
+        writer.write(name, dump(data))
+    return len(macros)
@@ -0,0 +1,373 @@
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import re
+import socket
+import sys
+import threading
+import time
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib import unquote
+    from urlparse import urlsplit, parse_qs
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import unquote, urlsplit, parse_qs
+from jenkins_job_wrecker.sources import expand_filenames, walk_jenkins_home
+
+# A stand-in Jenkins server, for tests and benchmarks of the -s path that
+# must not touch a real master.
+#
+# It serves the small part of the Jenkins HTTP API that JenkinsFetcher
+# uses: "api/json" job listings of the top level and of each folder, and
+# each job's "config.xml", with an ETag so conditional requests get a 304.
+# The jobs come from a JENKINS_HOME-like directory (jobs/<name>/config.xml,
+# with folders as nested "jobs" directories), or from a directory of
+# <name>.xml files like tests/fixtures.
+#
+# Latency, bandwidth and errors can be injected, to measure how jjwrecker
+# copes with a slow or flaky master:
+#
+#   latency     seconds to wait before answering each request
+#   bandwidth   bytes per second to send response bodies at (None: no limit)
+#   error_rate  share of requests (0 to 1) that fail with a 500 error
+#
+# The errors are drawn from a random.Random(seed), so a run is repeatable
+# for the same order of requests.
+
+JOB_CLASS = 'hudson.model.FreeStyleProject'
+FOLDER_CLASS = 'com.cloudbees.hudson.plugins.folder.Folder'
+
+# Bodies are sent in chunks of this many bytes when bandwidth is limited.
+CHUNK_SIZE = 16 * 1024
+
+TREE_FIELDS = re.compile(r'^jobs\[(.*)\]$')
+
+
+class MockJenkins(object):
+
+    def __init__(self, directory, latency=0.0, bandwidth=None, error_rate=0.0,
+                 seed=0, gzip=True, host='127.0.0.1', port=0):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.gzip = gzip
+        self.random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        # Job names to config.xml filenames, and folder names ('' is the
+        # top level) to the sorted names of the jobs and folders in them.
+        self.configs = {}
+        self.folders = {'': set()}
+        for name, filename in find_jobs(directory):
+            self.add_job(name, filename)
+        for folder in self.folders:
+            self.folders[folder] = sorted(self.folders[folder])
+        # Requests served, by kind: "list", "config", "not_modified",
+        # "error" and "not_found".
+        self.requests = dict.fromkeys(('list', 'config', 'not_modified',
+                                       'error', 'not_found'), 0)
+        self._requests_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), MockJenkinsHandler)
+        self.httpd.jenkins = self
+        self.thread = None
+        # Open client connections, to close on stop().
+        self.connections = set()
+        self._connections_lock = threading.Lock()
+
+    def add_job(self, name, filename):
+        self.configs[name] = filename
+        parts = name.split('/')
+        for depth in range(len(parts)):
+            folder = '/'.join(parts[:depth])
+            self.folders.setdefault(folder, set()).add(
+                '/'.join(parts[:depth + 1]))
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://%s:%d/' % (host, port)
+
+    # Serve requests on a background thread.
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    # Stop serving, and close the connections that clients keep alive, so
+    # no handler thread outlives the server.
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+        with self._connections_lock:
+            connections = list(self.connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def count(self, kind):
+        with self._requests_lock:
+            self.requests[kind] += 1
+
+    def inject_error(self):
+        if not self.error_rate:
+            return False
+        with self._random_lock:
+            return self.random.random() < self.error_rate
+
+    # Return the "api/json" listing of a folder ('' is the top level), with
+    # the tree API fields each job has, or None for an unknown folder.
+    def listing(self, folder, fields):
+        if folder not in self.folders:
+            return None
+        jobs = []
+        for name in self.folders[folder]:
+            job = {'name': name.rsplit('/', 1)[-1]}
+            if '_class' in fields:
+                job['_class'] = JOB_CLASS if name in self.configs \
+                    else FOLDER_CLASS
+            jobs.append(job)
+        return {'_class': 'hudson.model.Hudson', 'jobs': jobs}
+
+
+# A MockJenkins in a child process, so serving requests does not compete
+# for the GIL with the jjwrecker under test. It offers the same url,
+# requests, start() and stop() as a MockJenkins, and takes the same
+# arguments.
+class MockJenkinsProcess(object):
+
+    def __init__(self, directory, **options):
+        self._conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_serve_in_child, args=(child_conn, directory, options))
+        self.process.daemon = True
+        self.url = None
+        self.jobs = None
+
+    def start(self):
+        self.process.start()
+        self.url, self.jobs = self._conn.recv()
+        return self
+
+    @property
+    def requests(self):
+        self._conn.send('requests')
+        return self._conn.recv()
+
+    def stop(self):
+        self._conn.send('stop')
+        self.process.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _serve_in_child(conn, directory, options):
+    with MockJenkins(directory, **options) as jenkins:
+        conn.send((jenkins.url, len(jenkins.configs)))
+        while conn.recv() != 'stop':
+            with jenkins._requests_lock:
+                conn.send(dict(jenkins.requests))
+
+
+# Yield a (name, filename) tuple for each job in a JENKINS_HOME-like
+# directory, or in a directory of <name>.xml files.
+def find_jobs(directory):
+    if os.path.isdir(os.path.join(directory, 'jobs')):
+        return walk_jenkins_home(directory)
+    return expand_filenames([os.path.join(directory, '*.xml')])
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    # Let a burst of concurrent connections queue up.
+    request_queue_size = 128
+
+
+class MockJenkinsHandler(BaseHTTPRequestHandler):
+    # Keep connections alive, like Jenkins does.
+    protocol_version = 'HTTP/1.1'
+    # Buffer each response, and send it in one go when the request is
+    # done, rather than a packet per header line.
+    wbufsize = -1
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        jenkins = self.server.jenkins
+        with jenkins._connections_lock:
+            jenkins.connections.add(self.connection)
+
+    def finish(self):
+        jenkins = self.server.jenkins
+        with jenkins._connections_lock:
+            jenkins.connections.discard(self.connection)
+        try:
+            BaseHTTPRequestHandler.finish(self)
+        except socket.error:
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        jenkins = self.server.jenkins
+        if jenkins.latency:
+            time.sleep(jenkins.latency)
+        if jenkins.inject_error():
+            jenkins.count('error')
+            self.send_body(500, b'injected error\n', 'text/plain')
+            return
+        url = urlsplit(self.path)
+        parts = [unquote(part) for part in url.path.split('/') if part]
+        # /job/a/job/b/... names the job or folder "a/b".
+        names = []
+        while len(parts) >= 2 and parts[0] == 'job':
+            names.append(parts[1])
+            parts = parts[2:]
+        name = '/'.join(names)
+        if parts == ['api', 'json']:
+            self.send_listing(jenkins, name, parse_qs(url.query))
+        elif parts == ['config.xml'] and name in jenkins.configs:
+            self.send_config(jenkins, name)
+        else:
+            jenkins.count('not_found')
+            self.send_body(404, b'not found\n', 'text/plain')
+
+    def send_listing(self, jenkins, folder, query):
+        fields = ['name', '_class']
+        match = TREE_FIELDS.match(query.get('tree', [''])[0])
+        if match:
+            fields = match.group(1).split(',')
+        listing = jenkins.listing(folder, fields)
+        if listing is None:
+            jenkins.count('not_found')
+            self.send_body(404, b'not found\n', 'text/plain')
+            return
+        jenkins.count('list')
+        self.send_body(200, json.dumps(listing).encode('utf-8'),
+                       'application/json;charset=utf-8')
+
+    def send_config(self, jenkins, name):
+        with open(jenkins.configs[name], 'rb') as f:
+            xml = f.read()
+        etag = '"%s"' % hashlib.sha1(xml).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            jenkins.count('not_modified')
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        jenkins.count('config')
+        self.send_body(200, xml, 'application/xml;charset=utf-8',
+                       {'ETag': etag})
+
+    def send_body(self, status, body, content_type, headers=None):
+        jenkins = self.server.jenkins
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if jenkins.gzip and 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip_bytes(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        for header, value in (headers or {}).items():
+            self.send_header(header, value)
+        self.end_headers()
+        if not jenkins.bandwidth:
+            self.wfile.write(body)
+            return
+        # Wait for each chunk's share of time before sending it.
+        self.wfile.flush()
+        for start in range(0, len(body), CHUNK_SIZE):
+            chunk = body[start:start + CHUNK_SIZE]
+            time.sleep(len(chunk) / float(jenkins.bandwidth))
+            self.wfile.write(chunk)
+            self.wfile.flush()
+
+
+def gzip_bytes(data):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description='Serve Jenkins jobs from a JENKINS_HOME directory (or '
+                    'a directory of <name>.xml files) over a stand-in '
+                    'Jenkins HTTP API, for testing jjwrecker -s.')
+    parser.add_argument(
+        'directory',
+        help='JENKINS_HOME directory, or directory of XML files'
+    )
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help='Address to listen on (default 127.0.0.1)'
+    )
+    parser.add_argument(
+        '-p', '--port',
+        type=int, default=8080,
+        help='Port to listen on (default 8080)'
+    )
+    parser.add_argument(
+        '--latency',
+        type=float, default=0.0,
+        help='Seconds to wait before answering each request (default 0)'
+    )
+    parser.add_argument(
+        '--bandwidth',
+        type=int,
+        help='Bytes per second to send each response at (default: no '
+             'limit)'
+    )
+    parser.add_argument(
+        '--error-rate',
+        type=float, default=0.0,
+        help='Share of requests that fail with a 500 error (default 0)'
+    )
+    parser.add_argument(
+        '--seed',
+        type=int, default=0,
+        help='Random seed for the injected errors (default 0)'
+    )
+    return parser.parse_args(args)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    jenkins = MockJenkins(args.directory, latency=args.latency,
+                          bandwidth=args.bandwidth,
+                          error_rate=args.error_rate, seed=args.seed,
+                          host=args.host, port=args.port)
+    print('serving %d jobs at %s' % (len(jenkins.configs), jenkins.url))
+    try:
+        jenkins.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    jenkins.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
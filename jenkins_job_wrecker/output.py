@@ -0,0 +1,144 @@
+import errno
+import hashlib
+import os
+import tempfile
+import threading
+
+# mkstemp() creates private files. Give output files the usual permissions
+# instead. The umask can only be read by setting it, so it is read on the
+# first write, not when this module is imported.
+_umask = None
+_umask_lock = threading.Lock()
+
+
+# Return the mode of a new output file under the process's umask.
+def file_mode():
+    global _umask
+    with _umask_lock:
+        if _umask is None:
+            _umask = os.umask(0)
+            os.umask(_umask)
+    return 0o666 & ~_umask
+
+
+# Write job YAML files under an output directory.
+#
+# A file is only written if its content changed, so unchanged jobs keep
+# their mtimes. Changed files are written to a temporary file and renamed
+# into place, so readers never see a half-written file. The directories of
+# renamed files are fsynced once each, when the writer is closed.
+class OutputWriter(object):
+
+    def __init__(self, directory, extension='.yml'):
+        self.directory = directory
+        self.extension = extension
+        self.written = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.skipped = 0
+        # Every file this run wrote or kept, for prune().
+        self.seen = set()
+        self._dirty_dirs = set()
+
+    # Return the file name for a job. Jobs in folders ("folder/job") are
+    # written to subdirectories.
+    def filename(self, name):
+        return os.path.join(self.directory, name + self.extension)
+
+    # Write a job's text, unless the file already holds the same text.
+    def write(self, name, text):
+        filename = self.filename(name)
+        self.seen.add(filename)
+        if file_digest(filename) == hashlib.sha1(text).hexdigest():
+            self.unchanged += 1
+            return False
+        dirname = os.path.dirname(filename)
+        try:
+            os.makedirs(dirname)
+        except OSError as exception:
+            if exception.errno != errno.EEXIST:
+                raise
+        fd, temp_filename = tempfile.mkstemp(dir=dirname, prefix='.',
+                                             suffix='.tmp')
+        try:
+            os.fchmod(fd, file_mode())
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(text)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.rename(temp_filename, filename)
+        except Exception:
+            os.unlink(temp_filename)
+            raise
+        self._dirty_dirs.add(dirname)
+        self.written += 1
+        return True
+
+    # Note that a job's existing file is up to date, without reading it.
+    def keep(self, name):
+        self.seen.add(self.filename(name))
+        self.unchanged += 1
+
+    # Note that a job could not be converted. Its existing file, if any, is
+    # left as it is.
+    def skip(self, name):
+        self.seen.add(self.filename(name))
+        self.skipped += 1
+
+    # Delete a job's file, if there is one, for a job that is now written
+    # in another file.
+    def remove(self, name):
+        filename = self.filename(name)
+        try:
+            os.unlink(filename)
+        except OSError as exception:
+            if exception.errno != errno.ENOENT:
+                raise
+            return False
+        self._dirty_dirs.add(os.path.dirname(filename))
+        self.deleted += 1
+        return True
+
+    # Delete the job files that this run did not write or keep, for jobs
+    # that no longer exist. Only call this after converting every job.
+    def prune(self):
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if filename.endswith(self.extension) and \
+                        path not in self.seen:
+                    os.unlink(path)
+                    self._dirty_dirs.add(dirpath)
+                    self.deleted += 1
+
+    # Make the renames and deletions durable.
+    def close(self):
+        for dirname in sorted(self._dirty_dirs):
+            fd = os.open(dirname, os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        self._dirty_dirs.clear()
+
+    def summary(self):
+        summary = 'output: %d written, %d unchanged, %d deleted' % (
+            self.written, self.unchanged, self.deleted)
+        if self.skipped:
+            summary += ', %d skipped' % self.skipped
+        return summary
+
+
+# Return the SHA-1 hex digest of a file's content, or None if there is no
+# such file.
+def file_digest(filename):
+    digest = hashlib.sha1()
+    try:
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(65536), b''):
+                digest.update(block)
+    except IOError as exception:
+        if exception.errno == errno.ENOENT:
+            return None
+        raise
+    return digest.hexdigest()
@@ -1,11 +1,14 @@
 import collections
+import re
 import yaml
 from yaml.representer import SafeRepresenter
+try:
+    from yaml import CDumper
+except ImportError:
+    CDumper = None
 
 
-class PrettyDumper(yaml.Dumper):
-    def __init__(self, *args, **kwargs):
-        super(PrettyDumper, self).__init__(*args, **kwargs)
+class PrettyRepresenter(object):
 
     def represent_literal_str(self, data):
         node = SafeRepresenter.represent_str(self, data)
@@ -24,9 +27,87 @@ class PrettyDumper(yaml.Dumper):
         return node
 
 
+class PrettyDumper(PrettyRepresenter, yaml.Dumper):
+    def __init__(self, *args, **kwargs):
+        super(PrettyDumper, self).__init__(*args, **kwargs)
+
+
 PrettyDumper.add_representer(str, PrettyDumper.represent_literal_str)
 PrettyDumper.add_representer(collections.OrderedDict, PrettyDumper.represent_ordered_dict)
 
 
+# The same dumper, with libyaml's C emitter.
+if CDumper is not None:
+    class PrettyCDumper(PrettyRepresenter, CDumper):
+        pass
+
+    PrettyCDumper.add_representer(str, PrettyCDumper.represent_literal_str)
+    PrettyCDumper.add_representer(collections.OrderedDict, PrettyCDumper.represent_ordered_dict)
+else:
+    PrettyCDumper = None
+
+# Strings that PrettyDumper writes in double quotes: any with special
+# characters (including tabs and non-ASCII), or with a space before a line
+# break.
+DOUBLE_QUOTED = re.compile(r'[^\n\x20-\x7e]| \n')
+
+
+# PrettyDumper writes a key as a simple "key: value" key only if it is
+# shorter than 128 characters, counting its 5-character "!!str" tag.
+SIMPLE_KEY_LENGTH = 128 - len('!!str')
+
+
+# Return True if PrettyCDumper writes exactly the same YAML as PrettyDumper
+# for this data. The emitters differ in how they fold long double-quoted
+# strings, and in how they write unusual mapping keys, so data with any of
+# those is left to PrettyDumper.
+def c_dumpable(data):
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            if DOUBLE_QUOTED.search(value) or \
+                    ('\n' in value and value.endswith(' ')):
+                return False
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                if not isinstance(key, str) or not key or \
+                        len(key) >= SIMPLE_KEY_LENGTH or \
+                        '\n' in key or DOUBLE_QUOTED.search(key):
+                    return False
+                stack.append(item)
+        elif isinstance(value, list):
+            stack.extend(value)
+        elif not isinstance(value, (bool, int, long, type(None))):
+            return False
+    return True
+
+
+# Return True if the last value PrettyDumper writes for this data is a
+# literal string that keeps its trailing line breaks ("|+"). PrettyDumper
+# then ends the document with an explicit "..." end marker.
+def ends_open(data):
+    while True:
+        if isinstance(data, dict) and data:
+            if isinstance(data, collections.OrderedDict):
+                data = data[next(reversed(data))]
+            else:
+                # Plain dicts are written in key order.
+                data = data[max(data)]
+        elif isinstance(data, list) and data:
+            data = data[-1]
+        else:
+            break
+    return isinstance(data, str) and data.endswith('\n') and \
+        (len(data) == 1 or data[-2] == '\n')
+
+
 def dump(data):
+    if PrettyCDumper is not None and c_dumpable(data):
+        text = yaml.dump(data, Dumper=PrettyCDumper, default_flow_style=False)
+        # libyaml writes the "..." end marker after any "|+" string, even
+        # one that is followed by other values.
+        if text.endswith('\n...\n') and not ends_open(data):
+            text = text[:-len('...\n')]
+        return text
     return yaml.dump(data, Dumper=PrettyDumper, default_flow_style=False)
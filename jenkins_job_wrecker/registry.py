@@ -0,0 +1,78 @@
+# Map Jenkins XML elements to the functions in job_handlers.py (or in other
+# modules) that translate them.
+#
+# Each handler is registered for a "kind" of element, and the element's tag.
+# The kinds are:
+#
+#   job        top-level children of <project> and <matrix-project>. These
+#              tags are registered in lower case, and looked up
+#              case-insensitively.
+#   property   children of <properties>
+#   trigger    children of <triggers>
+#   builder    children of <builders>
+#   publisher  children of <publishers>
+#   wrapper    children of <buildWrappers>
+#
+# A handler may also be registered for one value of the element's "class"
+# attribute, which takes priority over a handler for the bare tag.
+#
+# To support another plugin, register a handler for its tag:
+#
+#   from jenkins_job_wrecker.registry import register
+#
+#   @register('publisher', 'org.example.MyPublisher')
+#   def handle_my_publisher(child):
+#       return {'my-publisher': {'enabled': True}}
+class HandlerRegistry(object):
+
+    def __init__(self):
+        self._handlers = {}
+        # A function of (kind, handler) that returns a wrapper for each
+        # handler that get() and lookup() return, like instrument.timed().
+        self.wrapper = None
+
+    # Decorator to register a handler function.
+    def register(self, kind, tag, cls=None):
+        def decorator(handler):
+            self.add(kind, tag, handler, cls)
+            return handler
+        return decorator
+
+    def add(self, kind, tag, handler, cls=None):
+        self._handlers[(kind, tag, cls)] = handler
+        # Record what each handler claims, so callers can introspect it.
+        handles = getattr(handler, 'handles', [])
+        handler.handles = handles + [(kind, tag, cls)]
+
+    # Return the handler for a kind and tag (and class), or None.
+    def get(self, kind, tag, cls=None):
+        handler = self._handlers.get((kind, tag, cls))
+        if handler is not None and self.wrapper is not None:
+            return self.wrapper(kind, handler)
+        return handler
+
+    # Return the handler for an XML element, or None.
+    def lookup(self, kind, element):
+        cls = element.get('class')
+        handler = None
+        if cls is not None:
+            handler = self._handlers.get((kind, element.tag, cls))
+        if handler is None:
+            handler = self._handlers.get((kind, element.tag, None))
+        if handler is not None and self.wrapper is not None:
+            return self.wrapper(kind, handler)
+        return handler
+
+    # Return the sorted tags that have handlers of a kind.
+    def tags(self, kind):
+        return sorted(set(tag for (k, tag, cls) in self._handlers
+                          if k == kind))
+
+    # Return a sorted list of ((kind, tag, cls), handler) tuples.
+    def items(self):
+        return sorted(self._handlers.items(),
+                      key=lambda item: tuple(part or '' for part in item[0]))
+
+
+registry = HandlerRegistry()
+register = registry.register
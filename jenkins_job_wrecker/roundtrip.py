@@ -0,0 +1,233 @@
+from collections import namedtuple
+import jenkins_job_wrecker.xml_backend as xml_backend
+
+# Compare a job's original config.xml with the XML that JJB generates from
+# jjwrecker's YAML, to check that the conversion round-trips.
+#
+# Jenkins and JJB write the same settings in different ways, so both trees
+# are canonicalized before they are compared:
+#
+# - Whitespace around text is dropped, booleans are lower case, and
+#   attributes are compared as a set. Children are matched by tag (and the
+#   order among children of the same tag), not by their position among all
+#   children.
+# - "plugin" attributes, which record the version of the plugin that saved
+#   the job, are ignored.
+# - Fields that are empty, "false" or another default in FIELD_DEFAULTS are
+#   dropped, since Jenkins reads a missing field as its default. Element
+#   names with a "." are Java classes (a builder, an extension, a trigger),
+#   and are kept, because their presence means something.
+# - The Git SCM's old fields (wipeOutWorkspace, skipTag, relativeTargetDir,
+#   localBranch) become the extensions JJB writes, with the same defaults
+#   as handle_scm() on both sides, and the settings JJB fills in for every
+#   repository (gitTool "Default", the "origin" remote and its refspec) are
+#   dropped.
+# - The "Managed by Jenkins Job Builder" marker that JJB adds to the
+#   description is dropped.
+#
+# The canonical form of an element is a (tag, text, attributes, children)
+# tuple, so identical subtrees compare equal without walking them again.
+
+# A difference between the trees, at a path like
+# "project/builders/hudson.tasks.Shell[2]/command", or ".../@class" for an
+# attribute. "original" and "regenerated" are the text (or attribute value)
+# on each side, or None if it is missing there. An element that is only on
+# one side, and has attributes or children, is shown as its start tag.
+Difference = namedtuple('Difference', 'path original regenerated')
+
+IGNORED_ATTRIBUTES = frozenset(['plugin'])
+
+# Field values that Jenkins uses when a field is missing.
+DEFAULT_TEXTS = frozenset(['', 'false'])
+
+# Other defaults, by field, that JJB writes out and Jenkins (or the plugin)
+# uses when the field is missing.
+FIELD_DEFAULTS = {
+    'canRoam': 'true',
+    'caseSensitive': 'true',
+    'contentType': 'project',
+    'presendScript': '$DEFAULT_PRESEND_SCRIPT',
+    'replyTo': '$PROJECT_DEFAULT_REPLYTO',
+}
+
+# The "class" attribute of elements that Jenkins reads as this class when
+# the attribute is missing.
+DEFAULT_CLASSES = {
+    'logRotator': 'hudson.tasks.LogRotator',
+    'scm': 'hudson.scm.NullSCM',
+    'triggers': 'vector',
+}
+
+MANAGED_BY_JJB = '<!-- Managed by Jenkins Job Builder -->'
+
+GIT_EXTENSION = 'hudson.plugins.git.extensions.impl.'
+GIT_DEFAULT_REFSPEC = '+refs/heads/*:refs/remotes/origin/*'
+# Whether a Git SCM with neither wipeOutWorkspace nor the WipeWorkspace
+# extension wipes the workspace. JJB's wipe-workspace defaults to true, but
+# Jenkins reads the missing setting as false, and handle_scm() writes that
+# out, so the job keeps its workspace on both sides.
+GIT_WIPE_WORKSPACE = False
+
+
+# Return the canonical form of an element.
+def canonical(element):
+    tag = element.tag
+    text = (element.text or '').strip()
+    if text in ('True', 'False'):
+        text = text.lower()
+    elif tag == 'description' and text.endswith(MANAGED_BY_JJB):
+        text = text[:-len(MANAGED_BY_JJB)].strip()
+    attrs = tuple(sorted(
+        (key, value) for key, value in element.attrib.items()
+        if key not in IGNORED_ATTRIBUTES and
+        not (key == 'class' and value == DEFAULT_CLASSES.get(tag))))
+    children = [canonical(child) for child in element]
+    normalize = NORMALIZERS.get(element.get('class')) or NORMALIZERS.get(tag)
+    if normalize is not None:
+        children = normalize(children)
+    children = tuple(child for child in children if not is_default(child))
+    return (tag, text, attrs, children)
+
+
+# Is a canonical element a field that Jenkins would read the same way if
+# it were missing?
+def is_default(node):
+    tag, text, attrs, children = node
+    return '.' not in tag and not attrs and not children and \
+        (text in DEFAULT_TEXTS or text == FIELD_DEFAULTS.get(tag))
+
+
+def leaf(tag, text=''):
+    return (tag, text, (), ())
+
+
+# Rewrite the fields of a Git SCM the way JJB writes them.
+def normalize_git(children):
+    fields = []
+    extensions = []
+    skip_tag = True
+    wipe_workspace = None
+    for node in children:
+        tag, text = node[0], node[1]
+        if tag == 'extensions':
+            for extension in node[3]:
+                if extension[0] == GIT_EXTENSION + 'WipeWorkspace':
+                    wipe_workspace = True
+                else:
+                    extensions.append(extension)
+        elif tag == 'wipeOutWorkspace':
+            wipe_workspace = text == 'true'
+        elif tag == 'skipTag':
+            skip_tag = text == 'true'
+        elif tag == 'relativeTargetDir':
+            if text:
+                extensions.append(
+                    (GIT_EXTENSION + 'RelativeTargetDirectory', '', (),
+                     (leaf('relativeTargetDir', text),)))
+        elif tag == 'localBranch':
+            if text:
+                extensions.append((GIT_EXTENSION + 'LocalBranch', '', (),
+                                   (leaf('localBranch', text),)))
+        elif tag == 'gitTool' and text == 'Default':
+            continue
+        elif tag in ('configVersion', 'buildChooser'):
+            # handle_scm() ignores these (it only converts the default
+            # build chooser).
+            continue
+        elif tag == 'submoduleCfg' and not node[3]:
+            continue
+        else:
+            fields.append(node)
+    if not skip_tag:
+        extensions.append(leaf(GIT_EXTENSION + 'PerBuildTag'))
+    if wipe_workspace is None:
+        wipe_workspace = GIT_WIPE_WORKSPACE
+    if wipe_workspace:
+        extensions.append(leaf(GIT_EXTENSION + 'WipeWorkspace'))
+    # Each extension counts once, in a stable order.
+    extensions = sorted(set(extensions))
+    if extensions:
+        fields.append(('extensions', '', (), tuple(extensions)))
+    return fields
+
+
+# Drop the settings that JJB writes for every Git remote.
+def normalize_git_remote(children):
+    return [node for node in children
+            if (node[0], node[1]) not in (('name', 'origin'),
+                                          ('refspec', GIT_DEFAULT_REFSPEC))]
+
+
+# Functions that rewrite the canonical children of an element, by the
+# element's "class" attribute or tag.
+NORMALIZERS = {
+    'hudson.plugins.git.GitSCM': normalize_git,
+    'hudson.plugins.git.UserRemoteConfig': normalize_git_remote,
+}
+
+
+# Return a list of Differences between two elements.
+def diff(original, regenerated):
+    differences = []
+    diff_nodes(canonical(original), canonical(regenerated), original.tag,
+               differences)
+    return differences
+
+
+# Return a list of Differences between two XML documents (bytes).
+def diff_xml(original, regenerated):
+    return diff(xml_backend.fromstring(original),
+                xml_backend.fromstring(regenerated))
+
+
+def diff_nodes(a, b, path, differences):
+    if a == b:
+        return
+    if a[1] != b[1]:
+        differences.append(Difference(path, a[1], b[1]))
+    if a[2] != b[2]:
+        a_attrs, b_attrs = dict(a[2]), dict(b[2])
+        for key in sorted(set(a_attrs) | set(b_attrs)):
+            if a_attrs.get(key) != b_attrs.get(key):
+                differences.append(Difference('%s/@%s' % (path, key),
+                                              a_attrs.get(key),
+                                              b_attrs.get(key)))
+    if a[3] == b[3]:
+        return
+    a_children = keyed(a[3])
+    b_children = keyed(b[3])
+    b_nodes = dict(b_children)
+    for key, node in a_children:
+        other = b_nodes.pop(key, None)
+        if other is None:
+            differences.append(Difference('%s/%s' % (path, key),
+                                          describe(node), None))
+        else:
+            diff_nodes(node, other, '%s/%s' % (path, key), differences)
+    for key, node in b_children:
+        if key in b_nodes:
+            differences.append(Difference('%s/%s' % (path, key), None,
+                                          describe(node)))
+
+
+# Return the text of a canonical element, or its start tag if it has
+# attributes or children.
+def describe(node):
+    tag, text, attrs, children = node
+    if not attrs and not children:
+        return text
+    return '<%s>' % ' '.join([tag] + ['%s="%s"' % attr for attr in attrs])
+
+
+# Return (key, node) pairs for canonical children, where the key is the
+# tag, with the 1-based position among children of that tag after the
+# first one, like an ElementPath: "tag", "tag[2]", "tag[3]"...
+def keyed(children):
+    counts = {}
+    pairs = []
+    for node in children:
+        count = counts[node[0]] = counts.get(node[0], 0) + 1
+        key = node[0] if count == 1 else '%s[%d]' % (node[0], count)
+        pairs.append((key, node))
+    return pairs
+
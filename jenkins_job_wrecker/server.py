@@ -0,0 +1,271 @@
+import argparse
+import errno
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn, TCPServer
+    from urlparse import urlsplit, parse_qs
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn, TCPServer
+    from urllib.parse import urlsplit, parse_qs
+import jenkins_job_wrecker.cli as cli
+from jenkins_job_wrecker.client import default_socket
+import jenkins_job_wrecker.xml_backend as xml_backend
+
+# "jjwrecker serve": a daemon that converts jobs sent to it, for tools that
+# convert one job at a time and should not pay for starting Python and
+# importing jjwrecker each time.
+#
+# It listens on a Unix socket (or a local HTTP port), and converts on a pool
+# of worker processes that stay up between requests, with the handlers,
+# XML parser and YAML writer already imported. The protocol is plain HTTP:
+#
+#   POST /convert?name=<job>&format=<yaml|json>
+#
+# with the job's XML as the body. The response is the job's YAML (or JSON)
+# with a 200 status, or the conversion's error as text with a 400 status.
+# client.py is a small client for it.
+
+log = logging.getLogger('jjwrecker')
+
+CONTENT_TYPES = {'yaml': 'application/yaml', 'json': 'application/json'}
+
+
+class ConversionServer(object):
+
+    def __init__(self, socket_path=None, host='127.0.0.1', port=None,
+                 processes=None, backend='auto'):
+        # Fail here for an unknown or missing backend, rather than in each
+        # worker.
+        xml_backend.set_backend(backend)
+        # Start the workers before any thread, since they are forked.
+        self.pool = multiprocessing.Pool(processes, cli._init_worker,
+                                         (None, backend))
+        self.socket_path = None
+        try:
+            if port is None:
+                self.socket_path = socket_path or default_socket()
+                remove_stale_socket(self.socket_path)
+                self.httpd = ThreadingUnixHTTPServer(self.socket_path,
+                                                     ConversionHandler)
+            else:
+                self.httpd = ThreadingHTTPServer((host, port),
+                                                 ConversionHandler)
+        except Exception:
+            self.pool.close()
+            self.pool.join()
+            raise
+        self.httpd.conversions = self
+        self.thread = None
+        self.requests = 0
+        self.errors = 0
+        self._requests_lock = threading.Lock()
+
+    @property
+    def address(self):
+        if self.socket_path is not None:
+            return self.socket_path
+        host, port = self.httpd.server_address[:2]
+        return 'http://%s:%d/' % (host, port)
+
+    # Convert a job on a worker, and return (text, None), or (None, error
+    # message) if it cannot be converted.
+    def convert(self, name, xml, output_format):
+        text, error = self.pool.apply(_convert_in_worker,
+                                      ((name, xml, output_format),))
+        with self._requests_lock:
+            self.requests += 1
+            if error is not None:
+                self.errors += 1
+        return text, error
+
+    # Serve requests on a background thread.
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.thread is not None:
+            self.httpd.shutdown()
+            self.thread.join()
+        self.close()
+
+    # Close the socket, and stop the workers once they finish the jobs in
+    # progress. (Pool.terminate() can hang on Python 2 while workers wait
+    # for jobs.)
+    def close(self):
+        self.httpd.server_close()
+        if self.socket_path is not None:
+            remove_socket(self.socket_path)
+        self.pool.close()
+        self.pool.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _convert_in_worker(job):
+    name, xml, output_format = job
+    try:
+        return cli.convert_xml(name, xml, output_format=output_format).yaml, \
+            None
+    except Exception as err:
+        # Not every exception can be pickled back to the server.
+        return None, '%s: %s' % (type(err).__name__, err)
+
+
+def remove_socket(path):
+    try:
+        os.unlink(path)
+    except OSError as exception:
+        if exception.errno != errno.ENOENT:
+            raise
+
+
+# Remove a Unix socket left over by a daemon that did not stop cleanly.
+# Raises socket.error if a daemon is still listening on it.
+def remove_stale_socket(path):
+    if not os.path.exists(path):
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error as err:
+        if err.errno != errno.ECONNREFUSED:
+            raise
+        remove_socket(path)
+        return
+    finally:
+        sock.close()
+    raise socket.error(errno.EADDRINUSE, 'a daemon is already listening on '
+                                         '%s' % path)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class ThreadingUnixHTTPServer(ThreadingHTTPServer):
+    address_family = socket.AF_UNIX
+
+    # HTTPServer expects a (host, port) address.
+    def server_bind(self):
+        TCPServer.server_bind(self)
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    # Keep connections alive, for clients that convert many jobs.
+    protocol_version = 'HTTP/1.1'
+
+    # Unix socket clients have no address to log, so log each request
+    # without one.
+    def log_message(self, format, *args):
+        log.debug('serve: ' + format % args)
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        xml = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if url.path != '/convert':
+            self.send_body(404, b'not found\n')
+            return
+        name = query.get('name', [None])[0]
+        output_format = query.get('format', ['yaml'])[0]
+        if not name:
+            self.send_body(400, b'name is required\n')
+            return
+        if output_format not in cli.FORMATS:
+            self.send_body(400, b'format must be one of: ' +
+                           ', '.join(cli.FORMATS).encode('utf-8') + b'\n')
+            return
+        text, error = self.server.conversions.convert(name, xml,
+                                                      output_format)
+        if error is not None:
+            if not isinstance(error, bytes):
+                error = error.encode('utf-8')
+            self.send_body(400, error + b'\n')
+            return
+        self.send_body(200, text, CONTENT_TYPES[output_format])
+
+    def send_body(self, status, body, content_type='text/plain'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type + ';charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        prog='jjwrecker serve',
+        description='Convert Jenkins XML jobs sent over a Unix socket (or a '
+                    'local HTTP port) on warm worker processes. Send jobs '
+                    'with jjwrecker-client.')
+    parser.add_argument(
+        '--socket',
+        help='Unix socket to listen on (default: $JJW_SOCKET, or %s)'
+             % default_socket()
+    )
+    parser.add_argument(
+        '--host',
+        default='127.0.0.1',
+        help='Address to listen on, with --port (default 127.0.0.1)'
+    )
+    parser.add_argument(
+        '-p', '--port',
+        type=int,
+        help='HTTP port to listen on, instead of a Unix socket'
+    )
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        help='Number of conversion processes (default: one per CPU)'
+    )
+    parser.add_argument(
+        '--xml-backend',
+        choices=xml_backend.BACKENDS, default='auto',
+        help='XML parser to use (default auto)'
+    )
+    return parser.parse_args(args)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    try:
+        server = ConversionServer(args.socket, args.host, args.port,
+                                  args.jobs, args.xml_backend)
+    except (socket.error, ValueError) as err:
+        log.critical('cannot serve: %s' % err)
+        exit(1)
+    log.info('serving on %s' % server.address)
+
+    # Clean up the socket on "kill" too.
+    def terminate(signum, frame):
+        sys.exit(0)
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        log.info('served %d jobs (%d errors)' % (server.requests,
+                                                 server.errors))
+
+
+if __name__ == '__main__':
+    main()
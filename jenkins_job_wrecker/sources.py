@@ -0,0 +1,168 @@
+import fnmatch
+import glob
+import os
+import re
+import tarfile
+from xml.parsers import expat
+try:
+    from os import scandir
+except ImportError:
+    from scandir import scandir
+
+
+# Walk a JENKINS_HOME directory, and yield a (name, filename) tuple for each
+# job's config.xml. Jobs inside folders are named "folder/job", like Jenkins
+# does.
+def walk_jenkins_home(jenkins_home):
+    return walk_jobs_dir(os.path.join(jenkins_home, 'jobs'))
+
+
+# Yield a (name, filename) tuple for each job in a "jobs" directory,
+# descending into the "jobs" directories of folders.
+def walk_jobs_dir(jobs_dir, prefix=''):
+    for entry in sorted(scandir(jobs_dir), key=lambda entry: entry.name):
+        if not entry.is_dir():
+            continue
+        name = prefix + entry.name
+        # Folders hold their own jobs in a nested "jobs" directory.
+        nested_jobs_dir = os.path.join(entry.path, 'jobs')
+        if os.path.isdir(nested_jobs_dir):
+            for job in walk_jobs_dir(nested_jobs_dir, name + '/'):
+                yield job
+            continue
+        filename = os.path.join(entry.path, 'config.xml')
+        if os.path.isfile(filename):
+            yield name, filename
+
+
+# Stream through a (possibly compressed) tar archive of JENKINS_HOME, and
+# yield a (name, xml) tuple for each job's config.xml. Only the config.xml
+# members are read into memory; everything else (build history and so on)
+# is skipped as the archive is read once, front to back.
+def iter_archive(filename):
+    with tarfile.open(filename, 'r|*') as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            name = archive_job_name(member.name)
+            if name is None:
+                continue
+            xml = archive.extractfile(member).read()
+            # Folders have a config.xml too, but hold no job configuration.
+            if is_folder_config(xml):
+                continue
+            yield name, xml
+
+
+# Return the job name for an archive member that is a job's config.xml,
+# like "jenkins/jobs/folder/jobs/job/config.xml", or None for any other
+# member.
+def archive_job_name(path):
+    parts = path.split('/')
+    if 'jobs' not in parts:
+        return None
+    # Everything after the first "jobs" directory should alternate
+    # between a job name and a nested "jobs" directory.
+    parts = parts[parts.index('jobs') + 1:]
+    if len(parts) < 2 or len(parts) % 2 or parts[-1] != 'config.xml':
+        return None
+    if any(part != 'jobs' for part in parts[1:-1:2]):
+        return None
+    return '/'.join(parts[0::2])
+
+
+# Return True if a config.xml belongs to a folder rather than a job.
+def is_folder_config(xml):
+    return (root_tag(xml) or '').endswith('Folder')
+
+
+class RootFound(Exception):
+    pass
+
+
+# Return the name of an XML document's root element, or None if the
+# document is not well-formed. This stops parsing at the root element's
+# start tag.
+def root_tag(xml):
+    tags = []
+
+    def start_element(tag, attrib):
+        tags.append(tag)
+        raise RootFound()
+
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = start_element
+    try:
+        parser.Parse(xml, True)
+    except RootFound:
+        return tags[0]
+    except expat.ExpatError:
+        pass
+    return None
+
+
+# Expand a list of XML file names and glob patterns, and yield a
+# (name, filename) tuple for each matching file.
+def expand_filenames(patterns):
+    for pattern in patterns:
+        # Plain paths pass through unchanged, so a missing file still
+        # raises an error when it is parsed.
+        filenames = sorted(glob.glob(pattern)) if glob.has_magic(pattern) \
+            else [pattern]
+        for filename in filenames:
+            yield job_name_from_filename(filename), filename
+
+
+# Infer a job name from an XML file name: "my-job.xml" is "my-job", and a
+# "config.xml" file (as in JENKINS_HOME) is named after its directory.
+def job_name_from_filename(filename):
+    basename = os.path.basename(filename)
+    if basename == 'config.xml':
+        return os.path.basename(os.path.dirname(os.path.abspath(filename)))
+    name, ext = os.path.splitext(basename)
+    if ext.lower() != '.xml':
+        return basename
+    return name
+
+
+# Select jobs by name with --include and --ignore patterns. A pattern is a
+# plain job name, a glob (like "folder/*"), or a regular expression with a
+# "re:" prefix (like "re:.*-(test|build)$"). The patterns are compiled once:
+# plain names go into a set, and everything else into one regular
+# expression, so matching a job costs the same however many patterns there
+# are.
+class JobFilter(object):
+
+    def __init__(self, include=None, ignore=None):
+        self.include = compile_patterns(include) if include else None
+        self.ignore = compile_patterns(ignore) if ignore else None
+
+    # Return True if the named job should be converted.
+    def __call__(self, name):
+        if self.include is not None and not match_patterns(self.include,
+                                                           name):
+            return False
+        if self.ignore is not None and match_patterns(self.ignore, name):
+            return False
+        return True
+
+
+# Compile a list of patterns for JobFilter into a (names, regex) tuple.
+def compile_patterns(patterns):
+    names = set()
+    expressions = []
+    for pattern in patterns:
+        if pattern.startswith('re:'):
+            expressions.append('(?:%s)\\Z' % pattern[3:])
+        elif glob.has_magic(pattern):
+            expressions.append('(?:%s)' % fnmatch.translate(pattern))
+        else:
+            names.add(pattern)
+    regex = re.compile('|'.join(expressions)) if expressions else None
+    return names, regex
+
+
+def match_patterns(compiled, name):
+    names, regex = compiled
+    return name in names or (regex is not None and
+                             regex.match(name) is not None)
@@ -0,0 +1,328 @@
+from collections import OrderedDict
+import hashlib
+import os
+import random
+import re
+try:
+    basestring
+except NameError:
+    basestring = str
+
+# Turn groups of near-identical jobs into a JJB job-template each, plus a
+# project that lists the values that differ from job to job.
+#
+# This is a pass over the whole fleet, after every job is converted. Each
+# job is flattened into its leaves: the path of keys (and list indexes) to
+# each value, like ("scm", 0, "git", "branches", 0). Comparing every pair of
+# jobs would take O(n^2) time, so candidates are found with MinHash and
+# locality-sensitive hashing instead:
+#
+# - Each job's MinHash signature summarizes the set of its "path=value"
+#   leaves (without its name) in NUM_PERM numbers. Two signatures agree in
+#   each number with a probability equal to the Jaccard similarity of the
+#   two jobs.
+# - The signature is cut into BANDS bands. Jobs that agree on every number
+#   of any band land in the same bucket, and jobs that share a bucket are
+#   joined into one candidate group. Similar jobs very likely share a
+#   bucket, and different ones very likely do not.
+#
+# A candidate group is then checked exactly. Only jobs with the same paths
+# can share a template, and only if they differ in at most MAX_VARIABLES
+# values besides their names (and only in plain values, not lists or
+# mappings). A group that differs in more is split by the path with the
+# fewest distinct values, until each part fits. Parts of at least
+# "min_jobs" jobs become templates, and the rest stay plain jobs.
+#
+# In the template, each value that differs becomes a "{variable}" named
+# after its key. A string that is just one variable is replaced by the
+# project's value as it is, so booleans and numbers keep their type. JJB
+# formats every other string in a template, and the project's values, so
+# their braces are doubled.
+#
+# The templates and projects are written to one more file in the output
+# directory, TEMPLATES_NAME plus the usual extension, and the files of the
+# jobs they replace are removed. Jenkins job names cannot contain "@", so it
+# never clashes with a job's file.
+
+TEMPLATES_NAME = '@templates'
+
+MAX_VARIABLES = 4
+
+NUM_PERM = 32
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# MinHash permutations, h -> (a * h + b) mod a Mersenne prime, fixed so the
+# same jobs always make the same templates.
+MERSENNE_PRIME = (1 << 61) - 1
+_random = random.Random(0)
+PERMUTATIONS = [(_random.randrange(1, MERSENNE_PRIME),
+                 _random.randrange(0, MERSENNE_PRIME))
+                for _ in range(NUM_PERM)]
+
+# Project keys that JJB treats specially, which a variable must not use.
+RESERVED = frozenset(['name', 'jobs', 'exclude'])
+
+# The jobs collected for the template pass of this process, or None when it
+# is off.
+_inferrer = None
+
+
+# Return an OrderedDict of a value's leaves: the path to each, and the
+# value. Empty lists and mappings are leaves too.
+def flatten(value, path=(), leaves=None):
+    if leaves is None:
+        leaves = OrderedDict()
+    if isinstance(value, dict) and value:
+        for key, child in value.items():
+            flatten(child, path + (key,), leaves)
+    elif isinstance(value, list) and value:
+        for index, child in enumerate(value):
+            flatten(child, path + (index,), leaves)
+    else:
+        leaves[path] = value
+    return leaves
+
+
+# Return a hashable key for a leaf's value. Leaves are plain values, or
+# empty lists and mappings. True and 1 are equal in Python, but not in a job.
+def value_key(value):
+    if isinstance(value, list):
+        return list
+    if isinstance(value, dict):
+        return dict
+    return isinstance(value, bool), value
+
+
+def is_scalar(value):
+    return not isinstance(value, (dict, list))
+
+
+# Return the MinHash signature of a job's leaves, leaving out its name.
+def minhash(leaves):
+    hashes = [int(hashlib.md5(repr((path, value_key(value))).encode('utf-8'))
+                  .hexdigest()[:15], 16)
+              for path, value in leaves.items() if path != ('name',)]
+    if not hashes:
+        hashes = [0]
+    return tuple(min([(a * h + b) % MERSENNE_PRIME for h in hashes])
+                 for a, b in PERMUTATIONS)
+
+
+# Double the braces in a string that JJB formats, so it comes out as it is.
+def escape(value):
+    if isinstance(value, basestring):
+        return value.replace('{', '{{').replace('}', '}}')
+    return value
+
+
+# Return a name for the variable at a path, from its last key, that is not
+# in "taken".
+def variable_name(path, taken):
+    keys = [key for key in path if not isinstance(key, int)]
+    base = re.sub(r'\W+', '_', str(keys[-1]) if keys else 'value').strip('_')
+    if not base or base in RESERVED:
+        base = (base or 'value') + '_value'
+    name = base
+    count = 2
+    while name in taken:
+        name = '%s_%d' % (base, count)
+        count += 1
+    return name
+
+
+class TemplateInferrer(object):
+
+    def __init__(self, min_jobs=2, max_variables=MAX_VARIABLES):
+        self.min_jobs = min_jobs
+        self.max_variables = max_variables
+        # (job name, job structure) for each job, in the order they came.
+        self.jobs = []
+        # The leaves of each job that can be templated, or None.
+        self.leaves = []
+
+    def add(self, name, data):
+        self.jobs.append((name, data))
+        # Only a single job definition can become part of a template.
+        if len(data) == 1 and list(data[0]) == ['job']:
+            self.leaves.append(flatten(data[0]['job']))
+        else:
+            self.leaves.append(None)
+
+    # Return the candidate groups of similar jobs: lists of job indexes
+    # that share an LSH bucket, directly or through other jobs.
+    def candidates(self):
+        parents = list(range(len(self.jobs)))
+
+        def find(index):
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+            return index
+
+        buckets = {}
+        for index, leaves in enumerate(self.leaves):
+            if leaves is None:
+                continue
+            signature = minhash(leaves)
+            for band in range(BANDS):
+                bucket = (band, signature[band * ROWS:(band + 1) * ROWS])
+                first = buckets.setdefault(bucket, index)
+                if first != index:
+                    parents[find(index)] = find(first)
+        groups = OrderedDict()
+        for index, leaves in enumerate(self.leaves):
+            if leaves is not None:
+                groups.setdefault(find(index), []).append(index)
+        return [group for group in groups.values()
+                if len(group) >= self.min_jobs]
+
+    # Return the clusters of jobs to template: lists of job indexes with
+    # the same paths, and at most max_variables differences.
+    def clusters(self):
+        clusters = []
+        for group in self.candidates():
+            shapes = OrderedDict()
+            for index in group:
+                shape = tuple(self.leaves[index])
+                shapes.setdefault(shape, []).append(index)
+            for members in shapes.values():
+                clusters.extend(self.split(members))
+        return clusters
+
+    # Split jobs with the same paths into parts that differ in few enough
+    # plain values, and return the parts with at least min_jobs jobs.
+    def split(self, members):
+        if len(members) < self.min_jobs:
+            return []
+        variables = self.variables(members)
+        splittable = [(len(values), not scalar, path)
+                      for path, (values, scalar) in variables.items()
+                      if path != ('name',)]
+        if len(splittable) <= self.max_variables and \
+                all(not not_scalar for _, not_scalar, _ in splittable):
+            return [members]
+        # Split by a path whose values must be the same, or else by the
+        # path with the fewest distinct values.
+        splittable.sort(key=lambda item: (not item[1], item[0]))
+        path = splittable[0][2]
+        parts = OrderedDict()
+        for index in members:
+            key = value_key(self.leaves[index][path])
+            parts.setdefault(key, []).append(index)
+        clusters = []
+        for part in parts.values():
+            clusters.extend(self.split(part))
+        return clusters
+
+    # Return an OrderedDict of the paths whose values differ among jobs,
+    # mapped to (distinct value keys, whether every value is plain).
+    def variables(self, members):
+        variables = OrderedDict()
+        for path in self.leaves[members[0]]:
+            values = [self.leaves[index][path] for index in members]
+            keys = set(value_key(value) for value in values)
+            if len(keys) > 1:
+                variables[path] = (keys, all(is_scalar(value)
+                                             for value in values))
+        return variables
+
+    # Return the template definitions, and the jobs that stay plain. The
+    # definitions are a job structure of a JJB "job-template" and a
+    # "project" for each cluster. The plain jobs are (name, job structure)
+    # tuples, in the order they were added. The names of the templated jobs
+    # are in self.templated.
+    def infer(self):
+        definitions = []
+        taken = set(name for name, data in self.jobs)
+        templated = set()
+        clusters = sorted(self.clusters(),
+                          key=lambda members: min(self.jobs[index][0]
+                                                  for index in members))
+        for members in clusters:
+            members = sorted(members, key=lambda index: self.jobs[index][0])
+            definitions.extend(self.template(members, taken))
+            templated.update(members)
+        self.templated = [self.jobs[index][0] for index in sorted(templated)]
+        plain = [job for index, job in enumerate(self.jobs)
+                 if index not in templated]
+        return definitions, plain
+
+    # Return the job-template and project for a cluster of jobs.
+    def template(self, members, taken):
+        names = [self.jobs[index][0] for index in members]
+        base = os.path.commonprefix(names).rstrip('-_./') or names[0]
+        template_id = base + '-template'
+        count = 2
+        while template_id in taken:
+            template_id = '%s-template-%d' % (base, count)
+            count += 1
+        taken.add(template_id)
+
+        variables = OrderedDict([(('name',), 'name')])
+        for path in self.variables(members):
+            if path not in variables:
+                variables[path] = variable_name(path,
+                                                set(variables.values()))
+
+        job = self.jobs[members[0]][1][0]['job']
+        template = OrderedDict([('name', '{name}'), ('id', template_id)])
+        template.update(templated_value(job, (), variables))
+        jobs = []
+        for index in members:
+            leaves = self.leaves[index]
+            params = OrderedDict((name, escape(leaves[path]))
+                                 for path, name in variables.items())
+            jobs.append({template_id: params})
+        project = OrderedDict([('name', template_id), ('jobs', jobs)])
+        return [{'job-template': template}, {'project': project}]
+
+
+# Return a copy of a job's value for a template: the values at "variables"
+# paths become their "{variable}", and other strings are escaped.
+def templated_value(value, path, variables):
+    if path in variables:
+        return '{%s}' % variables[path]
+    if isinstance(value, dict):
+        return type(value)((escape(key),
+                            templated_value(child, path + (key,), variables))
+                           for key, child in value.items())
+    if isinstance(value, list):
+        return [templated_value(child, path + (index,), variables)
+                for index, child in enumerate(value)]
+    return escape(value)
+
+
+# Switch the template pass on for this process: jobs are collected with
+# add(), and written with write() once they are all converted.
+def enable(min_jobs=2, max_variables=MAX_VARIABLES):
+    global _inferrer
+    _inferrer = TemplateInferrer(min_jobs, max_variables)
+
+
+def disable():
+    global _inferrer
+    _inferrer = None
+
+
+def enabled():
+    return _inferrer is not None
+
+
+# Collect a job's converted structure for the template pass.
+def add(name, data):
+    _inferrer.add(name, data)
+
+
+# Infer the templates from the collected jobs, and write them and the plain
+# jobs with an OutputWriter, removing the files of templated jobs. "dump"
+# serializes a job structure. Returns (templates, templated jobs).
+def write(writer, dump):
+    definitions, plain = _inferrer.infer()
+    if definitions:
+        writer.write(TEMPLATES_NAME, dump(definitions))
+    for name in _inferrer.templated:
+        writer.remove(name)
+    for name, data in plain:
+        writer.write(name, dump(data))
+    return len(definitions) // 2, len(_inferrer.templated)
@@ -0,0 +1,285 @@
+import copy
+import io
+import json
+import threading
+from jenkins_job_wrecker.roundtrip import diff_xml
+try:
+    import pkg_resources
+    from jenkins_jobs.config import JJBConfig
+    from jenkins_jobs.parser import YamlParser
+    from jenkins_jobs.registry import ModuleRegistry
+    from jenkins_jobs.xml_config import XmlJob, XmlJobGenerator
+except ImportError:
+    JJBConfig = None
+
+# Check converted jobs with Jenkins Job Builder's Python API, in this
+# process, instead of running "jenkins-jobs test" on each YAML file.
+#
+# A Verifier loads JJB's module registry once, and renders every job with
+# it. Each job is fed to JJB the way "jenkins-jobs test" would read it:
+# either as the job structure from root_to_data(), or as YAML (or JSON)
+# text read with JJB's own YAML loader. A job passes if JJB generates its
+# XML without an error. In round-trip mode, it must also match the job's
+# original XML, once both are canonicalized (see roundtrip.py).
+#
+# JJB's registry resolves each plugin's entry point with pkg_resources
+# every time it dispatches a component, which re-checks the requirements of
+# the JJB distribution each time, and dominates the time of rendering a
+# job. Here each entry point is resolved once per Verifier instead.
+#
+# That needs JJB internals (the registry's _entry_points_cache, the XML
+# generator's _getXMLForData and the parser's _parse_fp), which are only
+# known to work with the JJB versions the "verify" extra in setup.py
+# allows. They are overridden in subclasses, on the Verifier's own
+# instances, and never patched into JJB's classes.
+
+
+# Return the message for a failed verification.
+def error_message(error):
+    return '%s: %s' % (type(error).__name__, error)
+
+
+if JJBConfig is not None:
+    # A pkg_resources entry point that resolves its object on the first
+    # load(), and returns the same object after that.
+    class ResolvedEntryPoint(object):
+
+        def __init__(self, entry_point):
+            self.entry_point = entry_point
+            self.resolved = None
+
+        def load(self, *args, **kwargs):
+            if self.resolved is None:
+                self.resolved = self.entry_point.resolve()
+            return self.resolved
+
+        def __getattr__(self, name):
+            return getattr(self.entry_point, name)
+
+    class ResolvedModuleRegistry(ModuleRegistry):
+
+        def __init__(self, *args, **kwargs):
+            super(ResolvedModuleRegistry, self).__init__(*args, **kwargs)
+            # ModuleRegistry's cache is class-wide. This registry keeps its
+            # own, so other registries in the process are left alone.
+            self._entry_points_cache = {}
+            self.modules_by_component_type = dict(
+                (component_type, ResolvedEntryPoint(entry_point))
+                for component_type, entry_point in
+                self.modules_by_component_type.items())
+
+        # ModuleRegistry fills the cache of each component type's entry
+        # points on the first dispatch of that type.
+        def dispatch(self, *args, **kwargs):
+            for entry_points in self._entry_points_cache.values():
+                for name, entry_point in entry_points.items():
+                    if not isinstance(entry_point, ResolvedEntryPoint):
+                        entry_points[name] = ResolvedEntryPoint(entry_point)
+            return super(ResolvedModuleRegistry, self).dispatch(*args,
+                                                                **kwargs)
+
+    # XmlJobGenerator, looking up the module for each project type once.
+    class ResolvedXmlJobGenerator(XmlJobGenerator):
+
+        def __init__(self, registry):
+            super(ResolvedXmlJobGenerator, self).__init__(registry)
+            self._project_modules = {}
+
+        def _getXMLForData(self, data):
+            kind = data.get(self.kind_attribute, self.kind_default)
+            Mod = self._project_modules.get(kind)
+            if Mod is None:
+                for entry_point in pkg_resources.iter_entry_points(
+                        group=self.entry_point_group, name=kind):
+                    Mod = self._project_modules[kind] = entry_point.resolve()
+                    break
+                else:
+                    # Let JJB raise its error for an unknown project-type.
+                    return super(ResolvedXmlJobGenerator,
+                                 self)._getXMLForData(data)
+            xml = Mod(self.registry).root_xml(data)
+            self._gen_xml(xml, data)
+            return XmlJob(xml, data['name'])
+
+
+class Verifier(object):
+
+    def __init__(self, config_filename=None):
+        if JJBConfig is None:
+            raise ValueError('verifying jobs needs jenkins-job-builder to be '
+                             'installed')
+        self.jjb_config = JJBConfig(config_filename)
+        self.jjb_config.validate()
+        self.registry = ResolvedModuleRegistry(
+            self.jjb_config, self.jjb_config.builder['plugins_info'])
+        self.generator = ResolvedXmlJobGenerator(self.registry)
+        # The registry holds the data of the job being rendered, so a
+        # Verifier renders one job at a time. get_verifier() shares one
+        # Verifier between the threads of a process: only worker processes
+        # (-j) verify jobs in parallel.
+        self._lock = threading.Lock()
+
+    def _render(self, parser):
+        with self._lock:
+            self.registry.set_parser_data(parser.data)
+            jobs, views = parser.expandYaml(self.registry)
+            return self.generator.generateXML(jobs)
+
+    # Return JJB's XmlJobs for a job structure from root_to_data().
+    def render(self, data):
+        parser = YamlParser(self.jjb_config)
+        # JJB changes the data it expands.
+        for item in copy.deepcopy(data):
+            cls, dfn = next(iter(item.items()))
+            parser.data.setdefault(cls, {})[dfn.get('id', dfn['name'])] = dfn
+        return self._render(parser)
+
+    # Return JJB's XmlJobs for the YAML (or JSON) text of a job.
+    def render_yaml(self, text):
+        parser = YamlParser(self.jjb_config)
+        stream = io.BytesIO(text)
+        stream.name = '<job>'
+        parser._parse_fp(stream)
+        return self._render(parser)
+
+    # Render a job with JJB, from its job structure ("data") or else from
+    # its YAML text, and return (error, differences). "error" is None if
+    # JJB renders the job, or the error message if it fails. With the job's
+    # "original" XML, "differences" lists the roundtrip.Differences between
+    # it and JJB's XML; otherwise it is None.
+    def check(self, data=None, text=None, original=None):
+        try:
+            if data is not None:
+                jobs = self.render(data)
+            else:
+                jobs = self.render_yaml(text)
+            outputs = [job.output() for job in jobs]
+        except Exception as e:
+            return error_message(e), None
+        if original is None:
+            return None, None
+        if len(outputs) != 1:
+            return 'JJB generated %d jobs instead of one' % len(outputs), None
+        return None, diff_xml(original, outputs[0])
+
+    # Return None if JJB renders a job structure, or the error message if
+    # it fails.
+    def verify(self, data):
+        return self.check(data=data)[0]
+
+    def verify_yaml(self, text):
+        return self.check(text=text)[0]
+
+
+# Whether jobs are verified as they are converted in this process (and
+# compared with their original XML), the VerifyReport of the jobs verified
+# so far, and the Verifier, made on first use, so each worker process loads
+# JJB's registry once.
+_enabled = False
+_round_trip = False
+_report = None
+_verifier = None
+_verifier_lock = threading.Lock()
+
+
+def enable(enabled=True, round_trip=False):
+    global _enabled, _round_trip, _report
+    _enabled = enabled
+    _round_trip = enabled and round_trip
+    _report = VerifyReport() if enabled else None
+
+
+def enabled():
+    return _enabled
+
+
+def round_trip():
+    return _round_trip
+
+
+# Return the arguments to enable() in this process, for worker processes
+# to pass to configure(), or None if verification is off.
+def settings():
+    if not _enabled:
+        return None
+    return {'round_trip': _round_trip}
+
+
+def configure(settings):
+    if settings is None:
+        enable(False)
+    else:
+        enable(**settings)
+
+
+def get_report():
+    return _report
+
+
+# Record the outcome of verifying a job in this process's report.
+def record(name, error, differences=None):
+    if _report is not None:
+        _report.record(name, error, differences)
+
+
+def get_verifier():
+    global _verifier
+    with _verifier_lock:
+        if _verifier is None:
+            _verifier = Verifier()
+    return _verifier
+
+
+# The outcome of verifying each job. A job fails if JJB cannot render it,
+# and differs if JJB's XML does not match its original XML.
+class VerifyReport(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # job name -> (error, differences), as Verifier.check() returns
+        self.results = {}
+
+    def record(self, name, error, differences=None):
+        with self._lock:
+            self.results[name] = (error, differences)
+
+    @property
+    def failed(self):
+        return sorted(name for name, (error, differences)
+                      in self.results.items() if error is not None)
+
+    @property
+    def differ(self):
+        return sorted(name for name, (error, differences)
+                      in self.results.items() if differences)
+
+    @property
+    def passed(self):
+        return sorted(name for name, (error, differences)
+                      in self.results.items()
+                      if error is None and not differences)
+
+    def summary(self):
+        summary = 'verify: %d passed, %d failed' % (len(self.passed),
+                                                    len(self.failed))
+        if any(differences is not None
+               for error, differences in self.results.values()):
+            summary += ', %d differ' % len(self.differ)
+        return summary
+
+    # Write the report as JSON: each job name maps to {"passed": true}, to
+    # {"passed": false, "error": "..."}, or to {"passed": false,
+    # "differences": [{"path": ..., "original": ..., "regenerated": ...}]}.
+    def write_json(self, filename):
+        report = {}
+        for name, (error, differences) in self.results.items():
+            job = report[name] = {
+                'passed': error is None and not differences}
+            if error is not None:
+                job['error'] = error
+            if differences:
+                job['differences'] = [difference._asdict()
+                                      for difference in differences]
+        with open(filename, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
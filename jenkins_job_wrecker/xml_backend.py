@@ -0,0 +1,281 @@
+from copy import deepcopy
+import re
+import threading
+import xml.etree.ElementTree as stdlib_etree
+from xml.parsers import expat
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+# The XML parser backends. "auto" is lxml if it is installed, and the
+# standard library's xml.etree.ElementTree otherwise. Both give the handlers
+# in job_handlers.py the same ElementTree API.
+BACKENDS = ('auto', 'lxml', 'stdlib')
+
+# Both backends raise this when the XML is not well-formed.
+ParseError = stdlib_etree.ParseError
+
+_backend = None
+
+# lxml parsers must not be shared between threads, so each thread makes its
+# own. Each thread also tracks the SourceDocument it is converting.
+_local = threading.local()
+
+# A start tag, with group 1 set to "/" for an empty element like "<tag/>".
+START_TAG = re.compile(br'<[^\s/>]+'
+                       br'(?:\s+[^\s=]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*'
+                       br'\s*(/?)>')
+
+# Documents in these encodings can be sliced straight into the YAML.
+RAW_ENCODINGS = ('utf-8', 'utf8', 'us-ascii', 'ascii')
+
+
+# Choose the parser backend for every later call to parse(), fromstring()
+# and tostring().
+def set_backend(name):
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError('unknown XML backend "%s"' % name)
+    if name == 'auto':
+        name = 'stdlib' if lxml_etree is None else 'lxml'
+    if name == 'lxml' and lxml_etree is None:
+        raise ValueError('the lxml XML backend needs lxml to be installed')
+    _backend = name
+
+
+# Return the name of the backend in use: "lxml" or "stdlib".
+def get_backend():
+    return _backend
+
+
+# Return this thread's lxml parser. Comments and processing instructions
+# are dropped, as the standard library parser does, so the handlers only
+# ever see elements. huge_tree lets lxml parse the multi-megabyte text
+# nodes of long inline shell scripts.
+def lxml_parser():
+    parser = getattr(_local, 'parser', None)
+    if parser is None:
+        parser = lxml_etree.XMLParser(remove_comments=True, remove_pis=True,
+                                      resolve_entities=False, huge_tree=True)
+        _local.parser = parser
+    return parser
+
+
+# Re-raise an lxml syntax error as the standard library's ParseError, so
+# callers only need to handle one exception.
+def lxml_parse_error(error):
+    exception = ParseError(str(error))
+    exception.code = error.code
+    exception.position = error.position
+    return exception
+
+
+# Parse an XML file, and return its root element.
+def parse(filename):
+    if _backend == 'lxml':
+        try:
+            return lxml_etree.parse(filename, lxml_parser()).getroot()
+        except lxml_etree.XMLSyntaxError as error:
+            raise lxml_parse_error(error)
+    return stdlib_etree.parse(filename).getroot()
+
+
+# Parse XML bytes, and return the root element.
+def fromstring(xml):
+    if _backend == 'lxml':
+        try:
+            return lxml_etree.fromstring(xml, lxml_parser())
+        except lxml_etree.XMLSyntaxError as error:
+            raise lxml_parse_error(error)
+    return stdlib_etree.fromstring(xml)
+
+
+# Parse an XML file (a file name or file object) incrementally. Yield the
+# root element as soon as its start tag is read, then each of the root's
+# children as soon as the child's end tag is read. Once the caller is done
+# with a child, it is cleared and removed from the root, so memory is
+# bounded by the largest child rather than the whole document.
+def iter_children(source):
+    if _backend == 'lxml':
+        context = lxml_etree.iterparse(source, events=('start', 'end'),
+                                       remove_comments=True, remove_pis=True,
+                                       resolve_entities=False, huge_tree=True)
+    else:
+        context = stdlib_etree.iterparse(source, events=('start', 'end'))
+    root = None
+    depth = 0
+    while True:
+        try:
+            event, element = next(context)
+        except StopIteration:
+            return
+        except ParseError:
+            raise
+        except SyntaxError as error:
+            # lxml's XMLSyntaxError.
+            raise lxml_parse_error(error)
+        if event == 'start':
+            depth += 1
+            if depth == 1:
+                root = element
+                yield root
+            continue
+        depth -= 1
+        if depth == 1:
+            yield element
+            element.clear()
+            root.remove(element)
+
+
+# Serialize an element (and its tail) as ASCII XML, the same way from
+# either backend.
+def tostring(element):
+    if _backend == 'lxml' and lxml_etree.iselement(element):
+        # The standard library sorts attributes by name.
+        if any(len(descendant.attrib) > 1 for descendant in element.iter()):
+            element = deepcopy(element)
+            for descendant in element.iter():
+                attrib = sorted(descendant.attrib.items())
+                descendant.attrib.clear()
+                for key, value in attrib:
+                    descendant.set(key, value)
+        # The standard library writes empty elements as "<tag />". ">" is
+        # always escaped in text and attributes, so "/>" is only ever the
+        # end of an empty element.
+        return lxml_etree.tostring(element).replace(b'/>', b' />')
+    return stdlib_etree.tostring(element)
+
+
+set_backend('auto')
+
+
+# The original bytes of the document being converted, so raw_xml() can copy
+# unhandled elements straight from the input instead of serializing them
+# again. The byte span of every element is found with expat the first time
+# one is needed, so documents without raw XML never pay for it.
+class SourceDocument(object):
+
+    def __init__(self, xml):
+        self.xml = xml
+        self.section = None
+        self._spans = None
+        self._sections = None
+        self._offsets = None
+
+    # Note that the root's child "element", the child number "ordinal", is
+    # being converted.
+    def set_section(self, ordinal, element):
+        self.section = (ordinal, element)
+        # The offset of each element of the section in document order,
+        # made the first time one of them goes raw.
+        self._offsets = None
+
+    # Return the original bytes of an element in the current section, or
+    # None if they are unknown. Elements that a handler made or copied are
+    # not in the document.
+    def raw(self, element):
+        if self.section is None:
+            return None
+        if self._spans is None:
+            self._spans, self._sections = find_spans(self.xml)
+        ordinal, child = self.section
+        if ordinal >= len(self._sections):
+            return None
+        if self._offsets is None:
+            self._offsets = dict((descendant, offset) for offset, descendant
+                                 in enumerate(child.iter()))
+        offset = self._offsets.get(element)
+        if offset is None:
+            return None
+        start, end = self._spans[self._sections[ordinal] + offset]
+        # XML parsers normalize line endings, so this does not change the
+        # XML's meaning.
+        raw = self.xml[start:end].replace(b'\r\n', b'\n').replace(b'\r',
+                                                                  b'\n')
+        try:
+            raw.decode('ascii')
+        except UnicodeDecodeError:
+            # Escape other characters like tostring() does, so the YAML
+            # can still hold the XML in a literal block.
+            raw = raw.decode('utf-8').encode('ascii', 'xmlcharrefreplace')
+        return raw
+
+
+# Return a ([start, end] byte span of each element in document order,
+# index in the spans of each child of the root) tuple for an XML document.
+# Both lists are empty if the document's elements cannot be copied on their
+# own: if it declares namespaces or a DTD, or is not UTF-8.
+def find_spans(xml):
+    spans = []
+    sections = []
+    # For each open element: its index in spans, and whether it has
+    # children.
+    stack = []
+    parser = expat.ParserCreate()
+
+    def start_element(tag, attrib):
+        if stack:
+            stack[-1][1] = True
+            if len(stack) == 1:
+                sections.append(len(spans))
+        stack.append([len(spans), False])
+        spans.append([parser.CurrentByteIndex, None])
+
+    def end_element(tag):
+        index, has_children = stack.pop()
+        span = spans[index]
+        if not has_children:
+            match = START_TAG.match(xml, span[0])
+            if match is not None and match.group(1):
+                # expat reports the end of "<tag/>" just past it.
+                span[1] = match.end()
+                return
+        span[1] = xml.index(b'>', parser.CurrentByteIndex) + 1
+
+    def xml_decl(version, encoding, standalone):
+        if encoding is not None and encoding.lower() not in RAW_ENCODINGS:
+            raise ValueError('cannot copy %s XML' % encoding)
+
+    def doctype_decl(*args):
+        raise ValueError('cannot copy XML with a DTD')
+
+    if b'xmlns' in xml:
+        return [], []
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.XmlDeclHandler = xml_decl
+    parser.StartDoctypeDeclHandler = doctype_decl
+    try:
+        parser.Parse(xml, True)
+    except (ValueError, expat.ExpatError):
+        return [], []
+    return spans, sections
+
+
+# Make the bytes of an XML document (or None) available to raw_xml() on
+# this thread, until clear_source() is called.
+def set_source(xml):
+    _local.source = SourceDocument(xml) if xml is not None else None
+
+
+def clear_source():
+    _local.source = None
+
+
+# Note which child of the root element is being converted.
+def set_section(ordinal, element):
+    source = getattr(_local, 'source', None)
+    if source is not None:
+        source.set_section(ordinal, element)
+
+
+# Return the XML of an element that no handler can translate: its original
+# bytes from the document set with set_source(), or else tostring().
+def raw_xml(element):
+    source = getattr(_local, 'source', None)
+    if source is not None:
+        raw = source.raw(element)
+        if raw is not None:
+            return raw
+    return tostring(element)
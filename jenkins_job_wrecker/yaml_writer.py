@@ -0,0 +1,282 @@
+from collections import OrderedDict
+import io
+import re
+import yaml
+from yaml.emitter import Emitter
+import jenkins_job_wrecker.pretty_yaml as pretty_yaml
+from jenkins_job_wrecker.pretty_yaml import DOUBLE_QUOTED, SIMPLE_KEY_LENGTH
+
+# A direct YAML writer for the structures root_to_yaml() builds: lists,
+# dicts and OrderedDicts of str, bool, int and None. It walks the structure
+# and writes each value as soon as it is reached, skipping PyYAML's
+# representer, serializer and event queue, but writes exactly the text that
+# PrettyDumper would. The scalar writers and indentation bookkeeping are
+# PyYAML's own Emitter methods; only the choice of scalar style and the
+# common, simple cases of writing a scalar are done here with regular
+# expressions instead of PyYAML's character-by-character loops.
+
+STR_TAG = u'tag:yaml.org,2002:str'
+
+CONTAINER_TYPES = (list, dict, OrderedDict)
+SCALAR_TYPES = (str, bool, int, type(None))
+
+# Line breaks, for strings with special characters.
+LINE_BREAK = re.compile(u'[\n\x85\u2028\u2029]')
+
+# Indicators that stop a single-line string being written plain: at the
+# start of the string, or later on.
+LEADING_INDICATOR = re.compile(
+    r'---|\.\.\.|[#,\[\]{}&*!|>\'"%@`]|[?:-](?: |\Z)')
+INNER_INDICATOR = re.compile(r':(?: |\Z)| #')
+
+_resolver = yaml.resolver.Resolver()
+
+# plain_allowed() answers for strings up to PLAIN_CACHE_LENGTH long.
+_plain_cache = {}
+PLAIN_CACHE_LENGTH = 64
+PLAIN_CACHE_SIZE = 10000
+
+
+class YAMLWriter(Emitter):
+
+    def __init__(self, stream):
+        super(YAMLWriter, self).__init__(stream)
+        self.encoding = 'utf-8'
+
+    # Lean versions of the Emitter's writers, for the str indicators used
+    # here. The Emitter's own scalar writers pass unicode.
+    def write_indicator(self, indicator, need_whitespace,
+                        whitespace=False, indention=False):
+        if not self.whitespace and need_whitespace:
+            indicator = ' ' + indicator
+        self.whitespace = whitespace
+        self.indention = self.indention and indention
+        self.column += len(indicator)
+        self.open_ended = False
+        self.stream.write(str(indicator))
+
+    def write_indent(self):
+        indent = self.indent or 0
+        if not self.indention or self.column > indent or \
+                (self.column == indent and not self.whitespace):
+            self.stream.write('\n')
+            self.indention = True
+            self.column = 0
+        if self.column < indent:
+            self.stream.write(' ' * (indent - self.column))
+            self.column = indent
+        self.whitespace = True
+
+    def write_line_break(self, data=None):
+        self.whitespace = True
+        self.indention = True
+        self.column = 0
+        self.stream.write(str(data or '\n'))
+
+    def write_document(self, data):
+        self.write_node(data)
+        self.write_indent()
+        # The document ends with a "|+" literal string.
+        if self.open_ended:
+            self.write_indicator('...', True)
+            self.write_indent()
+        self.flush_stream()
+
+    def write_node(self, value, mapping=False, simple_key=False):
+        value_type = type(value)
+        if value_type is list:
+            if not value:
+                self.write_indicator('[', True, whitespace=True)
+                self.write_indicator(']', False)
+                return
+            # Sequences in mappings are not indented past their key.
+            self.increase_indent(indentless=mapping and not self.indention)
+            for item in value:
+                self.write_indent()
+                self.write_indicator('-', True, indention=True)
+                self.write_node(item)
+            self.indent = self.indents.pop()
+        elif value_type is dict or value_type is OrderedDict:
+            if not value:
+                self.write_indicator('{', True, whitespace=True)
+                self.write_indicator('}', False)
+                return
+            items = value.items()
+            if value_type is dict:
+                items.sort()
+            self.increase_indent()
+            for key, item in items:
+                self.write_indent()
+                if simple_key_text(key) is not None:
+                    self.write_node(key, mapping=True, simple_key=True)
+                    self.write_indicator(':', False)
+                else:
+                    self.write_indicator('?', True, indention=True)
+                    self.write_node(key, mapping=True)
+                    self.write_indent()
+                    self.write_indicator(':', True, indention=True)
+                self.write_node(item, mapping=True)
+            self.indent = self.indents.pop()
+        else:
+            # As increase_indent(flow=True), for folded and literal lines.
+            indent = self.indent
+            self.indent = self.best_indent if indent is None \
+                else indent + self.best_indent
+            if value_type is str:
+                self.write_string(value, not simple_key)
+            else:
+                self.write_plain_text(scalar_text(value), not simple_key)
+            self.indent = indent
+
+    def write_string(self, value, split):
+        if DOUBLE_QUOTED.search(value):
+            self.write_double_quoted(value.decode('utf-8'), split)
+        elif '\n' in value:
+            # Simple keys are never multiline, so split is True.
+            if value.endswith(' '):
+                self.write_double_quoted(value, split)
+            else:
+                self.write_literal_text(value)
+        elif value and plain_allowed(value):
+            self.write_plain_text(value, split)
+        else:
+            self.write_single_quoted_text(value, split)
+
+    def write_plain_text(self, text, split):
+        # Long strings with spaces may be folded onto several lines.
+        if split and ' ' in text and \
+                self.column + 1 + len(text) > self.best_width:
+            self.write_plain(text, split)
+            return
+        if not self.whitespace:
+            text = ' ' + text
+        self.whitespace = False
+        self.indention = False
+        self.column += len(text)
+        self.stream.write(text)
+
+    def write_single_quoted_text(self, text, split):
+        quoted = text.replace("'", "''")
+        if split and ' ' in text and \
+                self.column + 2 + len(quoted) > self.best_width:
+            self.write_single_quoted(text, split)
+            return
+        self.write_indicator("'", True)
+        self.column += len(quoted)
+        self.stream.write(quoted)
+        self.write_indicator("'", False)
+
+    def write_literal_text(self, text):
+        hints = self.determine_block_hints(text)
+        self.write_indicator('|' + hints, True)
+        if hints[-1:] == '+':
+            self.open_ended = True
+        self.write_line_break()
+        indent = ' ' * (self.indent or 0)
+        block = '\n'.join(indent + line if line else line
+                          for line in text.split('\n'))
+        if not text.endswith('\n'):
+            block += '\n'
+        self.stream.write(block)
+        self.whitespace = True
+        self.indention = True
+        self.column = 0
+
+
+# Return the text PyYAML writes for a bool, int or None.
+def scalar_text(value):
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    return str(value)
+
+
+# Return the text of a mapping key if it can be written as a simple
+# "key: value" key, or None if it needs the explicit "? key" form.
+def simple_key_text(key):
+    if type(key) is not str:
+        return scalar_text(key)
+    text = key
+    if DOUBLE_QUOTED.search(key):
+        text = key.decode('utf-8')
+        if LINE_BREAK.search(text):
+            return None
+    elif '\n' in key:
+        return None
+    if not text or len(text) >= SIMPLE_KEY_LENGTH:
+        return None
+    return text
+
+
+# Return True if a single-line printable ASCII string can be written without
+# quotes: it has no leading or trailing space, no YAML indicators, and would
+# not be read back as anything but a string (like "true", "1.0" or "null").
+# Short strings like keys recur in every job, so their answers are cached.
+def plain_allowed(text):
+    allowed = _plain_cache.get(text)
+    if allowed is None:
+        allowed = text[0] != ' ' and text[-1] != ' ' and \
+            not LEADING_INDICATOR.match(text) and \
+            not INNER_INDICATOR.search(text, 1) and \
+            _resolver.resolve(yaml.ScalarNode, text,
+                              (True, False)) == STR_TAG
+        if len(text) <= PLAIN_CACHE_LENGTH:
+            if len(_plain_cache) >= PLAIN_CACHE_SIZE:
+                _plain_cache.clear()
+            _plain_cache[text] = allowed
+    return allowed
+
+
+# Return True if YAMLWriter writes this data: a list or dict of only the
+# types it knows, without any list or dict appearing twice (PrettyDumper
+# would write an anchor and alias for it).
+def writable(data):
+    if type(data) not in CONTAINER_TYPES:
+        return False
+    seen = set()
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        value_type = type(value)
+        if value_type is str:
+            try:
+                value.decode('utf-8')
+            except UnicodeDecodeError:
+                # PrettyDumper writes these as !!binary.
+                return False
+        elif value_type in CONTAINER_TYPES:
+            if id(value) in seen:
+                return False
+            seen.add(id(value))
+            if value_type is list:
+                stack.extend(value)
+            else:
+                for key, item in value.items():
+                    if type(key) not in SCALAR_TYPES:
+                        return False
+                    stack.append(key)
+                    stack.append(item)
+        elif value_type not in SCALAR_TYPES:
+            return False
+    return True
+
+
+# Write the YAML for a job structure to a file-like object, exactly as
+# yaml.dump(data, Dumper=PrettyDumper, default_flow_style=False) would.
+# Data that YAMLWriter does not handle is dumped by pretty_yaml.dump()
+# instead.
+def write(data, stream):
+    if writable(data):
+        YAMLWriter(stream).write_document(data)
+    else:
+        stream.write(pretty_yaml.dump(data))
+
+
+# Return the YAML for a job structure as a string.
+def dump(data):
+    stream = io.BytesIO()
+    write(data, stream)
+    return stream.getvalue()
@@ -1,8 +1,10 @@
+import re
 import sys
 from setuptools import setup, find_packages
 from setuptools.command.test import test as TestCommand
 
-version = '0.0.1'
+with open('jenkins_job_wrecker/__init__.py') as f:
+    version = re.search(r"__version__ = '(.*)'", f.read()).group(1)
 
 class PyTest(TestCommand):
     user_options = [('pytest-args=', 'a', "Arguments to pass to py.test")]
@@ -39,11 +41,19 @@ setup(name="jenkins-job-wrecker",
       packages=find_packages(),
       install_requires=[
           'pyyaml',
-          'python-jenkins',
+          'requests',
+          'scandir; python_version < "3.5"',
       ],
+      extras_require={
+          'lxml': ['lxml'],
+          # verify.py relies on internals of JJB 2.x.
+          'verify': ['jenkins-job-builder>=2.0,<3.0'],
+      },
       entry_points = {
         'console_scripts': [
             'jjwrecker = jenkins_job_wrecker.cli:main',
+            'jjwrecker-bench = jenkins_job_wrecker.bench:main',
+            'jjwrecker-client = jenkins_job_wrecker.client:main',
             ],
       },
       tests_require=[
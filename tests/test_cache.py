@@ -0,0 +1,68 @@
+from jenkins_job_wrecker.cache import ConversionCache
+import jenkins_job_wrecker.cache
+
+
+class TestConversionCache(object):
+
+    def test_get_put(self, tmpdir):
+        cache = ConversionCache(str(tmpdir.join('cache')))
+        key = cache.key('my-job', '<project/>')
+        assert cache.get(key) is None
+        cache.put(key, '- job:\n    name: my-job\n')
+        assert cache.get(key) == '- job:\n    name: my-job\n'
+
+    def test_persistent(self, tmpdir):
+        path = str(tmpdir.join('cache'))
+        cache = ConversionCache(path)
+        key = cache.key('my-job', '<project/>')
+        cache.put(key, 'yaml')
+        cache.close()
+        cache = ConversionCache(path, readonly=True)
+        assert cache.get(key) == 'yaml'
+
+    def test_key(self, tmpdir):
+        cache = ConversionCache(str(tmpdir.join('cache')))
+        key = cache.key('my-job', '<project/>')
+        assert key == cache.key('my-job', u'<project/>')
+        assert key != cache.key('other-job', '<project/>')
+        assert key != cache.key('my-job', '<matrix-project/>')
+        assert key != cache.key('my-job', '<project/>', 'json')
+
+    def test_key_includes_converter(self, tmpdir, monkeypatch):
+        path = str(tmpdir.join('cache'))
+        key = ConversionCache(path).key('my-job', '<project/>')
+        monkeypatch.setattr(jenkins_job_wrecker, '__version__', '99')
+        assert key != ConversionCache(path).key('my-job', '<project/>')
+
+    def test_key_includes_cli(self, tmpdir, monkeypatch):
+        path = str(tmpdir.join('cache'))
+        key = ConversionCache(path).key('my-job', '<project/>')
+        sources = jenkins_job_wrecker.cache.MODULE_SOURCES
+        assert any(b'def children_to_data(' in source for source in sources)
+        monkeypatch.setattr(jenkins_job_wrecker.cache, 'MODULE_SOURCES',
+                            sources[:-1] + [sources[-1] + b'\n# changed\n'])
+        assert key != ConversionCache(path).key('my-job', '<project/>')
+
+    def test_fingerprint(self, tmpdir, monkeypatch):
+        path = str(tmpdir.join('cache'))
+        cache = ConversionCache(path)
+        assert cache.get_fingerprint('my-job') is None
+        cache.put_fingerprint('my-job', 'ETag: "abc"')
+        assert cache.get_fingerprint('my-job') == 'ETag: "abc"'
+        cache.close()
+        assert ConversionCache(path).get_fingerprint('my-job') == \
+            'ETag: "abc"'
+        # Files written in another format, or by another version of
+        # jjwrecker, are out of date.
+        assert ConversionCache(path, output_format='json') \
+            .get_fingerprint('my-job') is None
+        monkeypatch.setattr(jenkins_job_wrecker, '__version__', '99')
+        assert ConversionCache(path).get_fingerprint('my-job') is None
+
+    def test_summary(self, tmpdir):
+        cache = ConversionCache(str(tmpdir.join('cache')))
+        cache.record(True)
+        cache.record(True)
+        cache.record(True)
+        cache.record(False)
+        assert cache.summary() == 'cache: 3 hits, 1 misses (75.0% hit rate)'
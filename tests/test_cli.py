@@ -1,7 +1,14 @@
-from jenkins_job_wrecker.cli import parse_args, get_xml_root
+from jenkins_job_wrecker.cli import parse_args, get_xml_root, \
+    convert_server_job, convert_files, convert_file, save_result, \
+    convert_changed_server_job, convert_xmls, full_export, main
+from jenkins_job_wrecker.cache import open_cache
+from jenkins_job_wrecker.output import OutputWriter
+import json
 import os
 import xml.etree.ElementTree
+from xml.etree.ElementTree import ParseError
 import pytest
+import yaml
 
 fixtures_path = os.path.join(os.path.dirname(__file__), 'fixtures')
 
@@ -22,6 +29,10 @@ class TestArgParser(object):
     def test_ice_setup(self):
         assert parse_args(['-f', ice_setup_xml_file, '-n', 'ice-setup'])
 
+    def test_many_filenames(self):
+        args = parse_args(['-f', ice_setup_xml_file, 'exports/*.xml'])
+        assert args.filename == [ice_setup_xml_file, 'exports/*.xml']
+
     # "-s" tests
 
     def test_missing_jenkins_server(self):
@@ -31,6 +42,58 @@ class TestArgParser(object):
     def test_jenkins_server(self):
         assert parse_args(['-s', 'http://localhost:8080'])
 
+    def test_jobs(self):
+        args = parse_args(['-s', 'http://localhost:8080', '-j', '16'])
+        assert args.jobs == 16
+
+    def test_format(self):
+        args = parse_args(['-s', 'http://localhost:8080', '--format', 'json'])
+        assert args.output_format == 'json'
+
+    def test_format_default(self):
+        args = parse_args(['-s', 'http://localhost:8080'])
+        assert args.output_format == 'yaml'
+
+    def test_profile(self):
+        args = parse_args(['--jenkins-home', '/var/lib/jenkins',
+                           '--profile', 'out.json', '--cprofile', 'profiles'])
+        assert args.profile == 'out.json'
+        assert args.cprofile == 'profiles'
+
+    def test_jobs_default(self):
+        args = parse_args(['-s', 'http://localhost:8080'])
+        assert args.jobs is None
+
+    def test_cache_default(self):
+        assert parse_args(['-s', 'http://localhost:8080']).cache
+
+    def test_no_cache(self):
+        args = parse_args(['-s', 'http://localhost:8080', '--no-cache'])
+        assert not args.cache
+
+    def test_full_export(self):
+        assert full_export(parse_args(['-s', 'http://localhost:8080']))
+        for partial in (['-n', 'a'], ['--include', 'a'], ['--ignore', 'a'],
+                        ['--folder-depth', '0']):
+            args = parse_args(['-s', 'http://localhost:8080'] + partial)
+            assert not full_export(args)
+        assert not full_export(parse_args(['-f', 'a.xml']))
+
+    def test_prune_needs_every_job(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        with pytest.raises(SystemExit):
+            main(['-s', 'http://localhost:8080', '--include', 'timeout',
+                  '--prune'])
+        with pytest.raises(SystemExit):
+            main(['-f', ice_setup_xml_file, '--prune'])
+        assert not tmpdir.join('output').check()
+
+    # "--jenkins-home" tests
+
+    def test_jenkins_home(self):
+        args = parse_args(['--jenkins-home', '/var/lib/jenkins'])
+        assert args.jenkins_home == '/var/lib/jenkins'
+
 
 class TestGetXmlRoot(object):
     def test_missing_arg(self):
@@ -39,8 +102,221 @@ class TestGetXmlRoot(object):
 
     def test_xml_root_with_file(self):
         root = get_xml_root(filename=ice_setup_xml_file)
-        assert isinstance(root, xml.etree.ElementTree.Element)
+        assert xml.etree.ElementTree.iselement(root)
 
     def test_xml_root_with_string(self):
         root = get_xml_root(string='<testing></testing>')
-        assert isinstance(root, xml.etree.ElementTree.Element)
+        assert xml.etree.ElementTree.iselement(root)
+
+    def test_xml_root_with_utf8_bytes(self):
+        root = get_xml_root(string=u'<t>\u00e9</t>'.encode('utf-8'))
+        assert root.text == u'\u00e9'
+
+
+class FakeJenkins(object):
+    def __init__(self):
+        self.fetched = []
+
+    def get_job_config(self, name):
+        self.fetched.append(name)
+        with open(os.path.join(fixtures_path, name + '.xml'), 'rb') as f:
+            return f.read()
+
+    # Serve every config with the same ETag.
+    def get_job_config_if_changed(self, name, fingerprint=None):
+        if fingerprint == 'ETag:"1"':
+            return None, fingerprint
+        return self.get_job_config(name), 'ETag:"1"'
+
+
+class TestConvertServerJob(object):
+    def test_convert_server_job(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.mkdir('output')
+        result = convert_server_job(FakeJenkins(), 'timeout')
+        assert result[0] == 'timeout'
+        save_result(result, OutputWriter('output'))
+        with open(os.path.join(fixtures_path, 'timeout.yaml')) as f:
+            expected = f.read()
+        assert tmpdir.join('output', 'timeout.yml').read() == expected
+
+
+class TestConvertFiles(object):
+    def test_convert_files(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        jobs = []
+        for name in ('timeout', 'slack', 'folder/gerrit-trigger'):
+            filename = os.path.basename(name) + '.xml'
+            jobs.append((name, os.path.join(fixtures_path, filename)))
+        convert_files(jobs, OutputWriter('output'), processes=2)
+        for name in ('timeout', 'slack', 'folder/gerrit-trigger'):
+            filename = os.path.basename(name) + '.yaml'
+            with open(os.path.join(fixtures_path, filename)) as f:
+                expected = f.read().replace(
+                    'name: ' + os.path.basename(name), 'name: ' + name, 1)
+            assert tmpdir.join('output', name + '.yml').read() == expected
+
+    def test_convert_files_to_json(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        jobs = [(name, os.path.join(fixtures_path, name + '.xml'))
+                for name in ('timeout', 'slack')]
+        convert_files(jobs, OutputWriter('output'), processes=2,
+                      output_format='json')
+        for name in ('timeout', 'slack'):
+            with open(os.path.join(fixtures_path, name + '.yaml')) as f:
+                expected = yaml.safe_load(f)
+            output = tmpdir.join('output', name + '.yml').read()
+            assert json.loads(output) == expected
+
+    def test_unsupported_project(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.join('pipeline.xml').write('<flow-definition/>')
+        jobs = [('timeout', os.path.join(fixtures_path, 'timeout.xml')),
+                ('pipeline', 'pipeline.xml')]
+        writer = OutputWriter('output')
+        convert_files(jobs, writer, processes=2)
+        assert os.listdir('output') == ['timeout.yml']
+        assert writer.summary() == \
+            'output: 1 written, 0 unchanged, 0 deleted, 1 skipped'
+
+
+class TestConvertXmls(object):
+    def test_convert_xmls(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        jobs = []
+        for name in ('timeout', 'slack'):
+            with open(os.path.join(fixtures_path, name + '.xml'), 'rb') as f:
+                jobs.append((name, f.read()))
+        convert_xmls(iter(jobs * 20), OutputWriter('output'), processes=2)
+        for name in ('timeout', 'slack'):
+            with open(os.path.join(fixtures_path, name + '.yaml')) as f:
+                expected = f.read()
+            assert tmpdir.join('output', name + '.yml').read() == expected
+
+    def test_error(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        jobs = [('broken', b'<project>')] * 50
+        with pytest.raises(ParseError):
+            convert_xmls(iter(jobs), OutputWriter('output'), processes=2)
+
+
+class TestCachedConversion(object):
+    def test_cache_hit_skips_write(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.mkdir('output')
+        cache = open_cache('output')
+        job = ('timeout', os.path.join(fixtures_path, 'timeout.xml'))
+        writer = OutputWriter('output')
+        save_result(convert_file(job, cache), writer, cache)
+        output = tmpdir.join('output', 'timeout.yml')
+        os.utime(str(output), (0, 0))
+        result = convert_file(job, cache)
+        assert result.hit
+        save_result(result, writer, cache)
+        assert output.mtime() == 0
+        assert (cache.hits, cache.misses) == (1, 1)
+        cache.close()
+
+    def test_cache_hit_rewrites_changed_file(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.mkdir('output')
+        cache = open_cache('output')
+        job = ('timeout', os.path.join(fixtures_path, 'timeout.xml'))
+        writer = OutputWriter('output')
+        save_result(convert_file(job, cache), writer, cache)
+        output = tmpdir.join('output', 'timeout.yml')
+        expected = output.read()
+        output.write('edited')
+        save_result(convert_file(job, cache), writer, cache)
+        assert output.read() == expected
+        cache.close()
+
+    def test_cache_hit_rewrites_missing_file(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.mkdir('output')
+        cache = open_cache('output')
+        job = ('timeout', os.path.join(fixtures_path, 'timeout.xml'))
+        writer = OutputWriter('output')
+        save_result(convert_file(job, cache), writer, cache)
+        output = tmpdir.join('output', 'timeout.yml')
+        expected = output.read()
+        output.remove()
+        save_result(convert_file(job, cache), writer, cache)
+        assert output.read() == expected
+        cache.close()
+
+    def test_convert_files_with_cache(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.mkdir('output')
+        jobs = [(name, os.path.join(fixtures_path, name + '.xml'))
+                for name in ('timeout', 'slack')]
+        cache = open_cache('output')
+        convert_files(jobs, OutputWriter('output'), processes=2,
+                      cache=cache)
+        cache.close()
+        cache = open_cache('output')
+        convert_files(jobs, OutputWriter('output'), processes=2,
+                      cache=cache)
+        assert (cache.hits, cache.misses) == (2, 0)
+        cache.close()
+
+
+class TestChangedServerJobs(object):
+    def convert(self, server, job, cache, field=None):
+        writer = OutputWriter('output')
+        result = convert_changed_server_job(server, job, cache, writer, field)
+        save_result(result, writer, cache)
+        return result
+
+    def test_conditional_request(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.mkdir('output')
+        cache = open_cache('output')
+        server = FakeJenkins()
+        job = {'name': 'timeout'}
+        assert self.convert(server, job, cache).yaml is not None
+        assert self.convert(server, job, cache).yaml is None
+        assert server.fetched == ['timeout']
+        assert cache.unchanged == 1
+        cache.close()
+
+    def test_missing_output_is_refetched(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.mkdir('output')
+        cache = open_cache('output')
+        server = FakeJenkins()
+        job = {'name': 'timeout'}
+        self.convert(server, job, cache)
+        tmpdir.join('output', 'timeout.yml').remove()
+        self.convert(server, job, cache)
+        assert server.fetched == ['timeout', 'timeout']
+        assert tmpdir.join('output', 'timeout.yml').check()
+        cache.close()
+
+    def test_format_switch_is_refetched(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.mkdir('output')
+        server = FakeJenkins()
+        job = {'name': 'timeout'}
+        cache = open_cache('output')
+        self.convert(server, job, cache)
+        cache.close()
+        cache = open_cache('output', 'json')
+        result = convert_changed_server_job(server, job, cache,
+                                            OutputWriter('output'),
+                                            output_format='json')
+        assert result.yaml.startswith(b'[')
+        assert server.fetched == ['timeout', 'timeout']
+        cache.close()
+
+    def test_tree_field(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.mkdir('output')
+        cache = open_cache('output')
+        server = FakeJenkins()
+        self.convert(server, {'name': 'timeout', 'rev': 1}, cache, 'rev')
+        self.convert(server, {'name': 'timeout', 'rev': 1}, cache, 'rev')
+        assert server.fetched == ['timeout']
+        self.convert(server, {'name': 'timeout', 'rev': 2}, cache, 'rev')
+        assert server.fetched == ['timeout', 'timeout']
+        cache.close()
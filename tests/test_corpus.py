@@ -0,0 +1,73 @@
+from jenkins_job_wrecker.bench import main, peak_rss, time_generated, \
+    time_generated_in_child
+from jenkins_job_wrecker.cli import get_xml_root, root_to_data
+from jenkins_job_wrecker.corpus import JobGenerator, write_jenkins_home
+from jenkins_job_wrecker.sources import walk_jenkins_home
+from jenkins_job_wrecker.yaml_writer import dump
+import pytest
+import yaml
+
+
+class TestJobGenerator(object):
+
+    def test_same_seed_same_jobs(self):
+        assert list(JobGenerator(7).jobs(20)) == list(JobGenerator(7).jobs(20))
+        assert list(JobGenerator(7).jobs(20)) != list(JobGenerator(8).jobs(20))
+
+    def test_jobs_convert(self):
+        for name, xml in JobGenerator(1, unhandled=0.2).jobs(50):
+            data = root_to_data(get_xml_root(string=xml), name, xml)
+            assert data[0]['job']['name'] == name
+            assert yaml.safe_load(dump(data))[0]['job']['name'] == name
+
+    def test_sizes(self):
+        generator = JobGenerator(builders=0, publishers=0, wrappers=0)
+        name, xml = generator.job(0)
+        assert b'<builders/>' in xml
+        assert b'<publishers/>' in xml
+        assert b'<buildWrappers/>' in xml
+
+    def test_unhandled_plugins_go_raw(self):
+        generator = JobGenerator(builders=5, unhandled=1.0)
+        name, xml = generator.job(0)
+        data = root_to_data(get_xml_root(string=xml), name, xml)
+        for builder in data[0]['job'].get('builders', []):
+            assert list(builder) == ['raw']
+
+    def test_unknown_size(self):
+        with pytest.raises(TypeError):
+            JobGenerator(steps=3)
+
+    def test_write_jenkins_home(self, tmpdir):
+        assert write_jenkins_home(str(tmpdir), 5, seed=3) == 5
+        jobs = list(walk_jenkins_home(str(tmpdir)))
+        assert sorted(name for name, _ in jobs) == \
+            sorted(name for name, _ in JobGenerator(3).jobs(5))
+
+
+class TestBench(object):
+
+    def test_time_generated(self):
+        parse, convert, emit = time_generated(JobGenerator(), 10, 'json')
+        assert parse > 0 and convert > 0 and emit > 0
+
+    def test_time_generated_in_child(self):
+        if peak_rss() is None:
+            pytest.skip('no resource module')
+        # Raise this process's peak well above what 5 jobs need.
+        blob = b' ' * (256 * 1024 * 1024)
+        del blob
+        parse, convert, emit, rss = time_generated_in_child(0, {}, 5)
+        assert parse > 0 and convert > 0 and emit > 0
+        assert rss < peak_rss() - 128
+
+    def test_main_generate(self, capsys):
+        main(['--generate', '5', '10', '--builders', '1',
+              '--unhandled', '0'])
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0].split()[0] == 'jobs'
+        assert [line.split()[0] for line in lines[1:]] == ['5', '10']
+
+    def test_main_needs_input(self, capsys):
+        with pytest.raises(SystemExit):
+            main([])
@@ -0,0 +1,164 @@
+from jenkins_job_wrecker.fetch import JenkinsFetcher, native_name
+import json
+
+
+class FakeResponse(object):
+    def __init__(self, status_code=200, text='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeSession(object):
+    def __init__(self, responses):
+        self.responses = responses
+        self.requests = []
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append((url, headers))
+        return self.responses[url]
+
+
+class TestJenkinsFetcher(object):
+
+    def test_job_url(self):
+        fetcher = JenkinsFetcher('http://localhost:8080')
+        assert fetcher.job_url('my job') == \
+            'http://localhost:8080/job/my%20job/'
+
+    def test_job_url_folder(self):
+        fetcher = JenkinsFetcher('http://localhost:8080/')
+        assert fetcher.job_url('folder/my-job') == \
+            'http://localhost:8080/job/folder/job/my-job/'
+
+    def test_pooled_session(self):
+        fetcher = JenkinsFetcher('http://localhost:8080', pool_size=16)
+        adapter = fetcher.session.get_adapter('https://localhost:8080/')
+        assert adapter._pool_maxsize == 16
+        assert adapter._pool_block
+        assert adapter.max_retries.total == 3
+        assert 500 in adapter.max_retries.status_forcelist
+        assert fetcher.session.headers['Accept-Encoding'] == 'gzip'
+
+    def test_credentials(self):
+        fetcher = JenkinsFetcher('http://localhost:8080', username='alfredo',
+                                 password='go-tamaulipas')
+        assert fetcher.session.auth == ('alfredo', 'go-tamaulipas')
+
+    def test_crumb_is_reused(self):
+        fetcher = JenkinsFetcher('http://localhost:8080')
+        crumb = {'crumbRequestField': 'Jenkins-Crumb', 'crumb': 'abc'}
+        fetcher.session = FakeSession({
+            'http://localhost:8080/crumbIssuer/api/json':
+                FakeResponse(text=json.dumps(crumb)),
+            'http://localhost:8080/job/a/config.xml':
+                FakeResponse(text='<project/>'),
+            'http://localhost:8080/job/b/config.xml':
+                FakeResponse(text='<matrix-project/>'),
+        })
+        assert fetcher.get_job_config('a') == '<project/>'
+        assert fetcher.get_job_config('b') == '<matrix-project/>'
+        urls = [url for url, _ in fetcher.session.requests]
+        assert urls.count('http://localhost:8080/crumbIssuer/api/json') == 1
+        for url, headers in fetcher.session.requests[1:]:
+            assert headers == {'Jenkins-Crumb': 'abc'}
+
+    def test_no_crumb_issuer(self):
+        fetcher = JenkinsFetcher('http://localhost:8080')
+        fetcher.session = FakeSession({
+            'http://localhost:8080/crumbIssuer/api/json':
+                FakeResponse(status_code=404),
+            'http://localhost:8080/job/a/config.xml':
+                FakeResponse(text='<project/>'),
+        })
+        assert fetcher.get_job_config('a') == '<project/>'
+        assert fetcher.crumb is False
+
+    def test_iter_jobs(self):
+        fetcher = JenkinsFetcher('http://localhost:8080')
+        fetcher.crumb = False
+        folder = 'com.cloudbees.hudson.plugins.folder.Folder'
+        listings = {
+            'http://localhost:8080/api/json': [
+                {'name': 'a', '_class': 'hudson.model.FreeStyleProject'},
+                {'name': 'f', '_class': folder},
+            ],
+            'http://localhost:8080/job/f/api/json': [
+                {'name': 'b', '_class': 'hudson.model.FreeStyleProject'},
+                {'name': 'g', '_class': folder},
+            ],
+            'http://localhost:8080/job/f/job/g/api/json': [
+                {'name': 'c', '_class': 'hudson.matrix.MatrixProject'},
+            ],
+        }
+
+        class Session(object):
+            def get(self, url, params=None, **kwargs):
+                assert params == {'tree': 'jobs[name,_class,rev]'}
+                return FakeResponse(text=json.dumps({'jobs': listings[url]}))
+
+        fetcher.session = Session()
+        jobs = fetcher.iter_jobs(['rev'])
+        assert next(jobs)['name'] == 'a'
+        assert [job['name'] for job in jobs] == ['f/b', 'f/g/c']
+        jobs = fetcher.iter_jobs(['rev'], folder_depth=1)
+        assert [job['name'] for job in jobs] == ['a', 'f/b']
+        jobs = fetcher.iter_jobs(['rev'], folder_depth=0)
+        assert [job['name'] for job in jobs] == ['a']
+        names = [job['name'] for job in fetcher.iter_jobs(['rev'])]
+        assert all(type(name) is str for name in names)
+
+    def test_native_name(self):
+        assert type(native_name(u'f/a')) is str
+        assert native_name(u'caf\xe9') == u'caf\xe9'
+
+    def test_config_if_changed(self):
+        fetcher = JenkinsFetcher('http://localhost:8080')
+        fetcher.crumb = False
+        fetcher.session = FakeSession({
+            'http://localhost:8080/job/a/config.xml':
+                FakeResponse(text='<project/>', headers={'ETag': '"1"'}),
+        })
+        assert fetcher.get_job_config_if_changed('a') == \
+            (b'<project/>', 'ETag:"1"')
+        assert fetcher.session.requests[-1][1] == {}
+
+    def test_config_if_changed_unchanged(self):
+        fetcher = JenkinsFetcher('http://localhost:8080')
+        fetcher.crumb = False
+        fetcher.session = FakeSession({
+            'http://localhost:8080/job/a/config.xml':
+                FakeResponse(status_code=304),
+        })
+        fingerprint = 'Last-Modified:Mon, 05 Oct 2026 10:00:00 GMT'
+        assert fetcher.get_job_config_if_changed('a', fingerprint) == \
+            (None, fingerprint)
+        assert fetcher.session.requests[-1][1] == {
+            'If-Modified-Since': 'Mon, 05 Oct 2026 10:00:00 GMT'}
+
+    def test_config_if_changed_other_kind(self):
+        fetcher = JenkinsFetcher('http://localhost:8080')
+        fetcher.crumb = False
+        fetcher.session = FakeSession({
+            'http://localhost:8080/job/a/config.xml':
+                FakeResponse(text='<project/>'),
+        })
+        assert fetcher.get_job_config_if_changed('a', 'tree:rev:1') == \
+            (b'<project/>', None)
+        assert fetcher.session.requests[-1][1] == {}
+
+    def test_config_if_changed_no_validators(self):
+        fetcher = JenkinsFetcher('http://localhost:8080')
+        fetcher.crumb = False
+        fetcher.session = FakeSession({
+            'http://localhost:8080/job/a/config.xml':
+                FakeResponse(text='<project/>'),
+        })
+        assert fetcher.get_job_config_if_changed('a') == (b'<project/>', None)
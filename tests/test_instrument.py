@@ -0,0 +1,127 @@
+from jenkins_job_wrecker.cli import convert_files, convert_xml
+from jenkins_job_wrecker.corpus import JobGenerator
+from jenkins_job_wrecker.output import OutputWriter
+from jenkins_job_wrecker.registry import registry
+import jenkins_job_wrecker.instrument as instrument
+import json
+import logging
+import os
+import pytest
+import time
+
+fixtures_path = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+unhandled_xml = b'''<project>
+  <builders>
+    <org.example.Unknown/>
+    <hudson.tasks.Shell><command>make</command></hudson.tasks.Shell>
+  </builders>
+  <unknownSetting>x</unknownSetting>
+</project>'''
+
+
+@pytest.fixture
+def instrumented():
+    instrument.enable()
+    yield instrument.get_stats()
+    instrument.disable()
+
+
+class TestInstrument(object):
+
+    def test_disabled_by_default(self):
+        assert not instrument.enabled()
+        assert registry.wrapper is None
+        assert instrument.take() is None
+
+    def test_handler_stats(self, instrumented):
+        convert_xml('my-job', unhandled_xml)
+        stats = instrumented.as_dict()
+        assert stats['jobs'] == 1
+        assert stats['output_bytes'] > 0
+        assert sorted(stats['phases']) == ['convert', 'emit', 'parse']
+        shell = stats['handlers']['handle_shell_builder']
+        assert shell['kind'] == 'builder'
+        assert shell['calls'] == 1
+        assert shell['bytes'] == len('{"shell":"make"}')
+        assert stats['handlers']['handle_builders']['calls'] == 1
+
+    def test_sizing_is_not_timed(self, instrumented, monkeypatch):
+        def slow_json_size(value):
+            time.sleep(0.05)
+            return 1
+        monkeypatch.setattr(instrument, 'json_size', slow_json_size)
+        convert_xml('my-job', unhandled_xml)
+        stats = instrumented.as_dict()
+        # handle_builders calls handle_shell_builder, which is sized first.
+        assert stats['handlers']['handle_builders']['seconds'] < 0.05
+        assert stats['phases']['convert'] < 0.05
+
+    def test_raw_counts(self, instrumented):
+        convert_xml('my-job', unhandled_xml)
+        convert_xml('my-job', unhandled_xml)
+        assert instrumented.as_dict()['raw'] == {
+            'builder': {'org.example.Unknown': 2},
+            'job': {'unknownSetting': 2}}
+
+    def test_errors_are_counted(self, instrumented):
+        xml = b'<project><actions><a/></actions></project>'
+        with pytest.raises(NotImplementedError):
+            convert_xml('my-job', xml)
+        actions = instrumented.as_dict()['handlers']['handle_actions']
+        assert actions['calls'] == 1 and actions['errors'] == 1
+
+    def test_same_output(self, instrumented):
+        jobs = list(JobGenerator(4, unhandled=0.2).jobs(20))
+        profiled = [convert_xml(name, xml).yaml for name, xml in jobs]
+        instrument.disable()
+        assert [convert_xml(name, xml).yaml for name, xml in jobs] == \
+            profiled
+
+    def test_take_and_merge(self, instrumented):
+        convert_xml('my-job', unhandled_xml)
+        taken = instrument.take()
+        assert instrument.get_stats().as_dict()['jobs'] == 0
+        instrument.merge(taken)
+        instrument.merge(taken)
+        stats = instrument.get_stats().as_dict()
+        assert stats['jobs'] == 2
+        assert stats['handlers']['handle_shell_builder']['calls'] == 2
+        assert stats['raw']['builder'] == {'org.example.Unknown': 2}
+
+    def test_workers_send_stats(self, instrumented, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        jobs = []
+        for index in range(4):
+            filename = str(tmpdir.join('job-%d.xml' % index))
+            with open(filename, 'wb') as f:
+                f.write(unhandled_xml)
+            jobs.append(('job-%d' % index, filename))
+        os.mkdir('output')
+        convert_files(jobs, OutputWriter('output'), processes=2)
+        stats = instrumented.as_dict()
+        assert stats['jobs'] == 4
+        assert stats['raw']['builder'] == {'org.example.Unknown': 4}
+
+    def test_cprofile(self, tmpdir):
+        instrument.enable(cprofile_dir=str(tmpdir))
+        try:
+            convert_xml('folder/my-job', unhandled_xml)
+        finally:
+            instrument.disable()
+        assert tmpdir.join('folder', 'my-job.prof').check()
+
+    def test_write_json(self, instrumented, tmpdir):
+        convert_xml('my-job', unhandled_xml)
+        filename = str(tmpdir.join('out.json'))
+        instrument.write_json(instrumented, filename)
+        with open(filename) as f:
+            assert json.load(f)['jobs'] == 1
+
+    def test_raw_log_event(self, caplog):
+        with caplog.at_level(logging.INFO, logger='jjwrecker.raw'):
+            convert_xml('my-job', unhandled_xml)
+        events = [record for record in caplog.records
+                  if getattr(record, 'event', None) == 'raw']
+        assert [(record.kind, record.tag) for record in events] == [
+            ('builder', 'org.example.Unknown'), ('job', 'unknownSetting')]
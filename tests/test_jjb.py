@@ -1,29 +1,27 @@
-from jenkins_job_wrecker.cli import get_xml_root, root_to_yaml
+from jenkins_job_wrecker.cli import get_xml_root, root_to_yaml, root_to_json
+from jenkins_job_wrecker.verify import Verifier
 import os
 import pytest
-import tempfile
-#import jenkins_jobs.cmd
-from subprocess import call
+
+pytest.importorskip('jenkins_jobs')
 
 fixtures_path = os.path.join(os.path.dirname(__file__), 'fixtures')
 
 class TestJJB(object):
 
-    def run_jjb(self, name):
+    def run_jjb(self, name, convert=root_to_yaml):
         filename = os.path.join(fixtures_path, name + '.xml')
         root = get_xml_root(filename=filename)
-        yaml = root_to_yaml(root, name)
+        yaml = convert(root, name)
 
-        # Run this wrecker YAML thru JJB.
-	# XXX: shelling out with call() sucks; use JJB's API instead
-        temp = tempfile.NamedTemporaryFile()
-        temp.write(yaml)
-        temp.flush()
-        assert call(["jenkins-jobs", 'test', temp.name]) == 0
-        temp.close()
+        # Run this wrecker YAML thru JJB, like "jenkins-jobs test" would.
+        assert Verifier().verify_yaml(yaml) is None
 
     def test_ice_setup(self):
         self.run_jjb('ice-setup')
 
     def test_calamari_clients(self):
         self.run_jjb('calamari-clients')
+
+    def test_ice_setup_json(self):
+        self.run_jjb('ice-setup', root_to_json)
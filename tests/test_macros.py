@@ -0,0 +1,157 @@
+from collections import OrderedDict
+from jenkins_job_wrecker.cli import main, dump
+from jenkins_job_wrecker.corpus import write_jenkins_home
+from jenkins_job_wrecker.macros import MacroExtractor, load, macro_name, \
+    block_key, MACROS_NAME
+import jenkins_job_wrecker.macros as macros
+import os
+import pytest
+
+SHELL = {'shell': 'make -j8 && make check && make install DESTDIR=/tmp/out'}
+TIMEOUT = {'timeout': OrderedDict([('timeout', 30), ('fail', True),
+                                   ('type', 'absolute')])}
+
+
+def job(name, builders=(), wrappers=()):
+    data = OrderedDict([('name', name)])
+    if builders:
+        data['builders'] = list(builders)
+    if wrappers:
+        data['wrappers'] = list(wrappers)
+    return [{'job': data}]
+
+
+class TestMacroExtractor(object):
+
+    def test_shared_blocks(self):
+        extractor = MacroExtractor()
+        extractor.add('a', job('a', [SHELL, {'shell': 'echo a, only here, '
+                                                      'in one job'}]))
+        extractor.add('b', job('b', [SHELL], [TIMEOUT]))
+        macros, jobs = extractor.extract()
+        name = macro_name(SHELL, block_key(SHELL))
+        assert name.startswith('shell-')
+        assert macros == [{'builder': OrderedDict([
+            ('name', name), ('builders', [SHELL])])}]
+        assert jobs[0][1][0]['job']['builders'] == \
+            [name, {'shell': 'echo a, only here, in one job'}]
+        assert jobs[1][1][0]['job']['builders'] == [name]
+        assert jobs[1][1][0]['job']['wrappers'] == [TIMEOUT]
+
+    def test_threshold(self):
+        extractor = MacroExtractor(threshold=3)
+        for name in 'ab':
+            extractor.add(name, job(name, wrappers=[TIMEOUT]))
+        assert extractor.extract()[0] == []
+        extractor.add('c', job('c', wrappers=[TIMEOUT]))
+        macros, jobs = extractor.extract()
+        assert list(macros[0]) == ['wrapper']
+        assert all(data[0]['job']['wrappers'] == [macros[0]['wrapper']['name']]
+                   for name, data in jobs)
+
+    def test_repeats_in_one_job(self):
+        extractor = MacroExtractor()
+        extractor.add('a', job('a', [SHELL, SHELL]))
+        assert extractor.extract()[0] == []
+
+    def test_key_order(self):
+        reordered = {'timeout': OrderedDict(
+            reversed(list(TIMEOUT['timeout'].items())))}
+        extractor = MacroExtractor()
+        extractor.add('a', job('a', wrappers=[TIMEOUT]))
+        extractor.add('b', job('b', wrappers=[reordered]))
+        assert len(extractor.extract()[0]) == 1
+
+    def test_small_blocks(self):
+        extractor = MacroExtractor()
+        for name in 'ab':
+            extractor.add(name, job(name, [{'shell': 'make'}]))
+        assert extractor.extract()[0] == []
+
+    def test_load(self):
+        data = job('a', [SHELL], [TIMEOUT])
+        assert load(dump(data)) == data
+        assert list(load(dump(data))[0]['job']) == \
+            ['name', 'builders', 'wrappers']
+        assert load(b'[{"job": {"name": "a"}}]') == [{'job': {'name': 'a'}}]
+
+
+class TestMacrosMain(object):
+
+    def test_main(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        write_jenkins_home('jenkins', 20, script_lines=1)
+        # The workers send each job's structure back, so no YAML is parsed.
+        monkeypatch.setattr(macros, 'load', None)
+        main(['--jenkins-home', 'jenkins', '--macros', '--no-cache'])
+        monkeypatch.undo()
+        monkeypatch.chdir(tmpdir)
+        assert not macros.enabled()
+        with open(os.path.join('output', MACROS_NAME + '.yml'), 'rb') as f:
+            definitions = load(f.read())
+        names = set(next(iter(item.values()))['name']
+                    for item in definitions)
+        assert names
+        used = set()
+        for filename in os.listdir('output'):
+            if filename != MACROS_NAME + '.yml':
+                with open(os.path.join('output', filename), 'rb') as f:
+                    data = load(f.read())
+                for section in ('builders', 'publishers', 'wrappers'):
+                    used.update(block for block in
+                                data[0]['job'].get(section, [])
+                                if not isinstance(block, dict))
+        assert used == names
+
+    def test_main_jjb(self, tmpdir, monkeypatch):
+        pytest.importorskip('jenkins_jobs')
+        from jenkins_job_wrecker.verify import get_verifier
+        monkeypatch.chdir(tmpdir)
+        write_jenkins_home('jenkins', 10, script_lines=1)
+        main(['--jenkins-home', 'jenkins', '--no-cache'])
+        plain = {}
+        for filename in os.listdir('output'):
+            with open(os.path.join('output', filename), 'rb') as f:
+                plain[filename] = f.read()
+        main(['--jenkins-home', 'jenkins', '--macros'])
+        with open(os.path.join('output', MACROS_NAME + '.yml'), 'rb') as f:
+            definitions = load(f.read())
+        verifier = get_verifier()
+        for filename, text in plain.items():
+            with open(os.path.join('output', filename), 'rb') as f:
+                data = load(f.read())
+            name = data[0]['job']['name']
+            expected = verifier.render_yaml(text)[0].output()
+            jobs = verifier.render(definitions + data)
+            assert [job.output() for job in jobs if job.name == name] == \
+                [expected]
+
+    def test_main_without_macros(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        write_jenkins_home('jenkins', 10, script_lines=1)
+        main(['--jenkins-home', 'jenkins', '--macros'])
+        main(['--jenkins-home', 'jenkins', '--prune'])
+        assert MACROS_NAME + '.yml' not in os.listdir('output')
+        for filename in os.listdir('output'):
+            if filename.endswith('.yml'):
+                with open(os.path.join('output', filename), 'rb') as f:
+                    data = load(f.read())
+                for section in ('builders', 'publishers', 'wrappers'):
+                    assert all(isinstance(block, dict) for block in
+                               data[0]['job'].get(section, []))
+
+    def test_partial_run_keeps_macros(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        write_jenkins_home('jenkins', 10, script_lines=1)
+        main(['--jenkins-home', 'jenkins', '--macros'])
+        files = sorted(os.listdir('output'))
+        assert MACROS_NAME + '.yml' in files
+        name = sorted(os.listdir(os.path.join('jenkins', 'jobs')))[0]
+        main(['--jenkins-home', 'jenkins', '--include', name])
+        main(['-f', os.path.join('jenkins', 'jobs', name, 'config.xml')])
+        assert sorted(os.listdir('output')) == files
+
+    def test_changed_only(self):
+        with pytest.raises(SystemExit):
+            main(['-s', 'http://localhost:8080', '--changed-only',
+                  '--macros'])
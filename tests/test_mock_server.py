@@ -0,0 +1,203 @@
+from jenkins_job_wrecker.bench import main as bench_main, time_server
+from jenkins_job_wrecker.cli import main
+from jenkins_job_wrecker.corpus import write_jenkins_home
+from jenkins_job_wrecker.fetch import JenkinsFetcher, RETRIES
+from jenkins_job_wrecker.mock_server import MockJenkins, MockJenkinsProcess
+import jenkins_job_wrecker.pretty_yaml as pretty_yaml
+import os
+import pytest
+import requests
+import timeit
+import yaml
+
+fixtures_path = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+@pytest.fixture
+def jenkins_home(tmpdir):
+    home = str(tmpdir.join('jenkins_home'))
+    write_jenkins_home(home, 6, folders=2)
+    return home
+
+
+class TestMockJenkins(object):
+
+    def test_listing(self, jenkins_home):
+        with MockJenkins(jenkins_home) as jenkins:
+            fetcher = JenkinsFetcher(jenkins.url)
+            names = [job['name'] for job in fetcher.iter_jobs()]
+            assert sorted(names) == sorted(jenkins.configs)
+            assert all(name.startswith('folder-') for name in names)
+            top = [job['name'] for job in fetcher.iter_jobs(folder_depth=0)]
+            assert top == []
+
+    def test_fixtures_directory(self):
+        with MockJenkins(fixtures_path) as jenkins:
+            fetcher = JenkinsFetcher(jenkins.url)
+            with open(os.path.join(fixtures_path, 'ice-setup.xml'),
+                      'rb') as f:
+                xml = f.read()
+            assert fetcher.get_job_config('ice-setup') == xml
+
+    def test_declared_encoding(self, tmpdir, monkeypatch):
+        # The mock server always says UTF-8 in its Content-Type.
+        jobs = tmpdir.mkdir('jobs')
+        jobs.join('cafe.xml').write_binary(
+            u"<?xml version='1.1' encoding='ISO-8859-1'?>\n"
+            u'<project><description>caf\xe9</description></project>'
+            .encode('latin-1'))
+        monkeypatch.chdir(tmpdir)
+        with MockJenkins(str(jobs)) as jenkins:
+            main(['-s', jenkins.url, '--no-cache'])
+        with open(os.path.join('output', 'cafe.yml'), 'rb') as f:
+            data = yaml.safe_load(f)
+        assert data[0]['job']['description'] == u'caf\xe9'
+
+    def test_cli_main_fast_writer(self, tmpdir, monkeypatch):
+        # Job names from the JSON listing must not force the slow
+        # PyYAML fallback.
+        jobs = tmpdir.mkdir('jobs')
+        jobs.join('plain.xml').write(
+            '<project><description>x</description></project>')
+        monkeypatch.chdir(tmpdir)
+
+        def fail(data):
+            raise AssertionError('pretty_yaml.dump(%r)' % (data,))
+        monkeypatch.setattr(pretty_yaml, 'dump', fail)
+        with MockJenkins(str(jobs)) as jenkins:
+            main(['-s', jenkins.url, '--no-cache'])
+        with open(os.path.join('output', 'plain.yml')) as f:
+            text = f.read()
+        assert '!!python' not in text
+        assert yaml.safe_load(text)[0]['job']['name'] == 'plain'
+
+    def test_conditional_request(self, jenkins_home):
+        with MockJenkins(jenkins_home) as jenkins:
+            fetcher = JenkinsFetcher(jenkins.url)
+            name = sorted(jenkins.configs)[0]
+            xml, fingerprint = fetcher.get_job_config_if_changed(name)
+            assert xml and fingerprint.startswith('ETag:')
+            assert fetcher.get_job_config_if_changed(name, fingerprint) == \
+                (None, fingerprint)
+            assert jenkins.requests['not_modified'] == 1
+
+    def test_not_found(self, jenkins_home):
+        with MockJenkins(jenkins_home) as jenkins:
+            response = requests.get(jenkins.url + 'job/missing/config.xml')
+            assert response.status_code == 404
+            assert jenkins.requests['not_found'] == 1
+
+    def test_errors(self, jenkins_home):
+        with MockJenkins(jenkins_home, error_rate=1.0) as jenkins:
+            fetcher = JenkinsFetcher(jenkins.url)
+            with pytest.raises(requests.HTTPError):
+                list(fetcher.iter_jobs())
+            assert jenkins.requests['error'] == 1 + RETRIES
+
+    def test_retries(self, jenkins_home):
+        with MockJenkins(jenkins_home, error_rate=0.3) as jenkins:
+            fetcher = JenkinsFetcher(jenkins.url)
+            names = [job['name'] for job in fetcher.iter_jobs()]
+            for name in names:
+                assert fetcher.get_job_config(name)
+            assert sorted(names) == sorted(jenkins.configs)
+            assert jenkins.requests['error'] > 0
+
+    def test_latency(self, jenkins_home):
+        with MockJenkins(jenkins_home, latency=0.05) as jenkins:
+            start = timeit.default_timer()
+            requests.get(jenkins.url + 'api/json')
+            assert timeit.default_timer() - start >= 0.05
+
+    def test_bandwidth(self, jenkins_home):
+        with MockJenkins(jenkins_home, bandwidth=10000, gzip=False) \
+                as jenkins:
+            name = sorted(jenkins.configs)[0]
+            start = timeit.default_timer()
+            response = requests.get(JenkinsFetcher(jenkins.url).job_url(name)
+                                    + 'config.xml')
+            seconds = timeit.default_timer() - start
+            assert seconds >= len(response.content) / 10000.0 * 0.9
+
+    def test_cli_main(self, jenkins_home, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        with MockJenkins(jenkins_home) as jenkins:
+            main(['-s', jenkins.url, '-j', '2', '--changed-only'])
+            for name in jenkins.configs:
+                assert os.path.exists(os.path.join('output', name + '.yml'))
+            # A second run only gets 304s.
+            main(['-s', jenkins.url, '--changed-only'])
+            assert jenkins.requests['config'] == len(jenkins.configs)
+            assert jenkins.requests['not_modified'] == len(jenkins.configs)
+
+    def test_cli_main_skips_unsupported_jobs(self, tmpdir, monkeypatch,
+                                             caplog):
+        jobs = tmpdir.mkdir('jobs')
+        jobs.join('pipeline.xml').write('<flow-definition/>')
+        with open(os.path.join(fixtures_path, 'timeout.xml'), 'rb') as f:
+            jobs.join('timeout.xml').write_binary(f.read())
+        monkeypatch.chdir(tmpdir)
+        with MockJenkins(str(jobs)) as jenkins:
+            main(['-s', jenkins.url, '--changed-only'])
+        assert sorted(os.listdir('output')) == ['.jjw-cache', 'timeout.yml']
+        assert 'output: 1 written, 0 unchanged, 0 deleted, 1 skipped' in \
+            caplog.text
+
+    def test_cli_main_fingerprint_kinds(self, jenkins_home, tmpdir,
+                                        monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        with MockJenkins(jenkins_home) as jenkins:
+            main(['-s', jenkins.url, '--changed-only',
+                  '--fingerprint-field', 'name'])
+            # The tree fingerprints mean nothing to the server, so every
+            # config is fetched again, and then only gets 304s.
+            main(['-s', jenkins.url, '--changed-only'])
+            assert jenkins.requests['config'] == 2 * len(jenkins.configs)
+            main(['-s', jenkins.url, '--changed-only'])
+            assert jenkins.requests['not_modified'] == len(jenkins.configs)
+            # And back.
+            main(['-s', jenkins.url, '--changed-only',
+                  '--fingerprint-field', 'name'])
+            assert jenkins.requests['config'] == 3 * len(jenkins.configs)
+
+    def test_cli_main_listing_error(self, jenkins_home, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        with MockJenkins(jenkins_home, error_rate=1.0) as jenkins:
+            with pytest.raises(requests.HTTPError):
+                main(['-s', jenkins.url])
+
+
+class TestServerBench(object):
+
+    def test_time_server(self, jenkins_home):
+        with MockJenkinsProcess(jenkins_home) as jenkins:
+            assert jenkins.jobs == 6
+            seconds, counts = time_server(jenkins, 2)
+            assert seconds > 0
+            assert counts['config'] == 6
+            # The folders and the top level.
+            assert counts['list'] == 3
+
+    def test_main_server(self, jenkins_home, capsys):
+        bench_main(['--server', '--jenkins-home', jenkins_home,
+                    '-j', '1', '2'])
+        lines = capsys.readouterr().out.splitlines()
+        assert [line.split()[:2] for line in lines[1:]] == \
+            [['6', '1'], ['6', '2']]
+
+    def test_main_server_retries(self, jenkins_home, capsys):
+        bench_main(['--server', '--jenkins-home', jenkins_home,
+                    '--error-rate', '0.3'])
+        jobs, workers, seconds, rate, requests, errors = \
+            capsys.readouterr().out.splitlines()[1].split()
+        assert jobs == '6'
+        assert int(errors) > 0
+
+    def test_main_server_errors(self, jenkins_home, capsys):
+        bench_main(['--server', '--jenkins-home', jenkins_home,
+                    '--error-rate', '1'])
+        assert 'failed' in capsys.readouterr().out
+
+    def test_server_needs_jobs(self):
+        with pytest.raises(SystemExit):
+            bench_main(['--server'])
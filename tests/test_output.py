@@ -0,0 +1,70 @@
+from jenkins_job_wrecker.output import OutputWriter
+import jenkins_job_wrecker.output as output
+import os
+
+
+class TestOutputWriter(object):
+
+    def test_write(self, tmpdir):
+        writer = OutputWriter(str(tmpdir))
+        assert writer.write('my-job', 'yaml\n')
+        assert writer.write('folder/my-job', 'yaml\n')
+        writer.close()
+        assert tmpdir.join('my-job.yml').read() == 'yaml\n'
+        assert tmpdir.join('folder', 'my-job.yml').read() == 'yaml\n'
+        assert writer.summary() == 'output: 2 written, 0 unchanged, 0 deleted'
+
+    def test_unchanged(self, tmpdir):
+        tmpdir.join('my-job.yml').write('yaml\n')
+        os.utime(str(tmpdir.join('my-job.yml')), (0, 0))
+        writer = OutputWriter(str(tmpdir))
+        assert not writer.write('my-job', 'yaml\n')
+        assert tmpdir.join('my-job.yml').mtime() == 0
+        assert writer.write('my-job', 'changed\n')
+        assert tmpdir.join('my-job.yml').read() == 'changed\n'
+        assert (writer.written, writer.unchanged) == (1, 1)
+
+    def test_no_temporary_files(self, tmpdir):
+        writer = OutputWriter(str(tmpdir))
+        writer.write('my-job', 'yaml\n')
+        assert os.listdir(str(tmpdir)) == ['my-job.yml']
+
+    def test_permissions(self, tmpdir):
+        writer = OutputWriter(str(tmpdir))
+        writer.write('my-job', 'yaml\n')
+        tmpdir.join('other.yml').write('yaml\n')
+        assert tmpdir.join('my-job.yml').stat().mode == \
+            tmpdir.join('other.yml').stat().mode
+
+    def test_umask_set_after_import(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(output, '_umask', None)
+        umask = os.umask(0o027)
+        try:
+            OutputWriter(str(tmpdir)).write('my-job', 'yaml\n')
+        finally:
+            os.umask(umask)
+        assert tmpdir.join('my-job.yml').stat().mode & 0o777 == 0o640
+
+    def test_prune(self, tmpdir):
+        tmpdir.join('kept.yml').write('yaml\n')
+        tmpdir.join('stale.yml').write('yaml\n')
+        tmpdir.mkdir('folder').join('stale.yml').write('yaml\n')
+        tmpdir.join('.jjw-cache').write('')
+        writer = OutputWriter(str(tmpdir))
+        writer.write('new', 'yaml\n')
+        writer.keep('kept')
+        writer.prune()
+        writer.close()
+        assert sorted(os.listdir(str(tmpdir))) == \
+            ['.jjw-cache', 'folder', 'kept.yml', 'new.yml']
+        assert os.listdir(str(tmpdir.join('folder'))) == []
+        assert writer.summary() == 'output: 1 written, 1 unchanged, 2 deleted'
+
+    def test_remove(self, tmpdir):
+        tmpdir.join('old.yml').write('yaml\n')
+        writer = OutputWriter(str(tmpdir))
+        assert writer.remove('old')
+        assert not writer.remove('missing')
+        writer.close()
+        assert os.listdir(str(tmpdir)) == []
+        assert writer.summary() == 'output: 0 written, 0 unchanged, 1 deleted'
@@ -0,0 +1,76 @@
+from collections import OrderedDict
+from jenkins_job_wrecker.cli import get_xml_root, root_to_yaml
+import jenkins_job_wrecker.pretty_yaml as pretty_yaml
+import jenkins_job_wrecker.yaml_writer as yaml_writer
+import glob
+import os
+import pytest
+import yaml
+
+fixtures_path = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+needs_libyaml = pytest.mark.skipif(pretty_yaml.PrettyCDumper is None,
+                                   reason='PyYAML was built without libyaml')
+
+
+def python_dump(data):
+    return yaml.dump(data, Dumper=pretty_yaml.PrettyDumper,
+                     default_flow_style=False)
+
+
+class TestDump(object):
+
+    @pytest.mark.parametrize('dumper', ['writer', 'libyaml', 'python'])
+    def test_golden_yaml(self, dumper, monkeypatch):
+        if dumper != 'writer':
+            monkeypatch.setattr(yaml_writer, 'writable', lambda data: False)
+        if dumper == 'python':
+            monkeypatch.setattr(pretty_yaml, 'PrettyCDumper', None)
+        for expected_filename in glob.glob(os.path.join(fixtures_path,
+                                                        '*.yaml')):
+            name = os.path.basename(expected_filename)[:-len('.yaml')]
+            root = get_xml_root(filename=os.path.join(fixtures_path,
+                                                      name + '.xml'))
+            with open(expected_filename) as f:
+                assert root_to_yaml(root, name) == f.read()
+
+    @needs_libyaml
+    @pytest.mark.parametrize('value', [
+        'echo hello\n',
+        'echo hello\n\n',
+        'a\n  b\n',
+        'plain',
+        '',
+        'yes',
+        "it's: #1",
+        ['x\n\n', OrderedDict()],
+        OrderedDict([('b', 'x\n\n'), ('a', [])]),
+        {'b': 'x\n\n', 'a': 1},
+    ])
+    def test_same_as_python(self, value):
+        data = [{'job': OrderedDict([('name', 'my-job'), ('value', value)])}]
+        assert pretty_yaml.c_dumpable(data)
+        assert pretty_yaml.dump(data) == python_dump(data)
+
+    @pytest.mark.parametrize('value', [
+        'tab\there',
+        'caf\xc3\xa9',
+        'trailing space \nline',
+        'line\ntrailing space ',
+        u'unicode',
+        1.5,
+        OrderedDict([('', 'empty key')]),
+        OrderedDict([('multi\nline', 'key')]),
+        OrderedDict([('k' * 125, 'long key')]),
+    ])
+    def test_not_c_dumpable(self, value):
+        data = [{'job': OrderedDict([('name', 'my-job'), ('value', value)])}]
+        assert not pretty_yaml.c_dumpable(data)
+        assert pretty_yaml.dump(data) == python_dump(data)
+
+    def test_ends_open(self):
+        assert pretty_yaml.ends_open([{'job': OrderedDict([('a', 'x\n\n')])}])
+        assert pretty_yaml.ends_open(['\n'])
+        assert not pretty_yaml.ends_open([{'a': 'x\n\n', 'b': 'y'}])
+        assert not pretty_yaml.ends_open(['x\n\n', []])
+        assert not pretty_yaml.ends_open(['x\n'])
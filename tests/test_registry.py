@@ -0,0 +1,85 @@
+from jenkins_job_wrecker.cli import root_to_yaml
+from jenkins_job_wrecker.registry import HandlerRegistry
+import jenkins_job_wrecker.job_handlers as job_handlers
+import xml.etree.ElementTree as ET
+
+
+class TestHandlerRegistry(object):
+
+    def test_register(self):
+        registry = HandlerRegistry()
+
+        @registry.register('publisher', 'hudson.tasks.Mailer')
+        def handle_mailer(child):
+            return {'email': {}}
+
+        assert registry.get('publisher', 'hudson.tasks.Mailer') is \
+            handle_mailer
+        assert registry.get('builder', 'hudson.tasks.Mailer') is None
+        assert handle_mailer.handles == [
+            ('publisher', 'hudson.tasks.Mailer', None)]
+
+    def test_lookup_class(self):
+        registry = HandlerRegistry()
+
+        @registry.register('job', 'scm')
+        def handle_any_scm(top):
+            pass
+
+        @registry.register('job', 'scm', cls='hudson.plugins.git.GitSCM')
+        def handle_git_scm(top):
+            pass
+
+        git = ET.fromstring('<scm class="hudson.plugins.git.GitSCM"/>')
+        svn = ET.fromstring('<scm class="hudson.scm.SubversionSCM"/>')
+        assert registry.lookup('job', git) is handle_git_scm
+        assert registry.lookup('job', svn) is handle_any_scm
+        assert registry.lookup('job', ET.fromstring('<scm/>')) is \
+            handle_any_scm
+        assert registry.lookup('job', ET.fromstring('<other/>')) is None
+
+    def test_tags(self):
+        tags = job_handlers.registry.tags('wrapper')
+        assert 'hudson.plugins.ansicolor.AnsiColorBuildWrapper' in tags
+        assert tags == sorted(tags)
+
+
+class TestRegisteredHandlers(object):
+
+    def convert(self, xml):
+        return root_to_yaml(ET.fromstring(xml), 'my-job')
+
+    def test_third_party_handler(self, monkeypatch):
+        monkeypatch.setattr(job_handlers.registry, '_handlers',
+                            dict(job_handlers.registry._handlers))
+
+        @job_handlers.register('publisher', 'org.example.MyPublisher')
+        def handle_my_publisher(child):
+            return {'my-publisher': {'enabled': True}}
+
+        yaml = self.convert('<project><publishers><org.example.MyPublisher/>'
+                            '</publishers></project>')
+        assert 'my-publisher:\n' in yaml
+        assert 'raw:' not in yaml
+
+    def test_unknown_goes_raw(self):
+        yaml = self.convert('<project><publishers><org.example.MyPublisher/>'
+                            '</publishers></project>')
+        assert 'raw:' in yaml
+        assert 'org.example.MyPublisher' in yaml
+
+    def test_property_settings(self):
+        yaml = self.convert(
+            '<project><properties>'
+            '<com.sonyericsson.rebuild.RebuildSettings>'
+            '<autoRebuild>false</autoRebuild>'
+            '</com.sonyericsson.rebuild.RebuildSettings>'
+            '<hudson.model.ParametersDefinitionProperty>'
+            '<parameterDefinitions>'
+            '<hudson.model.StringParameterDefinition><name>A</name>'
+            '</hudson.model.StringParameterDefinition>'
+            '</parameterDefinitions>'
+            '</hudson.model.ParametersDefinitionProperty>'
+            '</properties></project>')
+        assert 'auto-rebuild: false' in yaml
+        assert 'name: A' in yaml
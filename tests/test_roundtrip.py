@@ -0,0 +1,131 @@
+from jenkins_job_wrecker.roundtrip import Difference, canonical, diff, \
+    diff_xml
+import xml.etree.ElementTree as ET
+
+
+def differences(original, regenerated):
+    return diff_xml(original.encode('utf-8'), regenerated.encode('utf-8'))
+
+
+class TestCanonical(object):
+
+    def test_whitespace_and_attributes(self):
+        a = ET.fromstring('<a x="1" y="2">\n  <b> text </b>\n</a>')
+        b = ET.fromstring('<a y="2" x="1"><b>text</b></a>')
+        assert canonical(a) == canonical(b)
+
+    def test_plugin_attributes(self):
+        assert differences('<a plugin="x@1.0"><b/></a>',
+                           '<a plugin="x"><b/></a>') == []
+
+    def test_default_fields(self):
+        assert differences(
+            '<project><disabled>false</disabled><description/>'
+            '<canRoam>true</canRoam><actions/></project>',
+            '<project><concurrentBuild>false</concurrentBuild></project>') \
+            == []
+
+    def test_java_classes_are_kept(self):
+        assert differences(
+            '<project><extensions><a.WipeWorkspace/></extensions></project>',
+            '<project/>') == [
+            Difference('project/extensions', '<extensions>', None)]
+
+    def test_booleans(self):
+        assert differences('<a><b>true</b></a>', '<a><b>True</b></a>') == []
+
+    def test_jjb_description(self):
+        assert differences(
+            '<project><description>hi</description></project>',
+            '<project><description>hi&lt;!-- Managed by Jenkins Job Builder '
+            '--&gt;</description></project>') == []
+
+
+class TestGit(object):
+
+    legacy = '''<project>
+      <scm class="hudson.plugins.git.GitSCM" plugin="git@2.0">
+        <configVersion>2</configVersion>
+        <userRemoteConfigs>
+          <hudson.plugins.git.UserRemoteConfig>
+            <url>https://example.com/repo.git</url>
+          </hudson.plugins.git.UserRemoteConfig>
+        </userRemoteConfigs>
+        <wipeOutWorkspace>true</wipeOutWorkspace>
+        <skipTag>false</skipTag>
+        <relativeTargetDir>src</relativeTargetDir>
+        <submoduleCfg class="list"/>
+      </scm>
+    </project>'''
+
+    extensions = '''<project>
+      <scm class="hudson.plugins.git.GitSCM">
+        <configVersion>2</configVersion>
+        <userRemoteConfigs>
+          <hudson.plugins.git.UserRemoteConfig>
+            <name>origin</name>
+            <refspec>+refs/heads/*:refs/remotes/origin/*</refspec>
+            <url>https://example.com/repo.git</url>
+          </hudson.plugins.git.UserRemoteConfig>
+        </userRemoteConfigs>
+        <gitTool>Default</gitTool>
+        <extensions>
+          <hudson.plugins.git.extensions.impl.PerBuildTag/>
+          <hudson.plugins.git.extensions.impl.RelativeTargetDirectory>
+            <relativeTargetDir>src</relativeTargetDir>
+          </hudson.plugins.git.extensions.impl.RelativeTargetDirectory>
+          <hudson.plugins.git.extensions.impl.WipeWorkspace/>
+        </extensions>
+      </scm>
+    </project>'''
+
+    def test_legacy_fields(self):
+        assert differences(self.legacy, self.extensions) == []
+
+    def test_skip_tag_default(self):
+        # handle_scm() reads a missing skipTag as true.
+        legacy = self.legacy.replace('<skipTag>false</skipTag>', '')
+        assert differences(legacy, self.extensions) == [
+            Difference('project/scm/extensions/'
+                       'hudson.plugins.git.extensions.impl.PerBuildTag',
+                       None, '')]
+
+    def test_wipe_workspace(self):
+        legacy = self.legacy.replace(
+            '<wipeOutWorkspace>true</wipeOutWorkspace>', '')
+        assert [d.path for d in differences(legacy, self.extensions)] == [
+            'project/scm/extensions/'
+            'hudson.plugins.git.extensions.impl.WipeWorkspace']
+
+    def test_wipe_workspace_default(self):
+        # A missing setting, on either side, is the same as false.
+        wipe = '<hudson.plugins.git.extensions.impl.WipeWorkspace/>'
+        for setting in ('', '<wipeOutWorkspace>false</wipeOutWorkspace>'):
+            legacy = self.legacy.replace(
+                '<wipeOutWorkspace>true</wipeOutWorkspace>', setting)
+            assert differences(legacy,
+                               self.extensions.replace(wipe, '')) == []
+
+
+class TestDiff(object):
+
+    def test_same(self):
+        a = ET.fromstring('<a><b>1</b></a>')
+        assert diff(a, a) == []
+
+    def test_paths(self):
+        assert differences(
+            '<project><builders><s><c>make</c></s><s><c>test</c></s>'
+            '</builders><scm class="x"/><node>a</node></project>',
+            '<project><builders><s><c>make</c></s><s><c>check</c></s>'
+            '</builders><scm class="y"/><quiet>5</quiet></project>') == [
+            Difference('project/builders/s[2]/c', 'test', 'check'),
+            Difference('project/scm/@class', 'x', 'y'),
+            Difference('project/node', 'a', None),
+            Difference('project/quiet', None, '5'),
+        ]
+
+    def test_children_by_tag(self):
+        # Children of different tags may come in any order.
+        assert differences('<a><b>1</b><c>2</c></a>',
+                           '<a><c>2</c><b>1</b></a>') == []
@@ -0,0 +1,111 @@
+from jenkins_job_wrecker.cli import convert_xml, main
+from jenkins_job_wrecker.client import ConversionError, convert, \
+    convert_on_daemon, main as client_main
+from jenkins_job_wrecker.server import ConversionServer, remove_stale_socket
+import os
+import pytest
+import socket
+
+fixtures_path = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def read_fixture(name):
+    with open(os.path.join(fixtures_path, name + '.xml'), 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def socket_path(tmpdir):
+    return str(tmpdir.join('jjwrecker.sock'))
+
+
+@pytest.fixture
+def server(socket_path):
+    with ConversionServer(socket_path, processes=1) as server:
+        yield server
+
+
+class TestConversionServer(object):
+
+    def test_convert(self, server, socket_path):
+        xml = read_fixture('ice-setup')
+        assert convert_on_daemon('ice-setup', xml,
+                                 socket_path=socket_path) == \
+            convert_xml('ice-setup', xml).yaml
+        assert convert_on_daemon('ice-setup', xml, 'json',
+                                 socket_path=socket_path) == \
+            convert_xml('ice-setup', xml, output_format='json').yaml
+        assert server.requests == 2
+
+    def test_error(self, server, socket_path):
+        with pytest.raises(ConversionError):
+            convert_on_daemon('bad', b'<project>', socket_path=socket_path)
+        with pytest.raises(ConversionError) as excinfo:
+            convert_on_daemon('bad', b'<project/>', 'toml',
+                              socket_path=socket_path)
+        assert 'format must be one of' in str(excinfo.value)
+        assert server.errors == 1
+
+    def test_port(self):
+        xml = read_fixture('timeout')
+        with ConversionServer(port=0, processes=1) as server:
+            port = server.httpd.server_address[1]
+            assert server.address == 'http://127.0.0.1:%d/' % port
+            assert convert_on_daemon('timeout', xml, port=port) == \
+                convert_xml('timeout', xml).yaml
+
+    def test_stop_removes_socket(self, socket_path):
+        with ConversionServer(socket_path, processes=1):
+            assert os.path.exists(socket_path)
+        assert not os.path.exists(socket_path)
+
+    def test_stale_socket(self, socket_path):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(socket_path)
+        sock.close()
+        remove_stale_socket(socket_path)
+        assert not os.path.exists(socket_path)
+
+    def test_already_serving(self, server, socket_path):
+        with pytest.raises(socket.error):
+            remove_stale_socket(socket_path)
+
+    def test_serve_args(self):
+        with pytest.raises(SystemExit):
+            main(['serve', '--xml-backend', 'bogus'])
+
+
+class TestClient(object):
+
+    def test_fallback(self, socket_path):
+        xml = read_fixture('ice-setup')
+        assert convert('ice-setup', xml, socket_path=socket_path) == \
+            convert_xml('ice-setup', xml).yaml
+
+    def test_fallback_error(self, socket_path):
+        with pytest.raises(ConversionError) as excinfo:
+            convert('flow', b'<flow-definition/>', socket_path=socket_path)
+        assert str(excinfo.value).startswith('NotImplementedError: ')
+        with pytest.raises(ConversionError):
+            convert('bad', b'<project>', socket_path=socket_path)
+
+    def test_main(self, server, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        client_main(['--socket', server.address,
+                     os.path.join(fixtures_path, 'ice-setup.xml')])
+        assert server.requests == 1
+        assert tmpdir.join('output', 'ice-setup.yml').read('rb') == \
+            convert_xml('ice-setup', read_fixture('ice-setup')).yaml
+
+    def test_main_error(self, server, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.join('bad.xml').write('<project>')
+        with pytest.raises(SystemExit):
+            client_main(['--socket', server.address, 'bad.xml'])
+
+    def test_main_fallback_error(self, socket_path, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.join('flow.xml').write('<flow-definition/>')
+        with pytest.raises(SystemExit):
+            client_main(['--socket', socket_path, 'flow.xml'])
+        assert not tmpdir.join('output', 'flow.yml').check()
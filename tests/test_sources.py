@@ -0,0 +1,159 @@
+from jenkins_job_wrecker.sources import walk_jenkins_home, \
+    expand_filenames, job_name_from_filename, JobFilter, iter_archive, \
+    archive_job_name, root_tag
+import io
+import os
+import tarfile
+
+
+FOLDER_XML = b'''<?xml version='1.0' encoding='UTF-8'?>
+<!-- <project> -->
+<com.cloudbees.hudson.plugins.folder.Folder plugin="cloudbees-folder@5.12">
+</com.cloudbees.hudson.plugins.folder.Folder>
+'''
+
+
+def make_archive(path, members):
+    with tarfile.open(path, 'w:gz') as archive:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+def make_job(jobs_dir, name):
+    job_dir = jobs_dir.mkdir(name)
+    job_dir.join('config.xml').write('<project/>')
+    job_dir.mkdir('builds')
+    return job_dir
+
+
+class TestWalkJenkinsHome(object):
+
+    def test_walk(self, tmpdir):
+        jobs_dir = tmpdir.mkdir('jobs')
+        make_job(jobs_dir, 'b')
+        make_job(jobs_dir, 'a')
+        jobs_dir.mkdir('no-config')
+        jobs_dir.join('stray-file').write('')
+        result = list(walk_jenkins_home(str(tmpdir)))
+        assert result == [
+            ('a', str(jobs_dir.join('a', 'config.xml'))),
+            ('b', str(jobs_dir.join('b', 'config.xml'))),
+        ]
+
+    def test_walk_folders(self, tmpdir):
+        jobs_dir = tmpdir.mkdir('jobs')
+        folder = make_job(jobs_dir, 'folder')
+        subfolder = make_job(folder.mkdir('jobs'), 'subfolder')
+        make_job(subfolder.mkdir('jobs'), 'deep')
+        make_job(folder.join('jobs'), 'job')
+        names = [name for name, _ in walk_jenkins_home(str(tmpdir))]
+        assert names == ['folder/job', 'folder/subfolder/deep']
+
+
+class TestExpandFilenames(object):
+
+    def test_glob(self, tmpdir):
+        tmpdir.join('b.xml').write('<project/>')
+        tmpdir.join('a.xml').write('<project/>')
+        tmpdir.join('c.yml').write('')
+        pattern = os.path.join(str(tmpdir), '*.xml')
+        assert list(expand_filenames([pattern])) == [
+            ('a', str(tmpdir.join('a.xml'))),
+            ('b', str(tmpdir.join('b.xml'))),
+        ]
+
+    def test_plain_path(self):
+        assert list(expand_filenames(['missing.xml'])) == \
+            [('missing', 'missing.xml')]
+
+    def test_unmatched_glob(self, tmpdir):
+        pattern = os.path.join(str(tmpdir), '*.xml')
+        assert list(expand_filenames([pattern])) == []
+
+
+class TestJobNameFromFilename(object):
+
+    def test_xml_file(self):
+        assert job_name_from_filename('exports/my-job.xml') == 'my-job'
+
+    def test_config_xml(self):
+        assert job_name_from_filename('jobs/my-job/config.xml') == 'my-job'
+
+    def test_other_extension(self):
+        assert job_name_from_filename('exports/my-job') == 'my-job'
+
+
+class TestJobFilter(object):
+
+    def test_no_patterns(self):
+        assert JobFilter()('my-job')
+
+    def test_ignore_names(self):
+        job_filter = JobFilter(ignore=['a', 'b'])
+        assert not job_filter('a')
+        assert not job_filter('b')
+        assert job_filter('ab')
+
+    def test_ignore_glob(self):
+        job_filter = JobFilter(ignore=['folder/*', '*-test'])
+        assert not job_filter('folder/my-job')
+        assert not job_filter('my-test')
+        assert job_filter('my-test-job')
+
+    def test_ignore_regex(self):
+        job_filter = JobFilter(ignore=['re:ceph-.*-(build|test)'])
+        assert not job_filter('ceph-pull-requests-build')
+        assert job_filter('ceph-pull-requests-build-trigger')
+
+    def test_include(self):
+        job_filter = JobFilter(include=['ceph-*'], ignore=['ceph-test'])
+        assert job_filter('ceph-build')
+        assert not job_filter('ceph-test')
+        assert not job_filter('calamari-build')
+
+
+class TestIterArchive(object):
+
+    def test_iter_archive(self, tmpdir):
+        path = str(tmpdir.join('backup.tar.gz'))
+        make_archive(path, [
+            ('jenkins/config.xml', b'<hudson/>'),
+            ('jenkins/jobs/a/config.xml', b'<project/>'),
+            ('jenkins/jobs/a/builds/1/log', b'log'),
+            ('jenkins/jobs/folder/config.xml', FOLDER_XML),
+            ('jenkins/jobs/folder/jobs/b/config.xml', b'<matrix-project/>'),
+        ])
+        assert list(iter_archive(path)) == [
+            ('a', b'<project/>'),
+            ('folder/b', b'<matrix-project/>'),
+        ]
+
+
+class TestArchiveJobName(object):
+
+    def test_job(self):
+        assert archive_job_name('jobs/a/config.xml') == 'a'
+
+    def test_prefix(self):
+        assert archive_job_name('./var/lib/jenkins/jobs/a/config.xml') == 'a'
+
+    def test_folder(self):
+        assert archive_job_name('jobs/f/jobs/g/jobs/a/config.xml') == 'f/g/a'
+
+    def test_not_a_job(self):
+        assert archive_job_name('config.xml') is None
+        assert archive_job_name('jobs/a/builds/1/config.xml') is None
+        assert archive_job_name('jobs/a/nextBuildNumber') is None
+        assert archive_job_name('jobs/config.xml') is None
+
+
+class TestRootTag(object):
+
+    def test_root_tag(self):
+        assert root_tag(FOLDER_XML) == \
+            'com.cloudbees.hudson.plugins.folder.Folder'
+
+    def test_malformed(self):
+        assert root_tag(b'<<') is None
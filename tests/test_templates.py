@@ -0,0 +1,233 @@
+from collections import OrderedDict
+from jenkins_job_wrecker.cli import main
+from jenkins_job_wrecker.macros import load
+from jenkins_job_wrecker.templates import TemplateInferrer, escape, \
+    flatten, variable_name, TEMPLATES_NAME
+import jenkins_job_wrecker.templates as templates
+import os
+import pytest
+
+fixtures_path = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+SCRIPT = 'make -C "${WORKSPACE}/src" && make check'
+
+project_xml = '''<?xml version="1.0" encoding="utf-8"?>
+<project>
+  <description>Builds %(name)s</description>
+  <scm class="hudson.plugins.git.GitSCM" plugin="git@2.3.5">
+    <userRemoteConfigs>
+      <hudson.plugins.git.UserRemoteConfig>
+        <url>https://github.com/example/ceph.git</url>
+      </hudson.plugins.git.UserRemoteConfig>
+    </userRemoteConfigs>
+    <branches>
+      <hudson.plugins.git.BranchSpec>
+        <name>%(branch)s</name>
+      </hudson.plugins.git.BranchSpec>
+    </branches>
+  </scm>
+  <concurrentBuild>false</concurrentBuild>
+  <builders>
+    <hudson.tasks.Shell>
+      <command>make -C "${WORKSPACE}/src" &amp;&amp; make check</command>
+    </hudson.tasks.Shell>
+  </builders>
+</project>
+'''
+
+
+def job(name, branch='master', concurrent=False, script=SCRIPT):
+    return [{'job': OrderedDict([
+        ('name', name),
+        ('scm', [{'git': OrderedDict([('url', 'https://example.com/a.git'),
+                                      ('branches', [branch])])}]),
+        ('concurrent', concurrent),
+        ('builders', [{'shell': script}]),
+    ])}]
+
+
+# Write the XML of a job for the tests of main().
+def write_job(directory, name, branch='master'):
+    directory.join(name + '.xml').write(project_xml % {
+        'name': name, 'branch': branch})
+
+
+# Write a job into a JENKINS_HOME for the tests of main().
+def write_home_job(home, name, branch='master'):
+    write_job(home.ensure('jobs', name, dir=True), 'config', branch)
+
+
+class TestTemplateInferrer(object):
+
+    def test_template(self):
+        inferrer = TemplateInferrer()
+        inferrer.add('ceph-stable', job('ceph-stable', 'stable'))
+        other = job('other')
+        other[0]['job']['node'] = 'builder'
+        inferrer.add('other', other)
+        inferrer.add('ceph-master', job('ceph-master'))
+        definitions, plain = inferrer.infer()
+        assert inferrer.templated == ['ceph-stable', 'ceph-master']
+        assert [name for name, data in plain] == ['other']
+        template = definitions[0]['job-template']
+        assert template['name'] == '{name}'
+        assert template['id'] == 'ceph-template'
+        assert template['scm'][0]['git']['branches'] == ['{branches}']
+        assert template['builders'] == [
+            {'shell': 'make -C "${{WORKSPACE}}/src" && make check'}]
+        assert definitions[1] == {'project': OrderedDict([
+            ('name', 'ceph-template'),
+            ('jobs', [
+                {'ceph-template': OrderedDict([
+                    ('name', 'ceph-master'), ('branches', 'master')])},
+                {'ceph-template': OrderedDict([
+                    ('name', 'ceph-stable'), ('branches', 'stable')])},
+            ])])}
+
+    def test_types(self):
+        inferrer = TemplateInferrer()
+        inferrer.add('a', job('a', concurrent=True))
+        inferrer.add('b', job('b', concurrent=False))
+        template, project = inferrer.infer()[0]
+        assert template['job-template']['concurrent'] == '{concurrent}'
+        assert [next(iter(params.values()))['concurrent']
+                for params in project['project']['jobs']] == [True, False]
+
+    def test_escaped_values(self):
+        inferrer = TemplateInferrer()
+        inferrer.add('a', job('a', script='echo ${A}'))
+        inferrer.add('b', job('b', script='echo ${B}'))
+        project = inferrer.infer()[0][1]['project']
+        assert [next(iter(params.values()))['shell']
+                for params in project['jobs']] == \
+            ['echo ${{A}}', 'echo ${{B}}']
+
+    def test_min_jobs(self):
+        inferrer = TemplateInferrer(min_jobs=3)
+        for name in 'ab':
+            inferrer.add(name, job(name))
+        assert inferrer.infer()[0] == []
+        inferrer.add('c', job('c'))
+        assert len(inferrer.infer()[0]) == 2
+
+    def test_different_paths(self):
+        inferrer = TemplateInferrer()
+        inferrer.add('a', job('a'))
+        data = job('b')
+        data[0]['job']['node'] = 'builder'
+        inferrer.add('b', data)
+        assert inferrer.infer()[0] == []
+
+    def test_too_many_variables(self):
+        inferrer = TemplateInferrer(max_variables=1)
+        for name, branch in (('a', 'master'), ('b', 'master'),
+                             ('c', 'stable'), ('d', 'stable')):
+            inferrer.add(name, job(name, branch, concurrent=name in 'ac'))
+        definitions = inferrer.infer()[0]
+        assert [len(item['project']['jobs']) for item in definitions[1::2]] \
+            == [2, 2]
+
+    def test_not_a_single_job(self):
+        inferrer = TemplateInferrer()
+        for name in 'ab':
+            inferrer.add(name, job(name) + [{'view': {'name': name}}])
+        assert inferrer.infer()[0] == []
+
+    def test_escape(self):
+        assert escape('${A}') == '${{A}}'
+        assert escape(u'${A}') == u'${{A}}'
+        assert escape(1) == 1
+
+    def test_flatten(self):
+        assert list(flatten({'a': [1, {'b': []}]}).items()) == \
+            [(('a', 0), 1), (('a', 1, 'b'), [])]
+
+    def test_variable_name(self):
+        assert variable_name(('scm', 0, 'git', 'branches', 0), set()) == \
+            'branches'
+        assert variable_name(('a', 'skip-tag'), set(['skip_tag'])) == \
+            'skip_tag_2'
+        assert variable_name(('parameters', 0, 'string', 'name'), set()) == \
+            'name_value'
+
+
+class TestTemplatesMain(object):
+
+    def test_main(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        write_job(tmpdir, 'ceph-master')
+        write_job(tmpdir, 'ceph-stable', branch='stable')
+        with open(os.path.join(fixtures_path, 'timeout.xml')) as f:
+            tmpdir.join('timeout.xml').write(f.read())
+        main(['-f', '*.xml'])
+        assert sorted(os.listdir('output')) == \
+            ['.jjw-cache', 'ceph-master.yml', 'ceph-stable.yml', 'timeout.yml']
+        main(['-f', '*.xml', '--templates'])
+        assert not templates.enabled()
+        assert sorted(os.listdir('output')) == \
+            ['.jjw-cache', TEMPLATES_NAME + '.yml', 'timeout.yml']
+        with open(os.path.join('output', TEMPLATES_NAME + '.yml'), 'rb') as f:
+            definitions = load(f.read())
+        assert [name for item in definitions[1]['project']['jobs']
+                for name in item] == ['ceph-template', 'ceph-template']
+
+    def test_main_without_templates(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        write_home_job(tmpdir.join('jenkins'), 'ceph-master')
+        write_home_job(tmpdir.join('jenkins'), 'ceph-stable', 'stable')
+        main(['--jenkins-home', 'jenkins', '--templates'])
+        assert TEMPLATES_NAME + '.yml' in os.listdir('output')
+        main(['--jenkins-home', 'jenkins'])
+        assert sorted(os.listdir('output')) == \
+            ['.jjw-cache', 'ceph-master.yml', 'ceph-stable.yml']
+        with open(os.path.join('output', 'ceph-stable.yml'), 'rb') as f:
+            assert load(f.read())[0]['job']['scm'][0]['git']['branches'] == \
+                ['stable']
+
+    def test_partial_run_keeps_templates(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        write_home_job(tmpdir.join('jenkins'), 'ceph-master')
+        write_home_job(tmpdir.join('jenkins'), 'ceph-stable', 'stable')
+        write_home_job(tmpdir.join('jenkins'), 'ceph-next', 'next')
+        main(['--jenkins-home', 'jenkins', '--templates'])
+        assert sorted(os.listdir('output')) == \
+            ['.jjw-cache', TEMPLATES_NAME + '.yml']
+        main(['--jenkins-home', 'jenkins', '--include', 'ceph-next'])
+        write_job(tmpdir, 'other')
+        main(['-f', 'other.xml'])
+        assert sorted(os.listdir('output')) == \
+            ['.jjw-cache', TEMPLATES_NAME + '.yml', 'ceph-next.yml',
+             'other.yml']
+
+    def test_main_jjb(self, tmpdir, monkeypatch):
+        pytest.importorskip('jenkins_jobs')
+        from jenkins_job_wrecker.verify import get_verifier
+        monkeypatch.chdir(tmpdir)
+        for name, branch in (('ceph-master', 'master'),
+                             ('ceph-stable', 'stable'),
+                             ('ceph-next', '{next}')):
+            write_job(tmpdir, name, branch=branch)
+        main(['-f', '*.xml', '--no-cache'])
+        plain = {}
+        for filename in os.listdir('output'):
+            with open(os.path.join('output', filename), 'rb') as f:
+                plain[filename] = f.read()
+        main(['-f', '*.xml', '--templates'])
+        with open(os.path.join('output', TEMPLATES_NAME + '.yml'), 'rb') as f:
+            definitions = load(f.read())
+        verifier = get_verifier()
+        jobs = verifier.render(definitions)
+        assert sorted(job.name for job in jobs) == \
+            ['ceph-master', 'ceph-next', 'ceph-stable']
+        for job in jobs:
+            expected = verifier.render_yaml(plain[job.name + '.yml'])
+            assert job.output() == expected[0].output()
+
+    def test_changed_only(self):
+        with pytest.raises(SystemExit):
+            main(['-s', 'http://localhost:8080', '--changed-only',
+                  '--templates'])
+
+    def test_macros(self):
+        with pytest.raises(SystemExit):
+            main(['-f', 'job.xml', '--macros', '--templates'])
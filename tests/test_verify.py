@@ -0,0 +1,236 @@
+from jenkins_job_wrecker.cli import convert_files, convert_xml, main
+from jenkins_job_wrecker.corpus import JobGenerator
+from jenkins_job_wrecker.output import OutputWriter
+from jenkins_job_wrecker.registry import registry
+from jenkins_job_wrecker.roundtrip import Difference
+import jenkins_job_wrecker.verify as verify
+import json
+import os
+import pytest
+
+pytest.importorskip('jenkins_jobs')
+
+fixtures_path = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+bad_xml = b'''<project>
+  <builders>
+    <org.example.Bad/>
+  </builders>
+</project>'''
+
+
+@pytest.fixture
+def verifying():
+    verify.enable()
+    yield verify.get_report()
+    verify.enable(False)
+
+
+# A builder handler that makes YAML that JJB rejects.
+@pytest.fixture
+def bad_builder():
+    key = ('builder', 'org.example.Bad', None)
+    registry.add('builder', 'org.example.Bad',
+                 lambda child: {'no-such-builder': {}})
+    yield
+    del registry._handlers[key]
+
+
+class TestVerifier(object):
+
+    def test_fixtures_pass(self):
+        verifier = verify.get_verifier()
+        for name in ('ice-setup', 'calamari-clients'):
+            with open(os.path.join(fixtures_path, name + '.xml'), 'rb') as f:
+                result = convert_xml(name, f.read())
+            assert verifier.verify_yaml(result.yaml) is None
+
+    def test_generated_jobs_pass(self):
+        verifier = verify.get_verifier()
+        for name, xml in JobGenerator(3).jobs(10):
+            result = convert_xml(name, xml)
+            assert verifier.verify_yaml(result.yaml) is None
+
+    def test_render(self):
+        data = [{'job': {'name': 'my-job',
+                         'builders': [{'shell': 'make'}]}}]
+        jobs = verify.get_verifier().render(data)
+        assert [job.name for job in jobs] == ['my-job']
+        assert b'<command>make</command>' in jobs[0].output()
+        # JJB does not change the caller's data.
+        assert data == [{'job': {'name': 'my-job',
+                                 'builders': [{'shell': 'make'}]}}]
+
+    def test_registry_cache_is_per_verifier(self):
+        from jenkins_jobs.registry import ModuleRegistry
+        verify.get_verifier().render(
+            [{'job': {'name': 'my-job', 'builders': [{'shell': 'make'}]}}])
+        for entry_points in ModuleRegistry._entry_points_cache.values():
+            for entry_point in entry_points.values():
+                assert not isinstance(entry_point, verify.ResolvedEntryPoint)
+
+    def test_unknown_builder_fails(self):
+        data = [{'job': {'name': 'my-job',
+                         'builders': [{'no-such-builder': {}}]}}]
+        error = verify.get_verifier().verify(data)
+        assert 'no-such-builder' in error
+
+    def test_invalid_yaml_fails(self):
+        assert verify.get_verifier().verify_yaml(b'- job: [') is not None
+
+    def test_round_trip(self):
+        with open(os.path.join(fixtures_path, 'timeout.xml'), 'rb') as f:
+            xml = f.read()
+        result = convert_xml('timeout', xml)
+        assert verify.get_verifier().check(text=result.yaml,
+                                           original=xml) == (None, [])
+
+    def test_round_trip_wipe_workspace(self):
+        # JJB wipes the workspace unless told otherwise; Jenkins does not.
+        xml = '''<project><scm class="hudson.plugins.git.GitSCM">
+          <userRemoteConfigs><hudson.plugins.git.UserRemoteConfig>
+            <url>https://example.com/repo.git</url>
+          </hudson.plugins.git.UserRemoteConfig></userRemoteConfigs>
+          <branches><hudson.plugins.git.BranchSpec>
+            <name>**</name>
+          </hudson.plugins.git.BranchSpec></branches>
+          %s
+        </scm></project>'''
+        verifier = verify.get_verifier()
+        for setting in ('', '<wipeOutWorkspace>false</wipeOutWorkspace>',
+                        '<wipeOutWorkspace>true</wipeOutWorkspace>',
+                        '<extensions><hudson.plugins.git.extensions.impl.'
+                        'WipeWorkspace/></extensions>'):
+            original = (xml % setting).encode('utf-8')
+            result = convert_xml('git', original)
+            assert verifier.check(text=result.yaml, original=original) == \
+                (None, [])
+
+    def test_round_trip_differs(self):
+        with open(os.path.join(fixtures_path, 'timeout.xml'), 'rb') as f:
+            xml = f.read()
+        result = convert_xml('timeout', xml)
+        yaml = result.yaml.replace(b'timeout: 60', b'timeout: 45')
+        error, differences = verify.get_verifier().check(text=yaml,
+                                                         original=xml)
+        assert error is None
+        assert [(d.original, d.regenerated) for d in differences] == \
+            [('60', '45')]
+
+
+class TestVerifyReport(object):
+
+    def test_summary(self, tmpdir):
+        report = verify.VerifyReport()
+        report.record('a', None)
+        report.record('b', 'JenkinsJobsException: oops')
+        assert report.passed == ['a']
+        assert report.failed == ['b']
+        assert report.summary() == 'verify: 1 passed, 1 failed'
+        report.record('c', None, [])
+        assert report.summary() == 'verify: 2 passed, 1 failed, 0 differ'
+        filename = str(tmpdir.join('report.json'))
+        report.write_json(filename)
+        with open(filename) as f:
+            assert json.load(f) == {
+                'a': {'passed': True},
+                'b': {'passed': False, 'error': 'JenkinsJobsException: oops'},
+                'c': {'passed': True}}
+
+    def test_differences(self, tmpdir):
+        report = verify.VerifyReport()
+        report.record('a', None, [Difference('project/node', 'a', None)])
+        assert report.passed == []
+        assert report.differ == ['a']
+        assert report.summary() == 'verify: 0 passed, 0 failed, 1 differ'
+        filename = str(tmpdir.join('report.json'))
+        report.write_json(filename)
+        with open(filename) as f:
+            assert json.load(f) == {
+                'a': {'passed': False, 'differences': [
+                    {'path': 'project/node', 'original': 'a',
+                     'regenerated': None}]}}
+
+
+class TestVerifyConversions(object):
+
+    def test_disabled_by_default(self):
+        name = 'ice-setup'
+        with open(os.path.join(fixtures_path, name + '.xml'), 'rb') as f:
+            result = convert_xml(name, f.read())
+        assert result.verified is None
+        assert result.verify_error is None
+
+    def test_convert_xml(self, verifying, bad_builder):
+        result = convert_xml('bad-job', bad_xml)
+        assert result.verified is False
+        assert 'no-such-builder' in result.verify_error
+
+    def test_workers(self, verifying, bad_builder, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.join('bad-job.xml').write(bad_xml, mode='wb')
+        jobs = [('bad-job', str(tmpdir.join('bad-job.xml'))),
+                ('ice-setup', os.path.join(fixtures_path, 'ice-setup.xml'))]
+        writer = OutputWriter('output')
+        convert_files(jobs, writer, processes=2)
+        writer.close()
+        assert verifying.passed == ['ice-setup']
+        assert verifying.failed == ['bad-job']
+
+    def test_main(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        main(['-f', os.path.join(fixtures_path, 'ice-setup.xml'),
+              '--verify', '--verify-report', 'report.json'])
+        verify.enable(False)
+        with open('report.json') as f:
+            assert json.load(f) == {'ice-setup': {'passed': True}}
+
+    def test_main_fails(self, bad_builder, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        tmpdir.join('bad-job.xml').write(bad_xml, mode='wb')
+        with pytest.raises(SystemExit):
+            main(['-f', 'bad-job.xml', '--verify'])
+        verify.enable(False)
+
+    def test_main_round_trip(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        main(['-f', os.path.join(fixtures_path, 'timeout.xml'),
+              '--round-trip', '--verify-report', 'report.json'])
+        verify.enable(False)
+        with open('report.json') as f:
+            assert json.load(f) == {'timeout': {'passed': True}}
+
+    def test_main_round_trip_differs(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        # jjwrecker does not convert combinationFilter.
+        with pytest.raises(SystemExit):
+            main(['-f', os.path.join(fixtures_path, 'calamari-clients.xml'),
+                  '--round-trip', '--verify-report', 'report.json'])
+        verify.enable(False)
+        with open('report.json') as f:
+            report = json.load(f)
+        paths = [d['path'] for d in
+                 report['calamari-clients']['differences']]
+        assert 'matrix-project/combinationFilter' in paths
+
+    def test_workers_round_trip(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        verify.enable(round_trip=True)
+        jobs = [(name, os.path.join(fixtures_path, name + '.xml'))
+                for name in ('timeout', 'calamari-clients')]
+        writer = OutputWriter('output')
+        convert_files(jobs, writer, processes=2)
+        writer.close()
+        report = verify.get_report()
+        verify.enable(False)
+        assert report.passed == ['timeout']
+        assert report.differ == ['calamari-clients']
+
+    def test_main_cache_hits(self, tmpdir, monkeypatch):
+        monkeypatch.chdir(tmpdir)
+        filename = os.path.join(fixtures_path, 'ice-setup.xml')
+        main(['-f', filename])
+        main(['-f', filename, '--verify', '--verify-report', 'report.json'])
+        verify.enable(False)
+        with open('report.json') as f:
+            assert json.load(f) == {'ice-setup': {'passed': True}}
@@ -0,0 +1,163 @@
+from jenkins_job_wrecker.bench import time_backends
+from jenkins_job_wrecker.cli import get_xml_root, root_to_yaml, \
+    stream_to_yaml, convert_xml
+import jenkins_job_wrecker.cli
+import jenkins_job_wrecker.xml_backend as xml_backend
+import glob
+import io
+import os
+import pytest
+
+fixtures_path = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+backends = ['stdlib']
+if xml_backend.lxml_etree is not None:
+    backends.append('lxml')
+
+
+@pytest.fixture(params=backends)
+def backend(request):
+    previous = xml_backend.get_backend()
+    xml_backend.set_backend(request.param)
+    yield request.param
+    xml_backend.set_backend(previous)
+
+
+class TestXMLBackend(object):
+
+    def test_golden_yaml(self, backend):
+        for expected_filename in glob.glob(os.path.join(fixtures_path,
+                                                        '*.yaml')):
+            name = os.path.basename(expected_filename)[:-len('.yaml')]
+            root = get_xml_root(filename=os.path.join(fixtures_path,
+                                                      name + '.xml'))
+            with open(expected_filename) as f:
+                assert root_to_yaml(root, name) == f.read()
+
+    def test_tostring(self, backend):
+        root = xml_backend.fromstring(b'<a b="x&gt;y">t&gt;<c/>tail \xc3\xa9'
+                                      b'<!-- comment --></a>')
+        assert xml_backend.tostring(root) == \
+            b'<a b="x&gt;y">t&gt;<c />tail &#233;</a>'
+
+    def test_no_comments(self, backend):
+        root = xml_backend.fromstring(b'<a><!-- comment --><?pi?><b/></a>')
+        assert [child.tag for child in root] == ['b']
+
+    def test_parse_error(self, backend):
+        with pytest.raises(xml_backend.ParseError) as excinfo:
+            xml_backend.fromstring(b'<project>')
+        assert excinfo.value.position[0] == 1
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            xml_backend.set_backend('expat')
+
+    def test_missing_lxml(self, monkeypatch):
+        monkeypatch.setattr(xml_backend, 'lxml_etree', None)
+        monkeypatch.setattr(xml_backend, '_backend', None)
+        xml_backend.set_backend('auto')
+        assert xml_backend.get_backend() == 'stdlib'
+        with pytest.raises(ValueError):
+            xml_backend.set_backend('lxml')
+
+    def test_time_backends(self):
+        with open(os.path.join(fixtures_path, 'slack.xml'), 'rb') as f:
+            jobs = [('slack', f.read())]
+        previous = xml_backend.get_backend()
+        results = time_backends(jobs, backends, repeat=2)
+        assert list(results) == backends
+        for parse, convert in results.values():
+            assert parse > 0 and convert > 0
+        assert xml_backend.get_backend() == previous
+
+
+class TestStreaming(object):
+
+    def test_golden_yaml(self, backend):
+        for expected_filename in glob.glob(os.path.join(fixtures_path,
+                                                        '*.yaml')):
+            name = os.path.basename(expected_filename)[:-len('.yaml')]
+            yaml = stream_to_yaml(os.path.join(fixtures_path, name + '.xml'),
+                                  name)
+            with open(expected_filename) as f:
+                assert yaml == f.read()
+
+    def test_children_are_freed(self, backend):
+        children = xml_backend.iter_children(io.BytesIO(
+            b'<project><a>1</a><b><c/></b><d/></project>'))
+        root = next(children)
+        assert root.tag == 'project'
+        seen = []
+        for child in children:
+            seen.append(child.tag)
+            # Earlier children are gone.
+            assert root[0] is child
+        assert seen == ['a', 'b', 'd']
+        assert len(root) == 0
+
+    def test_parse_error(self, backend):
+        with pytest.raises(xml_backend.ParseError):
+            stream_to_yaml(io.BytesIO(b'<project><a></project>'), 'broken')
+
+    def test_convert_large_xml(self, backend, monkeypatch):
+        monkeypatch.setattr(jenkins_job_wrecker.cli, 'STREAM_THRESHOLD', 100)
+        script = 'echo hello\n' * 20000
+        xml = ('<project><builders><hudson.tasks.Shell><command>%s'
+               '</command></hudson.tasks.Shell></builders></project>' % script)
+        result = convert_xml('big', xml.encode('utf-8'))
+        assert result.yaml == root_to_yaml(get_xml_root(string=xml), 'big')
+        assert result.yaml.count('echo hello') == 20000
+
+
+class TestRawXML(object):
+
+    xml = (b"<?xml version='1.0' encoding='UTF-8'?>\n"
+           b"<project>\n"
+           b"  <publishers>\n"
+           b"    <org.example.Publisher b='1' a=\"2\">\n"
+           b"      <empty/>\n"
+           b"      <text>a &amp; b &gt; c \xc3\xa9</text>\n"
+           b"    </org.example.Publisher>\n"
+           b"  </publishers>\n"
+           b"  <org.example.Unknown attr='q'/>\n"
+           b"</project>\n")
+
+    def test_find_spans(self):
+        xml = b'<a x="1">\n  <b/>\n  <c y="/>" >t<d/></c >\n<e></e></a>'
+        spans, sections = xml_backend.find_spans(xml)
+        assert [xml[start:end] for start, end in spans] == [
+            xml, b'<b/>', b'<c y="/>" >t<d/></c >', b'<d/>', b'<e></e>']
+        assert sections == [1, 2, 4]
+
+    def test_find_spans_namespaces(self):
+        assert xml_backend.find_spans(b'<a xmlns="urn:x"><b/></a>') == \
+            ([], [])
+
+    def test_find_spans_encoding(self):
+        xml = b'<?xml version="1.0" encoding="ISO-8859-1"?><a><b/></a>'
+        assert xml_backend.find_spans(xml) == ([], [])
+
+    def test_passthrough(self, backend):
+        yaml = convert_xml('my-job', self.xml).yaml
+        assert ("xml: |\n"
+                "          <org.example.Publisher b='1' a=\"2\">\n"
+                "                <empty/>\n"
+                "                <text>a &amp; b &gt; c &#233;</text>\n"
+                "              </org.example.Publisher>\n") in yaml
+        assert "<org.example.Unknown attr='q'/>\n" in yaml
+
+    def test_streaming_passthrough(self, backend, monkeypatch):
+        monkeypatch.setattr(jenkins_job_wrecker.cli, 'STREAM_THRESHOLD', 10)
+        assert convert_xml('my-job', self.xml).yaml == \
+            root_to_yaml(get_xml_root(string=self.xml), 'my-job', self.xml)
+
+    def test_without_source(self, backend):
+        yaml = root_to_yaml(get_xml_root(string=self.xml), 'my-job')
+        assert '<org.example.Publisher a="2" b="1">' in yaml
+        assert '<empty />' in yaml
+
+    def test_crlf(self, backend):
+        xml = self.xml.replace(b'\n', b'\r\n')
+        assert convert_xml('my-job', xml).yaml == \
+            convert_xml('my-job', self.xml).yaml
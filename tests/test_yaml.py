@@ -1,4 +1,7 @@
-from jenkins_job_wrecker.cli import get_xml_root, root_to_yaml
+from collections import OrderedDict
+from jenkins_job_wrecker.cli import get_xml_root, root_to_yaml, \
+    root_to_data, stream_to_data
+from jenkins_job_wrecker.yaml_writer import dump
 import os
 
 fixtures_path = os.path.join(os.path.dirname(__file__), 'fixtures')
@@ -53,3 +56,28 @@ class TestYAML(object):
 
     def test_gerrit_trigger(self):
         self.run_jjw('gerrit-trigger')
+
+
+class TestRootToData(object):
+
+    def test_structure(self):
+        root = get_xml_root(filename=os.path.join(fixtures_path,
+                                                  'timeout.xml'))
+        data = root_to_data(root, 'timeout')
+        assert len(data) == 1
+        job = data[0]['job']
+        assert isinstance(job, OrderedDict)
+        assert job['name'] == 'timeout'
+        assert dump(data) == root_to_yaml(root, 'timeout')
+
+    def test_stream(self):
+        filename = os.path.join(fixtures_path, 'slack.xml')
+        root = get_xml_root(filename=filename)
+        assert stream_to_data(filename, 'slack') == root_to_data(root, 'slack')
+
+    def test_transform(self):
+        root = get_xml_root(filename=os.path.join(fixtures_path,
+                                                  'timeout.xml'))
+        data = root_to_data(root, 'timeout')
+        data[0]['job']['name'] = 'renamed'
+        assert 'name: renamed\n' in dump(data)
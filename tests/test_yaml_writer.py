@@ -0,0 +1,84 @@
+from collections import OrderedDict
+import io
+import jenkins_job_wrecker.pretty_yaml as pretty_yaml
+import jenkins_job_wrecker.yaml_writer as yaml_writer
+import pytest
+import yaml
+
+
+def python_dump(data):
+    return yaml.dump(data, Dumper=pretty_yaml.PrettyDumper,
+                     default_flow_style=False)
+
+
+def job(value):
+    return [{'job': OrderedDict([('name', 'my-job'), ('value', value)])}]
+
+
+class TestWrite(object):
+
+    @pytest.mark.parametrize('value', [
+        'plain',
+        '',
+        'yes',
+        '1.5',
+        '~',
+        '2001-01-01',
+        '- item',
+        'key: value',
+        'a #comment',
+        "it's",
+        ' leading space',
+        'trailing space ',
+        'echo hello\n',
+        'echo hello\n\n',
+        '\n  indented\n',
+        'no final break\nline',
+        'line\ntrailing space ',
+        'trailing space \nline',
+        'tab\there',
+        'caf\xc3\xa9',
+        'word ' * 30,
+        "it's a " * 20,
+        True,
+        False,
+        None,
+        0,
+        -3,
+        [],
+        OrderedDict(),
+        {},
+        ['x\n\n', OrderedDict()],
+        OrderedDict([('b', 'x\n\n'), ('a', [])]),
+        {'b': 'x\n\n', 'a': 1},
+        [['nested'], [OrderedDict([('a', ['b'])])]],
+        OrderedDict([('', 'empty key')]),
+        OrderedDict([('multi\nline', 'key')]),
+        OrderedDict([('k' * 122, 'simple key')]),
+        OrderedDict([('k' * 123, 'long key')]),
+        OrderedDict([(True, 'bool key'), (None, 'null key'), (1, 'int key')]),
+    ])
+    def test_same_as_python(self, value):
+        data = job(value)
+        assert yaml_writer.writable(data)
+        stream = io.BytesIO()
+        yaml_writer.write(data, stream)
+        assert stream.getvalue() == python_dump(data)
+
+    @pytest.mark.parametrize('value', [
+        u'unicode',
+        1.5,
+        2 ** 64,
+        'not utf-8 \xff',
+        ('tuple',),
+    ])
+    def test_not_writable(self, value):
+        data = job(value)
+        assert not yaml_writer.writable(data)
+        assert yaml_writer.dump(data) == python_dump(data)
+
+    def test_shared_values_are_aliased(self):
+        shared = ['a']
+        data = job(OrderedDict([('x', shared), ('y', shared)]))
+        assert not yaml_writer.writable(data)
+        assert '&id001' in yaml_writer.dump(data)